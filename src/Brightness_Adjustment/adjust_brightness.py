@@ -5,10 +5,6 @@
 ######################################
 
 import numpy as np
-from matplotlib import pyplot as plt
-from matplotlib import cycler
-import matplotlib.gridspec as gridspec
-import matplotlib.patches as pat
 import cv2
 import subprocess
 import sys
@@ -16,15 +12,23 @@ import statistics
 import time
 
 # Graph settings
-# plt.style.use('seaborn-white')
-plt.style.use('bmh')
-colors = cycler('color', ['#EE6666', '#3388BB', '#9988DD', '#EECC55', '#88BB44', '#FFBBBB'])
-plt.rc('axes', facecolor='#E6E6E6', edgecolor='none', axisbelow=True, grid=False, prop_cycle=colors)
-# plt.rc('grid', color='w', linestyle='solid')
-# plt.rc('patch', edgecolor='#E6E6E6')
-# plt.rc('lines', linewidth=2)
-plt.rcParams["mathtext.fontset"] = "cm"
-plt.rcParams["mathtext.rm"] = "Times New Roman"
+# NOTE: matplotlib is imported only when the figure is created with "--figure"
+def import_matplotlib():
+    global plt, gridspec
+    from matplotlib import pyplot as plt
+    from matplotlib import cycler
+    import matplotlib.gridspec as gridspec
+
+    # plt.style.use('seaborn-white')
+    plt.style.use('bmh')
+    colors = cycler('color', ['#EE6666', '#3388BB', '#9988DD', '#EECC55', '#88BB44', '#FFBBBB'])
+    plt.rc('axes', facecolor='#E6E6E6', edgecolor='none', axisbelow=True, grid=False, prop_cycle=colors)
+    # plt.rc('grid', color='w', linestyle='solid')
+    # plt.rc('patch', edgecolor='#E6E6E6')
+    # plt.rc('lines', linewidth=2)
+    plt.rcParams["mathtext.fontset"] = "cm"
+    plt.rcParams["mathtext.rm"] = "Times New Roman"
+# End of import_matplotlib()
 
 # Message
 print("===================================================")
@@ -35,9 +39,10 @@ print("===================================================")
 
 # Check arguments
 args = sys.argv
-if len(args) != 3:
+b_create_figure = len(args) == 4 and args[3] == "--figure"
+if len(args) != 3 and not b_create_figure:
     print("\n")
-    print("USAGE   : $ python adjust_brightness.py [input_image_data] [input_image_data(L=1)]")
+    print("USAGE   : $ python adjust_brightness.py [input_image_data] [input_image_data(L=1)] [--figure]")
     print("EXAMPLE : $ python adjust_brightness.py [input_image.bmp] [input_image_L1.bmp]")
     #raise Exception
     sys.exit()
@@ -45,6 +50,8 @@ if len(args) != 3:
 # Set initial parameter
 p_init      = 1.0
 p_interval  = 0.01
+p_max       = 256.0 # All non-zero 8-bit values are saturated with p >= 255.5
+p_search_engine = "bisection" # "linear", "bisection" or "crossing"
 pct_of_reference_section = 0.01 # 1(%)
 # pct_of_reference_section = 0.005 # 1(%)
 bgcolor     = 0 # Background color : Black(0, 0, 0)
@@ -266,49 +273,60 @@ def calculate_statistics_for_input_image_L1():
     print("The pct. of max pixel value (L=1):", round(pct_max_pixel_value_L1*100, 2), "(%)")
 
     # Calc most frequent pixel value (L=1)
-    bincount = np.bincount(img_in_Gray_non_bgcolor_L1)
-    most_frequent_pixel_value_L1   = np.argmax( bincount )
+    bincount_L1                    = np.bincount(img_in_Gray_non_bgcolor_L1)
+    most_frequent_pixel_value_L1   = np.argmax( bincount_L1 )
     print("Most frequent pixel value (L=1)  :", most_frequent_pixel_value_L1, "(pixel value)")
 
-    return img_in_Gray_L1, img_in_Gray_non_bgcolor_L1, N_all_non_bgcolor_L1, max_pixel_value_L1, pct_max_pixel_value_L1, 
+    return img_in_Gray_L1, img_in_Gray_non_bgcolor_L1, N_all_non_bgcolor_L1, max_pixel_value_L1, pct_max_pixel_value_L1, bincount_L1
 # End of calculate_statistics_for_input_image_L1()
 
 
 
-# Adjust Pixel Value for each RGB
-def adjust_pixel_value(_img_RGB, _amp_param):
-    adjusted_img_RGB = np.empty((_img_RGB.shape[0], _img_RGB.shape[1], 3), dtype=np.uint8)
+# Create the saturating uint8 lookup table of the amplification factor
+def create_amplification_LUT(_p):
+    return cv2.multiply(np.arange(256, dtype=np.uint8), _p)
+
 
-    # Apply adjustment
-    adjusted_img_RGB[:, :, 0] = cv2.multiply(_img_RGB[:, :, 0], _amp_param) # R
-    adjusted_img_RGB[:, :, 1] = cv2.multiply(_img_RGB[:, :, 1], _amp_param) # G
-    adjusted_img_RGB[:, :, 2] = cv2.multiply(_img_RGB[:, :, 2], _amp_param) # B
 
-    return adjusted_img_RGB
+# Adjust Pixel Value for each RGB
+def adjust_pixel_value(_img_RGB, _amp_param, _dst=None):
+    # Apply adjustment to the interleaved RGB channels at once
+    return cv2.LUT(_img_RGB, create_amplification_LUT(_amp_param), dst=_dst)
 # End of adjust_pixel_value()
 
 
 
-def determine_amplification_factor(_pct_of_reference_section):
-    # Initialize
-    tmp_pct_of_reference_section = 0.0
-    reference_pixel_value_L1       = max_pixel_value_L1
+# Search the reference pixel value (L=1) with the reversed cumulative histogram
+def search_reference_pixel_value_L1(_bincount_L1, _max_pixel_value_L1, _N_all_non_bgcolor_L1, _pct_of_reference_section):
+    # The number of pixels in the section [v, max] for every pixel value v
+    num_of_pixels_in_section = np.cumsum( _bincount_L1[:int(_max_pixel_value_L1)+1][::-1] )[::-1]
+    tmp_pct_of_reference_section = num_of_pixels_in_section / _N_all_non_bgcolor_L1
+
+    # The largest pixel value whose section satisfies the pct. of reference section
+    b_index_satisfied       = tmp_pct_of_reference_section >= _pct_of_reference_section
+    reference_pixel_value_L1 = np.flatnonzero(b_index_satisfied)[-1] if np.any(b_index_satisfied) else 0
+
+    return np.uint8(reference_pixel_value_L1), tmp_pct_of_reference_section[reference_pixel_value_L1]
+# End of search_reference_pixel_value_L1()
 
-    # Determine reference pixel value in the input image(L=1)
-    while tmp_pct_of_reference_section < _pct_of_reference_section:
-        # Temporarily calc    
-        sum_of_pixels_in_section        = np.sum( (reference_pixel_value_L1 <= img_in_Gray_non_bgcolor_L1) )
-        tmp_pct_of_reference_section  = sum_of_pixels_in_section / N_all_non_bgcolor_L1
 
-        # Next pixel value
-        reference_pixel_value_L1 -= 1
 
-    reference_pixel_value_L1 += 1
+def determine_amplification_factor(_pct_of_reference_section):
+    # Determine reference pixel value in the input image(L=1)
+    reference_pixel_value_L1, tmp_pct_of_reference_section = search_reference_pixel_value_L1(bincount_L1, max_pixel_value_L1, N_all_non_bgcolor_L1, _pct_of_reference_section)
     print("Reference pixel value (L=1)      :", reference_pixel_value_L1, "(pixel value)")
     print("Reference section (L=1)          :", reference_pixel_value_L1, "~", max_pixel_value_L1, "(pixel value)")
     print("The pct. of ref. section (L=1)   :", round(tmp_pct_of_reference_section*100, 2), "(%)")
 
     # Determine tuning parameter
+    if p_search_engine != "linear" and reference_pixel_value_L1 > bgcolor:
+        if p_search_engine == "crossing":
+            p_final = determine_amplification_factor_by_crossing(reference_pixel_value_L1, _pct_of_reference_section)
+        else:
+            p_final = determine_amplification_factor_by_bisection(reference_pixel_value_L1, _pct_of_reference_section)
+
+        return p_final, reference_pixel_value_L1, tmp_pct_of_reference_section
+
     p = p_init
     tmp_pct = 0.0
     while tmp_pct < _pct_of_reference_section:
@@ -333,6 +351,138 @@ def determine_amplification_factor(_pct_of_reference_section):
 
 
 
+# Create the grid of "p" exactly as the linear search visits it
+def create_p_grid(_p_init, _p_interval, _p_max):
+    p_grid = [_p_init]
+    while p_grid[-1] <= _p_max:
+        p_grid.append(p_grid[-1] + _p_interval)
+
+    return p_grid
+# End of create_p_grid()
+
+
+
+# Search the first index in the grid which satisfies "_is_satisfied"
+# NOTE: "_is_satisfied" must be monotone, i.e., once satisfied, it is satisfied for all larger "p"
+def search_first_satisfying_index(_is_satisfied, _num_of_grid):
+    # Galloping: 0, 1, 3, 7, 15, ... until satisfied
+    lo, hi, step = 0, 0, 1
+    while not _is_satisfied(hi):
+        # Never satisfied in the grid
+        if hi == _num_of_grid - 1:
+            return hi
+
+        lo   = hi + 1
+        hi   = min(hi + step, _num_of_grid - 1)
+        step = step * 2
+    # end while
+
+    # Bisection in [lo, hi], where "hi" is satisfied
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _is_satisfied(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+    # end while
+
+    return hi
+# End of search_first_satisfying_index()
+
+
+
+# Calculate the pct. of pixels in the reference section of the image adjusted with "p"
+def calc_pct_of_reference_section(_img_RGB, _p, _ref_pixel_value_L1, _N_all_non_bgcolor):
+    tmp_img_adjusted_RGB   = adjust_pixel_value(_img_RGB, _p)
+    tmp_img_adjusted_Gray  = cv2.cvtColor(tmp_img_adjusted_RGB, cv2.COLOR_RGB2GRAY)
+
+    # Exclude background color
+    tmp_adjusted_img_non_bgcolor_Gray = tmp_img_adjusted_Gray[tmp_img_adjusted_Gray != bgcolor]
+
+    sum_of_pixels_in_reference_section = np.sum(_ref_pixel_value_L1 <= tmp_adjusted_img_non_bgcolor_Gray)
+
+    return sum_of_pixels_in_reference_section / _N_all_non_bgcolor
+# End of calc_pct_of_reference_section()
+
+
+
+# Same result as the linear search, but with O(log n) adjustments of the whole image
+def determine_amplification_factor_by_bisection(_ref_pixel_value_L1, _pct_of_reference_section):
+    p_grid = create_p_grid(p_init, p_interval, p_max)
+    index  = search_first_satisfying_index(
+        lambda _index: calc_pct_of_reference_section(img_in_RGB, p_grid[_index], _ref_pixel_value_L1, N_all_non_bgcolor) >= _pct_of_reference_section,
+        len(p_grid))
+
+    # NOTE: The linear search returns the "p" next to the satisfying one
+    p_final = round(p_grid[index] + p_interval, 2)
+
+    return p_final
+# End of determine_amplification_factor_by_bisection()
+
+
+
+# Create the 256-entry amplification table for each "p" in the grid
+def create_amplification_LUTs(_p_grid):
+    LUTs = np.array([create_amplification_LUT(p).ravel() for p in _p_grid], dtype=np.uint8)
+
+    return LUTs
+# End of create_amplification_LUTs()
+
+
+
+# For each distinct RGB value of the image, search the index of the smallest "p" in the grid
+# with which its adjusted grayscale value reaches the reference pixel value
+# NOTE: Returns the indices and the number of pixels of each RGB value.
+#       A rendered image has far fewer distinct RGB values than pixels, so the bisection runs over them only
+def search_threshold_crossing_index(_img_RGB, _ref_pixel_value, _LUTs):
+    packed    = (_img_RGB[:,:,0].astype(np.int32) << 16) | (_img_RGB[:,:,1].astype(np.int32) << 8) | _img_RGB[:,:,2]
+    packed, counts = np.unique(packed, return_counts=True)
+    R, G, B   = packed >> 16, (packed >> 8) & 255, packed & 255
+
+    # Bisection for all pixels at once, since the grayscale value never decreases as "p" grows
+    # NOTE: len(_LUTs) means that the pixel never reaches the reference pixel value
+    lo        = np.zeros(R.shape[0], dtype=np.int32)
+    hi        = np.full(R.shape[0], _LUTs.shape[0], dtype=np.int32)
+    LUTs_flat = _LUTs.ravel()
+    while np.any(lo < hi):
+        b_active     = lo < hi
+        mid          = np.minimum((lo + hi) // 2, _LUTs.shape[0] - 1)
+        offset       = mid * 256
+        tmp_img_RGB  = np.stack([LUTs_flat[offset+R], LUTs_flat[offset+G], LUTs_flat[offset+B]], axis=1)
+        tmp_img_Gray = cv2.cvtColor(tmp_img_RGB.reshape(-1, 1, 3), cv2.COLOR_RGB2GRAY).ravel()
+        b_reached    = tmp_img_Gray >= _ref_pixel_value
+
+        hi = np.where(b_active &  b_reached, mid,     hi)
+        lo = np.where(b_active & ~b_reached, mid + 1, lo)
+    # end while
+
+    return lo, counts
+# End of search_threshold_crossing_index()
+
+
+
+# Same result as the linear search, but every distinct RGB value is examined only once
+def determine_amplification_factor_by_crossing(_ref_pixel_value_L1, _pct_of_reference_section):
+    p_grid = create_p_grid(p_init, p_interval, p_max)
+    LUTs   = create_amplification_LUTs(p_grid)
+
+    # The number of pixels in the reference section for each "p" in the grid
+    crossing_index, counts = search_threshold_crossing_index(img_in_RGB, _ref_pixel_value_L1, LUTs)
+    num_of_pixels    = np.cumsum( np.bincount(crossing_index, weights=counts, minlength=len(p_grid)+1).astype(np.int64) )[:len(p_grid)]
+    tmp_pct          = num_of_pixels / N_all_non_bgcolor
+
+    # The first "p" which satisfies the pct. of reference section
+    b_index_reached  = tmp_pct >= _pct_of_reference_section
+    index            = np.argmax(b_index_reached) if np.any(b_index_reached) else len(p_grid) - 1
+
+    # NOTE: The linear search returns the "p" next to the satisfying one
+    p_final = round(p_grid[index] + p_interval, 2)
+
+    return p_final
+# End of determine_amplification_factor_by_crossing()
+
+
+
 def create_adjusted_image(_p_final, _reference_pixel_value_L1):
     print("Amplification factor \"p\"         :", _p_final)
 
@@ -350,20 +500,22 @@ def create_adjusted_image(_p_final, _reference_pixel_value_L1):
 
     #print("The pct. of num. of pixels to 255   :", round(np.sum(img_adjusted_Gray==255) / N_all_non_bgcolor * 100, 2), "(%)")
 
-    # Create figure
-    create_figure(img_in_RGB_L1, img_in_RGB, img_adjusted_RGB, _reference_pixel_value_L1, pct)
-
-    return img_adjusted_RGB
+    return img_adjusted_RGB, pct
 # End of create_adjusted_image()
 
 
 
-# Save figure and images
-def save_figure_and_images(_p_final, _img_in_RGB, _img_adjusted_RGB):
+# Save figure
+def save_figure(_p_final):
     fig_name = "IMAGE_DATA/figure_"+str(_p_final)+".png"
     plt.savefig(fig_name)
     # plt.show()
+# End of save_figure()
 
+
+
+# Save images
+def save_images(_p_final, _img_in_RGB, _img_adjusted_RGB):
     # convert color RGB to BGR
     img_in_BGR          = cv2.cvtColor(_img_in_RGB,         cv2.COLOR_RGB2BGR)
     img_out_BGR         = cv2.cvtColor(_img_adjusted_RGB,  cv2.COLOR_RGB2BGR)
@@ -400,7 +552,7 @@ if __name__ == "__main__":
     print("   Step1. Get max pixel value (L=1)")  
     print("===================================================")
     N_all_non_bgcolor = calculate_statistics_for_input_image()
-    img_in_Gray_L1, img_in_Gray_non_bgcolor_L1, N_all_non_bgcolor_L1, max_pixel_value_L1, pct_max_pixel_value_L1 = calculate_statistics_for_input_image_L1()
+    img_in_Gray_L1, img_in_Gray_non_bgcolor_L1, N_all_non_bgcolor_L1, max_pixel_value_L1, pct_max_pixel_value_L1, bincount_L1 = calculate_statistics_for_input_image_L1()
 
     print("\n")
     print("===================================================")
@@ -412,10 +564,16 @@ if __name__ == "__main__":
     print("===================================================")
     print("   Step3. Adjust pixel value")
     print("===================================================")
-    adjusted_img_RGB = create_adjusted_image(p_final, reference_pixel_value_L1)
+    adjusted_img_RGB, pct_of_reference_section_adjusted = create_adjusted_image(p_final, reference_pixel_value_L1)
 
     # End time count
     print ("\nProcessing time                  :", round(time.time() - start, 2),"[sec]")
 
-    # Save figure and images
-    save_figure_and_images(p_final, img_in_RGB, adjusted_img_RGB)
+    # Save images
+    save_images(p_final, img_in_RGB, adjusted_img_RGB)
+
+    # Create and save figure only if requested
+    if b_create_figure:
+        import_matplotlib()
+        create_figure(img_in_RGB_L1, img_in_RGB, adjusted_img_RGB, reference_pixel_value_L1, pct_of_reference_section_adjusted)
+        save_figure(p_final)
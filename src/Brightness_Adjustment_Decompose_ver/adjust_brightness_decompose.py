@@ -48,6 +48,8 @@ if len(args) != 3:
 # Set initial parameter
 p_init              = 1.0
 p_interval          = 0.01
+p_max               = 256.0 # All non-zero 8-bit values are saturated with p >= 255.5
+p_search_engine     = "bisection" # "linear", "bisection" or "crossing"
 pct_of_ref_sec4high = 0.01 # 1(%)
 pct_of_ref_sec4low  = 0.01 # 10(%)
 BGColor             = [0, 0, 0] # Background color
@@ -358,11 +360,11 @@ def calculate_statistics_for_input_image_L1():
     print("The pct. of max pixel value (L=1)      :", round(pct_max_pixel_value_L1*100, 2), "(%)")
 
     # Calc most frequent pixel value (L=1)
-    bincount = np.bincount(img_in_Gray_non_bgcolor_L1)
-    most_frequent_pixel_value_L1   = np.argmax( bincount )
+    bincount_L1                    = np.bincount(img_in_Gray_non_bgcolor_L1)
+    most_frequent_pixel_value_L1   = np.argmax( bincount_L1 )
     print("Most frequent pixel value (L=1)        :", most_frequent_pixel_value_L1, "(pixel value)")
 
-    return N_all_non_bgcolor_L1, max_pixel_value_L1
+    return N_all_non_bgcolor_L1, max_pixel_value_L1, bincount_L1
 # End of calculate_statistics_for_input_image_L1()
 
 
@@ -404,43 +406,181 @@ def decompose_input_image(_threshold_pixel_value):
 
 
 
+# Create the saturating uint8 lookup table of the amplification factor
+def create_amplification_LUT(_p):
+    return cv2.multiply(np.arange(256, dtype=np.uint8), _p)
+
+
+
 # Adjust pixel value for each RGB
 def tmp_adjust_pixel_value(_tmp_img_RGB, _img_RGB, _amplification_factor):
-    # tmp_adjusted_img_RGB = np.empty((_img_RGB.shape[0], _img_RGB.shape[1], 3), dtype=np.uint8)
+    # Apply adjustment into the caller-supplied buffer
+    return cv2.LUT(_img_RGB, create_amplification_LUT(_amplification_factor), dst=_tmp_img_RGB)
+# End of tmp_adjust_pixel_value()
 
-    # Apply adjustment
-    _tmp_img_RGB[:,:,0] = cv2.multiply(_img_RGB[:,:,0], _amplification_factor) # R
-    _tmp_img_RGB[:,:,1] = cv2.multiply(_img_RGB[:,:,1], _amplification_factor) # G
-    _tmp_img_RGB[:,:,2] = cv2.multiply(_img_RGB[:,:,2], _amplification_factor) # B
 
-    return _tmp_img_RGB
 
-    # tmp_img_RGB = _img_RGB * _amplification_factor
-    # return tmp_img_RGB
-# End of tmp_adjust_pixel_value()
+# Create the grid of "p" exactly as the linear search visits it
+def create_p_grid(_p_init, _p_interval, _p_max):
+    p_grid = [_p_init]
+    while p_grid[-1] <= _p_max:
+        p_grid.append(p_grid[-1] + _p_interval)
+
+    return p_grid
+# End of create_p_grid()
+
+
+
+# Search the first index in the grid which satisfies "_is_satisfied"
+# NOTE: "_is_satisfied" must be monotone, i.e., once satisfied, it is satisfied for all larger "p"
+def search_first_satisfying_index(_is_satisfied, _num_of_grid):
+    # Galloping: 0, 1, 3, 7, 15, ... until satisfied
+    lo, hi, step = 0, 0, 1
+    while not _is_satisfied(hi):
+        # Never satisfied in the grid
+        if hi == _num_of_grid - 1:
+            return hi
+
+        lo   = hi + 1
+        hi   = min(hi + step, _num_of_grid - 1)
+        step = step * 2
+    # end while
+
+    # Bisection in [lo, hi], where "hi" is satisfied
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _is_satisfied(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+    # end while
+
+    return hi
+# End of search_first_satisfying_index()
+
+
+
+# Calculate the pct. of pixels in the reference section of the image adjusted with "p"
+def calc_pct_of_ref_section(_tmp_img_RGB, _img_RGB, _p, _left_edge_pixel_value_L1, _N_all_non_bgcolor):
+    tmp_adjusted_img_RGB    = tmp_adjust_pixel_value(_tmp_img_RGB, _img_RGB, _p)
+    tmp_adjusted_img_Gray   = cv2.cvtColor(tmp_adjusted_img_RGB, cv2.COLOR_RGB2GRAY)
+
+    # Exclude background color
+    tmp_adjusted_img_Gray_non_bgcolor = tmp_adjusted_img_Gray[tmp_adjusted_img_Gray != BGColor_Gray]
+
+    tmp_num_of_pixels       = (_left_edge_pixel_value_L1 <= tmp_adjusted_img_Gray_non_bgcolor)
+
+    return np.sum( tmp_num_of_pixels ) / _N_all_non_bgcolor
+# End of calc_pct_of_ref_section()
+
+
+
+# Same result as the linear search, but with O(log n) adjustments of the whole image
+def determine_amplification_factor_by_bisection(_img_RGB, _left_edge_pixel_value_L1, _pct_of_ref_section, _N_all_non_bgcolor):
+    p_grid      = create_p_grid(p_init, p_interval, p_max)
+    tmp_img_RGB = np.empty((_img_RGB.shape[0], _img_RGB.shape[1], 3), dtype=np.uint8)
+    index       = search_first_satisfying_index(
+        lambda _index: calc_pct_of_ref_section(tmp_img_RGB, _img_RGB, p_grid[_index], _left_edge_pixel_value_L1, _N_all_non_bgcolor) > _pct_of_ref_section,
+        len(p_grid))
+
+    # NOTE: Follow the same floating-point steps as the linear search
+    tmp_p                   = p_grid[index] + p_interval
+    p_final                 = round((tmp_p - p_interval), 2)
+    pct_of_ref_section      = round(calc_pct_of_ref_section(tmp_img_RGB, _img_RGB, p_grid[index], _left_edge_pixel_value_L1, _N_all_non_bgcolor)*100, 1)
+
+    return p_final, pct_of_ref_section
+# End of determine_amplification_factor_by_bisection()
+
+
+
+# Create the 256-entry amplification table for each "p" in the grid
+def create_amplification_LUTs(_p_grid):
+    LUTs = np.array([create_amplification_LUT(p).ravel() for p in _p_grid], dtype=np.uint8)
+
+    return LUTs
+# End of create_amplification_LUTs()
+
+
+
+# For each distinct RGB value of the image, search the index of the smallest "p" in the grid
+# with which its adjusted grayscale value reaches the reference pixel value
+# NOTE: Returns the indices and the number of pixels of each RGB value.
+#       A rendered image has far fewer distinct RGB values than pixels, so the bisection runs over them only
+def search_threshold_crossing_index(_img_RGB, _ref_pixel_value, _LUTs):
+    packed    = (_img_RGB[:,:,0].astype(np.int32) << 16) | (_img_RGB[:,:,1].astype(np.int32) << 8) | _img_RGB[:,:,2]
+    packed, counts = np.unique(packed, return_counts=True)
+    R, G, B   = packed >> 16, (packed >> 8) & 255, packed & 255
+
+    # Bisection for all pixels at once, since the grayscale value never decreases as "p" grows
+    # NOTE: len(_LUTs) means that the pixel never reaches the reference pixel value
+    lo        = np.zeros(R.shape[0], dtype=np.int32)
+    hi        = np.full(R.shape[0], _LUTs.shape[0], dtype=np.int32)
+    LUTs_flat = _LUTs.ravel()
+    while np.any(lo < hi):
+        b_active     = lo < hi
+        mid          = np.minimum((lo + hi) // 2, _LUTs.shape[0] - 1)
+        offset       = mid * 256
+        tmp_img_RGB  = np.stack([LUTs_flat[offset+R], LUTs_flat[offset+G], LUTs_flat[offset+B]], axis=1)
+        tmp_img_Gray = cv2.cvtColor(tmp_img_RGB.reshape(-1, 1, 3), cv2.COLOR_RGB2GRAY).ravel()
+        b_reached    = tmp_img_Gray >= _ref_pixel_value
+
+        hi = np.where(b_active &  b_reached, mid,     hi)
+        lo = np.where(b_active & ~b_reached, mid + 1, lo)
+    # end while
+
+    return lo, counts
+# End of search_threshold_crossing_index()
+
+
+
+# Same result as the linear search, but every distinct RGB value is examined only once
+def determine_amplification_factor_by_crossing(_img_RGB, _left_edge_pixel_value_L1, _pct_of_ref_section, _N_all_non_bgcolor):
+    p_grid = create_p_grid(p_init, p_interval, p_max)
+    LUTs   = create_amplification_LUTs(p_grid)
+
+    # The number of pixels in the reference section for each "p" in the grid
+    crossing_index, counts  = search_threshold_crossing_index(_img_RGB, _left_edge_pixel_value_L1, LUTs)
+    num_of_pixels           = np.cumsum( np.bincount(crossing_index, weights=counts, minlength=len(p_grid)+1).astype(np.int64) )[:len(p_grid)]
+    tmp_pct_of_ref_section  = num_of_pixels / _N_all_non_bgcolor
+
+    # The first "p" which exceeds the pct. of reference section
+    b_index_exceeded        = tmp_pct_of_ref_section > _pct_of_ref_section
+    index                   = np.argmax(b_index_exceeded) if np.any(b_index_exceeded) else len(p_grid) - 1
+
+    # NOTE: Follow the same floating-point steps as the linear search
+    tmp_p                   = p_grid[index] + p_interval
+    p_final                 = round((tmp_p - p_interval), 2)
+    pct_of_ref_section      = round(tmp_pct_of_ref_section[index]*100, 1)
+
+    return p_final, pct_of_ref_section
+# End of determine_amplification_factor_by_crossing()
+
+
+
+# Search the left edge pixel value (L=1) with the reversed cumulative histogram
+def search_left_edge_pixel_value_L1(_bincount_L1, _right_edge_pixel_value, _N_all_non_bgcolor_L1, _pct_of_ref_section):
+    # The number of pixels in the section [v, right edge] for every pixel value v
+    num_of_pixels_in_section  = np.cumsum( _bincount_L1[:int(_right_edge_pixel_value)+1][::-1] )[::-1]
+    tmp_pct_of_ref_section_L1 = num_of_pixels_in_section / _N_all_non_bgcolor_L1
+
+    # The largest pixel value whose section exceeds the pct. of ref. section
+    b_index_exceeded          = tmp_pct_of_ref_section_L1 > _pct_of_ref_section
+    tmp_left_edge_pixel_value = np.flatnonzero(b_index_exceeded)[-1] if np.any(b_index_exceeded) else 0
+
+    # NOTE: The linear search stopped two pixel values below the exceeding one
+    left_edge_pixel_value_L1  = np.uint8(max(tmp_left_edge_pixel_value - 2, 0))
+
+    return left_edge_pixel_value_L1, tmp_pct_of_ref_section_L1[tmp_left_edge_pixel_value]
+# End of search_left_edge_pixel_value_L1()
 
 
 
 def determine_amplification_factor(_img_RGB, _right_edge_pixel_value, _pct_of_ref_section, _N_all_non_bgcolor):
     print("Theoretical pct. of ref. section (L=1) :", _pct_of_ref_section*100, "(%)")
 
-    # Initialize
-    tmp_pct_of_ref_section_L1    = 0.0
-    tmp_left_edge_pixel_value_L1 = _right_edge_pixel_value
-
     # NOTE: For the input image with L=1
     # Determine left edge pixel value in the input image with L=1
-    img_in_Gray_L1_non_bgcolor   = img_in_Gray_L1[img_in_Gray_L1 != BGColor_Gray]
-    while tmp_pct_of_ref_section_L1 <= _pct_of_ref_section:
-        # Temporarily, calculate the percentage of pixels in the reference section
-        tmp_num_of_pixels         = (tmp_left_edge_pixel_value_L1 <= img_in_Gray_L1_non_bgcolor) & (img_in_Gray_L1_non_bgcolor <= _right_edge_pixel_value)
-        tmp_pct_of_ref_section_L1 = np.sum( tmp_num_of_pixels ) / N_all_non_bgcolor_L1
-
-        # Next pixel value
-        tmp_left_edge_pixel_value_L1 -= 1
-    # end while
-
-    left_edge_pixel_value_L1    = tmp_left_edge_pixel_value_L1 - 1
+    left_edge_pixel_value_L1, tmp_pct_of_ref_section_L1 = search_left_edge_pixel_value_L1(bincount_L1, _right_edge_pixel_value, N_all_non_bgcolor_L1, _pct_of_ref_section)
     pct_of_ref_section_L1       = round(tmp_pct_of_ref_section_L1*100, 1)
     # print("Left edge pixel value (L=1)         :", left_edge_pixel_value_L1, "(pixel value)")
     # print("Right edge pixel value (L=1)        :", _right_edge_pixel_value, "(pixel value)")
@@ -450,6 +590,15 @@ def determine_amplification_factor(_img_RGB, _right_edge_pixel_value, _pct_of_re
 
     # NOTE: For the input image
     # Determine amplification factor "p" in the input image
+    if p_search_engine != "linear" and left_edge_pixel_value_L1 > BGColor_Gray:
+        if p_search_engine == "crossing":
+            p_final, pct_of_ref_section = determine_amplification_factor_by_crossing(_img_RGB, left_edge_pixel_value_L1, _pct_of_ref_section, _N_all_non_bgcolor)
+        else:
+            p_final, pct_of_ref_section = determine_amplification_factor_by_bisection(_img_RGB, left_edge_pixel_value_L1, _pct_of_ref_section, _N_all_non_bgcolor)
+        print("\nDetermined amplification factor \"p\"    :", p_final)
+
+        return p_final, left_edge_pixel_value_L1, pct_of_ref_section_L1, pct_of_ref_section
+
     tmp_p                       = p_init
     tmp_pct_of_ref_section      = 0.0
     tmp_img_RGB                 = np.empty((img_in_RGB.shape[0], img_in_RGB.shape[1], 3), dtype=np.uint8)
@@ -558,7 +707,7 @@ if __name__ == "__main__":
 
     # Calculate statistics for two input images
     N_all_non_bgcolor, mean_pixel_value, std_pixel_value = calculate_statistics_for_input_image()
-    N_all_non_bgcolor_L1, max_pixel_value_L1             = calculate_statistics_for_input_image_L1()
+    N_all_non_bgcolor_L1, max_pixel_value_L1, bincount_L1 = calculate_statistics_for_input_image_L1()
 
     print("\n")
     print("=============================================================================")
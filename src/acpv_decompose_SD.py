@@ -7,6 +7,8 @@ import subprocess
 import sys
 from scipy import stats
 
+from luminance_adjustment import create_amplification_LUT
+
 args = sys.argv
 if len(args) != 3:
     raise Exception('\nUSAGE\n> $ python acpv_decompose_SD.py [input_image_data] [input_image_data(LR=1)]')
@@ -384,14 +386,9 @@ def decomposeImage(_boundary_pixel_value):
 
 
 # Correct pixel value for each RGB
-def correctPixelValue(_rgb_img, _param):
-    # Apply change
-    corrected_img_RGB = np.empty((_rgb_img.shape[0], _rgb_img.shape[1], 3), dtype=np.uint8)
-    corrected_img_RGB[:, :, 0] = cv2.multiply(_rgb_img[:, :, 0], _param) # R
-    corrected_img_RGB[:, :, 1] = cv2.multiply(_rgb_img[:, :, 1], _param) # G
-    corrected_img_RGB[:, :, 2] = cv2.multiply(_rgb_img[:, :, 2], _param) # B
-
-    return corrected_img_RGB
+def correctPixelValue(_rgb_img, _param, _dst=None):
+    # Apply correction to the interleaved RGB channels at once
+    return cv2.LUT(_rgb_img, create_amplification_LUT(_param), dst=_dst)
 
 
 
@@ -4,6 +4,7 @@ import matplotlib.gridspec as gridspec
 import cv2
 import subprocess
 import sys
+from luminance_adjustment import create_amplification_LUT
 args = sys.argv
 if len(args) != 4:
     raise Exception('\nUSAGE\n> $ python auto_correct_pixel_value.py [input_image_data] [ratio_for_low] [ratio_for_high] [p_init] [ratio_for_high] [p_interval]')
@@ -197,18 +198,9 @@ print("\nN_theor_high(",ratio_for_high*100,"%)\n>", N_theor_high, "(pixels) (=",
 # --------------------------------
 # -----  Correct pixel value -----
 # --------------------------------
-def correct_pixel_value(_rgb_img, _param):
-    red   = cv2.multiply(_rgb_img[:, :, 0], _param) # R
-    green = cv2.multiply(_rgb_img[:, :, 1], _param) # G
-    blue  = cv2.multiply(_rgb_img[:, :, 2], _param) # B
-
-    # Apply change
-    corrected_img_RGB = np.empty((_rgb_img.shape[0], _rgb_img.shape[1], 3), dtype=np.uint8)
-    corrected_img_RGB[:, :, 0] = red
-    corrected_img_RGB[:, :, 1] = green
-    corrected_img_RGB[:, :, 2] = blue
-
-    return corrected_img_RGB
+def correct_pixel_value(_rgb_img, _param, _dst=None):
+    # Apply correction to the interleaved RGB channels at once
+    return cv2.LUT(_rgb_img, create_amplification_LUT(_param), dst=_dst)
 
 
 
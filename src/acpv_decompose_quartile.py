@@ -7,6 +7,8 @@ import subprocess
 import sys
 from scipy import stats
 
+from luminance_adjustment import create_amplification_LUT
+
 args = sys.argv
 if len(args) != 4:
     raise Exception('\nUSAGE\n> $ python auto_correct_pixel_value.py [input_image_data] [ratio_for_low] [ratio_for_high]')
@@ -208,14 +210,9 @@ print("\nN_theor_high(",ratio_for_high*100,"%)\n>", N_theor_high, "(pixels) (=",
 # --------------------------------
 # -----  Correct pixel value -----
 # --------------------------------
-def correct_pixel_value(_rgb_img, _param):
-    # Apply change
-    corrected_img_RGB = np.empty((_rgb_img.shape[0], _rgb_img.shape[1], 3), dtype=np.uint8)
-    corrected_img_RGB[:, :, 0] = cv2.multiply(_rgb_img[:, :, 0], _param) # R
-    corrected_img_RGB[:, :, 1] = cv2.multiply(_rgb_img[:, :, 1], _param) # G
-    corrected_img_RGB[:, :, 2] = cv2.multiply(_rgb_img[:, :, 2], _param) # B
-
-    return corrected_img_RGB
+def correct_pixel_value(_rgb_img, _param, _dst=None):
+    # Apply correction to the interleaved RGB channels at once
+    return cv2.LUT(_rgb_img, create_amplification_LUT(_param), dst=_dst)
 
 
 
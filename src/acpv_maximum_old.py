@@ -8,6 +8,8 @@ import subprocess
 import sys
 import statistics
 
+from luminance_adjustment import create_amplification_LUT
+
 plt.style.use('seaborn-white')
 
 args = sys.argv
@@ -189,15 +191,9 @@ if max_pixel_value_LR1 == 255:
 # --------------------------------------------
 # ----- Correct pixel value for each RGB -----
 # --------------------------------------------
-def correct_pixel_value(_rgb_img, _param):
-    corrected_img_RGB = np.empty((_rgb_img.shape[0], _rgb_img.shape[1], 3), dtype=np.uint8)
-
-    # Apply correction
-    corrected_img_RGB[:, :, 0] = cv2.multiply(_rgb_img[:, :, 0], _param) # R
-    corrected_img_RGB[:, :, 1] = cv2.multiply(_rgb_img[:, :, 1], _param) # G
-    corrected_img_RGB[:, :, 2] = cv2.multiply(_rgb_img[:, :, 2], _param) # B
-
-    return corrected_img_RGB
+def correct_pixel_value(_rgb_img, _param, _dst=None):
+    # Apply correction to the interleaved RGB channels at once
+    return cv2.LUT(_rgb_img, create_amplification_LUT(_param), dst=_dst)
 
 
 
@@ -0,0 +1,58 @@
+######################################
+#   @file   adjust_brightness_batch.py
+#   @author Tomomasa Uchida
+#   @date   2026/10/18
+######################################
+
+import argparse
+import os
+import time
+
+from luminance_adjustment import read_manifest, pair_images_by_glob, run_batch
+
+
+
+def main():
+    parser   = argparse.ArgumentParser(description="Brightness Adjustment for many (input, input_L1) pairs with a process pool")
+    parser.add_argument('-m',   '--manifest',   help="CSV file with \"input,input_L1\" in each line")
+    parser.add_argument('-i',   '--input',      help="Glob of the input images, e.g. \"images/*_input.bmp\"")
+    parser.add_argument('-l',   '--input_L1',   help="Glob of the input images with L=1 (paired with --input in sorted order)")
+    parser.add_argument('-o',   '--output_dir', default="IMAGE_DATA/batch")
+    parser.add_argument('-r',   '--results',    default=None, help="Results table (CSV). Default: [output_dir]/results.csv")
+    parser.add_argument('-w',   '--workers',    type=int, default=os.cpu_count())
+    parser.add_argument('-c',   '--chunksize',  type=int, default=1)
+    parser.add_argument('-p',   '--pct',        type=float, default=0.01, help="The pct. of reference section")
+    parser.add_argument('-e',   '--engine',     default="crossing", choices=["linear", "bisection", "crossing"])
+    parser.add_argument('-d',   '--cache_dir',  default=None, help="Directory of the statistics (L=1) cache. Default: no cache")
+    parser.add_argument('-s',   '--cache_size_MB', type=float, default=64.0, help="Size cap of the cache")
+    parser.add_argument(        '--metrics',    default=None, help="Per-stage metrics: Prometheus text (*.prom) or JSON lines (otherwise)")
+    parser.add_argument(        '--trace_memory', action="store_true", help="Also record the bytes allocated in each stage (slower)")
+    args     = parser.parse_args()
+
+    # Collect (input, input_L1) pairs
+    if args.manifest is not None:
+        pairs = read_manifest(args.manifest)
+    elif args.input is not None and args.input_L1 is not None:
+        pairs = pair_images_by_glob(args.input, args.input_L1)
+    else:
+        parser.error("either --manifest or both --input and --input_L1 are required")
+
+    results_name = args.results if args.results is not None else os.path.join(args.output_dir, "results.csv")
+    print("Number of pairs                  :", len(pairs))
+    print("Number of workers                :", args.workers)
+
+    # Adjust brightness
+    start_time    = time.time()
+    num_of_errors = run_batch(pairs, args.output_dir, results_name, args.workers, args.chunksize, args.pct, args.engine, args.cache_dir, int(args.cache_size_MB * 1024 * 1024), args.metrics, args.trace_memory)
+    end_time      = time.time() - start_time
+
+    print("Number of errors                 :", num_of_errors)
+    print("Results table                    :", results_name)
+    if args.metrics is not None:
+        print("Metrics                          :", args.metrics)
+    print("Processing time                  :", round(end_time, 2), "[sec]")
+    if len(pairs) > 0:
+        print("Throughput                       :", round(len(pairs) / end_time, 2), "[images/sec]")
+
+if __name__=="__main__":
+    main()
@@ -12,8 +12,12 @@ import matplotlib.patches as pat
 import cv2
 import subprocess
 import sys
+import math
 import statistics
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+from luminance_adjustment import create_amplification_LUT, create_p_grid, create_amplification_LUTs, search_first_satisfying_index, search_threshold_crossing_index
 
 # Graph settings
 # plt.style.use('seaborn-white')
@@ -47,6 +51,8 @@ if len(args) != 3:
 # Set initial parameter
 p_init              = 1.0
 p_interval          = 0.01
+p_max               = 256.0 # All non-zero 8-bit values are saturated with p >= 255.5
+p_search_engine     = "bisection" # "linear", "bisection" or "crossing"
 pct_of_ref_sec4high = 0.01  #  1(%)
 pct_of_ref_sec4low  = 0.1   # 10(%)
 BGColor             = [0, 0, 0] # Background color
@@ -312,7 +318,33 @@ def create_figure_for_inputL1_and_input_and_output_images(_fig_name):
 # End of create_figure_for_inputL1_and_input_and_output_images()
 
 
-def calculate_statistics_for_input_image():
+# Exclude background color from the 256-bin histogram of the grayscale image
+def exclude_bgcolor_from_histogram(_hist):
+    hist_non_bgcolor = _hist.copy()
+    hist_non_bgcolor[BGColor_Gray] = 0
+
+    return hist_non_bgcolor
+# End of exclude_bgcolor_from_histogram()
+
+
+
+# Number of pixels, max, mean and std pixel value of the pixels in the histogram
+# NOTE: The sums are exact integers, so the mean is the same as np.uint8(np.mean()) of the pixels,
+#       and the std is truncated exactly with the integer square root
+def calculate_statistics_from_histogram(_hist):
+    N_all               = np.sum(_hist)
+    sum_of_pixel_values = int(_hist @ np.arange(256, dtype=np.int64))
+    sum_of_squares      = int(_hist @ np.arange(256, dtype=np.int64)**2)
+    max_pixel_value     = np.uint8(np.flatnonzero(_hist)[-1])
+    mean_pixel_value    = np.uint8(sum_of_pixel_values / N_all)
+    std_pixel_value     = np.uint8(math.isqrt(int(N_all)*sum_of_squares - sum_of_pixel_values**2) // int(N_all))
+
+    return N_all, max_pixel_value, mean_pixel_value, std_pixel_value
+# End of calculate_statistics_from_histogram()
+
+
+
+def calculate_statistics_for_input_image(_hist_in_Gray):
     print("Input image (RGB)                      :", img_in_RGB.shape) # (height, width, channel)
 
     # Calc all number of pixels of the input image
@@ -320,22 +352,20 @@ def calculate_statistics_for_input_image():
     print("N_all                                  :", N_all, "(pixels)")
 
     # Exclude background color
-    img_in_Gray_non_bgcolor = img_in_Gray[img_in_Gray != BGColor_Gray]
+    # NOTE: All statistics are derived from the histogram
+    hist_in_Gray_non_bgcolor = exclude_bgcolor_from_histogram(_hist_in_Gray)
     
     # Calc the number of pixels excluding background color
-    N_all_non_bgcolor       = np.sum(img_in_Gray != BGColor_Gray)
+    N_all_non_bgcolor, max_pixel_value, mean_pixel_value, std_pixel_value = calculate_statistics_from_histogram(hist_in_Gray_non_bgcolor)
     print("N_all_non_bgcolor                      :", N_all_non_bgcolor, "(pixels)")
 
     # Calc mean pixel value
-    max_pixel_value         = np.max(img_in_Gray_non_bgcolor)
     print("Max pixel value                        :", max_pixel_value, "(pixel value)")
 
     # Calc mean pixel value
-    mean_pixel_value        = np.uint8(np.mean(img_in_Gray_non_bgcolor))
     print("Mean pixel value                       :", mean_pixel_value, "(pixel value)")
 
     # Calc std pixel value
-    std_pixel_value         = np.uint8(np.std(img_in_Gray_non_bgcolor))
     print("Std pixel value                        :", std_pixel_value, "(pixel value)")
 
     return N_all_non_bgcolor, mean_pixel_value, std_pixel_value
@@ -343,34 +373,32 @@ def calculate_statistics_for_input_image():
 
 
 
-def calculate_statistics_for_input_image_L1():
+def calculate_statistics_for_input_image_L1(_hist_in_Gray_L1):
     # Exclude background color
-    img_in_Gray_non_bgcolor_L1     = img_in_Gray_L1[img_in_Gray_L1 != BGColor_Gray]
+    # NOTE: The histogram (L=1) is reused for the reference pixel value search
+    bincount_L1                    = exclude_bgcolor_from_histogram(_hist_in_Gray_L1)
 
     # Calc the number of pixels excluding background color
-    N_all_non_bgcolor_L1           = np.sum(img_in_Gray_L1 != BGColor_Gray)
+    N_all_non_bgcolor_L1, max_pixel_value_L1, mean_pixel_value_L1, _ = calculate_statistics_from_histogram(bincount_L1)
 
     # Calc max pixel value of the input image (L=1)
-    max_pixel_value_L1             = np.max(img_in_Gray_non_bgcolor_L1)
     print("\nMax pixel value (L=1)                  :", max_pixel_value_L1, "(pixel value)")
 
     # Calc mean pixel value (L=1)
-    mean_pixel_value_L1            = np.uint8(np.mean(img_in_Gray_non_bgcolor_L1))
     print("Mean pixel value (L=1)                 :", round(mean_pixel_value_L1, 1), "(pixel value)")
 
     # Calc the pct. of the max pixel value (L=1)
-    num_max_pixel_value_L1         = np.sum(img_in_Gray_non_bgcolor_L1 == max_pixel_value_L1)
+    num_max_pixel_value_L1         = bincount_L1[max_pixel_value_L1]
     print("Num. of max pixel value (L=1)          :", num_max_pixel_value_L1, "(pixels)")
     pct_max_pixel_value_L1       = num_max_pixel_value_L1 / N_all_non_bgcolor_L1
     # pct_max_pixel_value_L1       = round(pct_max_pixel_value_L1, 8)
     print("The pct. of max pixel value (L=1)      :", round(pct_max_pixel_value_L1*100, 2), "(%)")
 
     # Calc most frequent pixel value (L=1)
-    bincount = np.bincount(img_in_Gray_non_bgcolor_L1)
-    most_frequent_pixel_value_L1   = np.argmax( bincount )
+    most_frequent_pixel_value_L1   = np.argmax( bincount_L1 )
     print("Most frequent pixel value (L=1)        :", most_frequent_pixel_value_L1, "(pixel value)")
 
-    return N_all_non_bgcolor_L1, max_pixel_value_L1
+    return N_all_non_bgcolor_L1, max_pixel_value_L1, bincount_L1
 # End of calculate_statistics_for_input_image_L1()
 
 
@@ -389,21 +417,16 @@ def decompose_input_image(_threshold_pixel_value):
     print("The pct. of low pixel values           :", round(N_low/N_all_non_bgcolor*100),    "(%)")
 
     # Apply decomposition and create low and high pixel value images
-    high_img_in_RGB, low_img_in_RGB = img_in_RGB.copy(), img_in_RGB.copy()
-    high_img_in_RGB[:,:,0] = np.where(b_index_high, img_in_RGB[:,:,0], BGColor[0])
-    high_img_in_RGB[:,:,1] = np.where(b_index_high, img_in_RGB[:,:,1], BGColor[1])
-    high_img_in_RGB[:,:,2] = np.where(b_index_high, img_in_RGB[:,:,2], BGColor[2])
-    low_img_in_RGB[:,:,0]  = np.where(b_index_low,  img_in_RGB[:,:,0], BGColor[0])
-    low_img_in_RGB[:,:,1]  = np.where(b_index_low,  img_in_RGB[:,:,1], BGColor[1])
-    low_img_in_RGB[:,:,2]  = np.where(b_index_low,  img_in_RGB[:,:,2], BGColor[2])
-
-    # Convert RGB image to Grayscale image
-    high_img_in_Gray = cv2.cvtColor(high_img_in_RGB, cv2.COLOR_RGB2GRAY)
-    low_img_in_Gray  = cv2.cvtColor(low_img_in_RGB,  cv2.COLOR_RGB2GRAY)
-
-    # Calulate mean pixel value
-    mean_pixel_value_high  = np.uint8(np.mean(high_img_in_Gray[high_img_in_Gray != BGColor_Gray]))
-    mean_pixel_value_low   = np.uint8(np.mean(low_img_in_Gray[low_img_in_Gray   != BGColor_Gray]))
+    high_img_in_RGB = np.where(b_index_high[:,:,np.newaxis], img_in_RGB, np.array(BGColor, dtype=np.uint8))
+    low_img_in_RGB  = np.where(b_index_low[:,:,np.newaxis],  img_in_RGB, np.array(BGColor, dtype=np.uint8))
+
+    # Calulate mean pixel value from one histogram labelled with low (0) and high (1)
+    # NOTE: The grayscale value of each pixel does not change by the decomposition
+    b_index_non_bgcolor_Gray = (b_index_high | b_index_low) & (img_in_Gray != BGColor_Gray)
+    labelled_hist          = np.bincount(b_index_high[b_index_non_bgcolor_Gray].astype(np.intp)*256 + img_in_Gray[b_index_non_bgcolor_Gray], minlength=2*256).reshape(2, 256)
+    sum_of_pixel_values    = labelled_hist @ np.arange(256)
+    mean_pixel_value_low   = np.uint8(sum_of_pixel_values[0] / np.sum(labelled_hist[0]))
+    mean_pixel_value_high  = np.uint8(sum_of_pixel_values[1] / np.sum(labelled_hist[1]))
     print("Mean pixel value (high image)          :", mean_pixel_value_high, "(pixel value)")
     print("Mean pixel value (low image)           :", mean_pixel_value_low,  "(pixel value)")
 
@@ -412,53 +435,138 @@ def decompose_input_image(_threshold_pixel_value):
 
 
 
+# Resynthesize the adjusted "high" and "low" pixel value images in one pass:
+# each pixel of the input image is adjusted with the LUT of "p_high" or "p_low" selected by its label
+# NOTE: The same image as cv2.scaleAdd() of the adjusted images for the black background,
+#       and the background color is kept as it is for the other ones
+def resynthesize_adjusted_images(_threshold_pixel_value, _p_high, _p_low):
+    # Table of "LUTs[label, pixel value, channel]" with the labels background (0), low (1) and high (2)
+    LUTs    = np.empty((3, 256, 3), dtype=np.uint8)
+    LUTs[0] = np.array(BGColor, dtype=np.uint8)
+    LUTs[1] = create_amplification_LUT(_p_low).reshape(256, 1)
+    LUTs[2] = create_amplification_LUT(_p_high).reshape(256, 1)
+    LUTs    = LUTs.ravel()
+
+    label_map = (img_in_Gray  > _threshold_pixel_value).astype(np.uint8) + np.uint8(1)
+    label_map[b_index_bgcolor] = 0
+
+    # Look up each pixel and channel in the table: (label * 256 + pixel value) * 3 + channel
+    adjusted_img_RGB = np.empty_like(img_in_RGB)
+    num_of_rows      = max(1, (1 << 18) // max(1, img_in_RGB.shape[1]))
+    for start in range(0, img_in_RGB.shape[0], num_of_rows):
+        index  = np.multiply(img_in_RGB[start:start+num_of_rows], 3, dtype=np.intp)
+        index += label_map[start:start+num_of_rows, :, np.newaxis] * np.intp(256 * 3)
+        index += np.arange(3)
+        np.take(LUTs, index, out=adjusted_img_RGB[start:start+num_of_rows])
+    # end for
+
+    return adjusted_img_RGB
+# End of resynthesize_adjusted_images()
+
+
+
 # Adjust pixel value for each RGB
 def tmp_adjust_pixel_value(_tmp_img_RGB, _img_RGB, _amplification_factor):
-    # tmp_adjusted_img_RGB = np.empty((_img_RGB.shape[0], _img_RGB.shape[1], 3), dtype=np.uint8)
+    # Apply adjustment into the caller-supplied buffer
+    return cv2.LUT(_img_RGB, create_amplification_LUT(_amplification_factor), dst=_tmp_img_RGB)
+# End of tmp_adjust_pixel_value()
 
-    # Apply adjustment
-    _tmp_img_RGB[:,:,0] = cv2.multiply(_img_RGB[:,:,0], _amplification_factor) # R
-    _tmp_img_RGB[:,:,1] = cv2.multiply(_img_RGB[:,:,1], _amplification_factor) # G
-    _tmp_img_RGB[:,:,2] = cv2.multiply(_img_RGB[:,:,2], _amplification_factor) # B
 
-    return _tmp_img_RGB
 
-    # tmp_img_RGB = _img_RGB * _amplification_factor
-    # return tmp_img_RGB
-# End of tmp_adjust_pixel_value()
+# Calculate the pct. of pixels in the reference section of the image adjusted with "p"
+def calc_pct_of_ref_section(_tmp_img_RGB, _img_RGB, _p, _left_edge_pixel_value_L1, _N_all_non_bgcolor):
+    tmp_adjusted_img_RGB    = tmp_adjust_pixel_value(_tmp_img_RGB, _img_RGB, _p)
+    tmp_adjusted_img_Gray   = cv2.cvtColor(tmp_adjusted_img_RGB, cv2.COLOR_RGB2GRAY)
 
+    # Exclude background color
+    tmp_adjusted_img_Gray_non_bgcolor = tmp_adjusted_img_Gray[tmp_adjusted_img_Gray != BGColor_Gray]
+
+    tmp_num_of_pixels       = (_left_edge_pixel_value_L1 <= tmp_adjusted_img_Gray_non_bgcolor)
+
+    return np.sum( tmp_num_of_pixels ) / _N_all_non_bgcolor
+# End of calc_pct_of_ref_section()
+
+
+
+# Same result as the linear search, but with O(log n) adjustments of the whole image
+def determine_amplification_factor_by_bisection(_img_RGB, _left_edge_pixel_value_L1, _pct_of_ref_section, _N_all_non_bgcolor):
+    p_grid      = create_p_grid(p_init, p_interval, p_max)
+    tmp_img_RGB = np.empty((_img_RGB.shape[0], _img_RGB.shape[1], 3), dtype=np.uint8)
+    index       = search_first_satisfying_index(
+        lambda _index: calc_pct_of_ref_section(tmp_img_RGB, _img_RGB, p_grid[_index], _left_edge_pixel_value_L1, _N_all_non_bgcolor) > _pct_of_ref_section,
+        len(p_grid))
+
+    # NOTE: Follow the same floating-point steps as the linear search
+    tmp_p                   = p_grid[index] + p_interval
+    p_final                 = round((tmp_p - p_interval), 2)
+    pct_of_ref_section      = round(calc_pct_of_ref_section(tmp_img_RGB, _img_RGB, p_grid[index], _left_edge_pixel_value_L1, _N_all_non_bgcolor)*100, 1)
+
+    return p_final, pct_of_ref_section
+# End of determine_amplification_factor_by_bisection()
 
 
-def determine_amplification_factor(_img_RGB, _right_edge_pixel_value, _pct_of_ref_section, _N_all_non_bgcolor):
-    print("Theoretical pct. of ref. section (L=1) :", _pct_of_ref_section*100, "(%)")
 
-    # Initialize
-    tmp_pct_of_ref_section_L1    = 0.0
-    tmp_left_edge_pixel_value_L1 = _right_edge_pixel_value
+# Same result as the linear search, but every distinct RGB value is examined only once
+def determine_amplification_factor_by_crossing(_img_RGB, _left_edge_pixel_value_L1, _pct_of_ref_section, _N_all_non_bgcolor):
+    p_grid = create_p_grid(p_init, p_interval, p_max)
+    LUTs   = create_amplification_LUTs(p_grid)
 
+    # The number of pixels in the reference section for each "p" in the grid
+    crossing_index, counts  = search_threshold_crossing_index(_img_RGB, _left_edge_pixel_value_L1, LUTs)
+    num_of_pixels           = np.cumsum( np.bincount(crossing_index, weights=counts, minlength=len(p_grid)+1).astype(np.int64) )[:len(p_grid)]
+    tmp_pct_of_ref_section  = num_of_pixels / _N_all_non_bgcolor
+
+    # The first "p" which exceeds the pct. of reference section
+    b_index_exceeded        = tmp_pct_of_ref_section > _pct_of_ref_section
+    index                   = np.argmax(b_index_exceeded) if np.any(b_index_exceeded) else len(p_grid) - 1
+
+    # NOTE: Follow the same floating-point steps as the linear search
+    tmp_p                   = p_grid[index] + p_interval
+    p_final                 = round((tmp_p - p_interval), 2)
+    pct_of_ref_section      = round(tmp_pct_of_ref_section[index]*100, 1)
+
+    return p_final, pct_of_ref_section
+# End of determine_amplification_factor_by_crossing()
+
+
+
+# Search the left edge pixel value (L=1) with the reversed cumulative histogram
+def search_left_edge_pixel_value_L1(_bincount_L1, _right_edge_pixel_value, _N_all_non_bgcolor_L1, _pct_of_ref_section):
+    # The number of pixels in the section [v, right edge] for every pixel value v
+    num_of_pixels_in_section  = np.cumsum( _bincount_L1[:int(_right_edge_pixel_value)+1][::-1] )[::-1]
+    tmp_pct_of_ref_section_L1 = num_of_pixels_in_section / _N_all_non_bgcolor_L1
+
+    # The largest pixel value whose section exceeds the pct. of ref. section
+    b_index_exceeded          = tmp_pct_of_ref_section_L1 > _pct_of_ref_section
+    tmp_left_edge_pixel_value = np.flatnonzero(b_index_exceeded)[-1] if np.any(b_index_exceeded) else 0
+
+    # NOTE: The linear search stopped two pixel values below the exceeding one
+    left_edge_pixel_value_L1  = np.uint8(max(tmp_left_edge_pixel_value - 2, 0))
+
+    return left_edge_pixel_value_L1, tmp_pct_of_ref_section_L1[tmp_left_edge_pixel_value]
+# End of search_left_edge_pixel_value_L1()
+
+
+
+def determine_amplification_factor(_img_RGB, _right_edge_pixel_value, _pct_of_ref_section, _N_all_non_bgcolor):
     # NOTE: For the input image with L=1
     # Determine left edge pixel value in the input image with L=1
-    img_in_Gray_L1_non_bgcolor   = img_in_Gray_L1[img_in_Gray_L1 != BGColor_Gray]
-    while tmp_pct_of_ref_section_L1 <= _pct_of_ref_section:
-        # Temporarily, calculate the percentage of pixels in the reference section
-        tmp_num_of_pixels         = (tmp_left_edge_pixel_value_L1 <= img_in_Gray_L1_non_bgcolor) & (img_in_Gray_L1_non_bgcolor <= _right_edge_pixel_value)
-        tmp_pct_of_ref_section_L1 = np.sum( tmp_num_of_pixels ) / N_all_non_bgcolor_L1
-
-        # Next pixel value
-        tmp_left_edge_pixel_value_L1 -= 1
-        # tmp_left_edge_pixel_value_L1 += 1
-    # end while
-
-    left_edge_pixel_value_L1    = tmp_left_edge_pixel_value_L1 - 1
+    left_edge_pixel_value_L1, tmp_pct_of_ref_section_L1 = search_left_edge_pixel_value_L1(bincount_L1, _right_edge_pixel_value, N_all_non_bgcolor_L1, _pct_of_ref_section)
     pct_of_ref_section_L1       = round(tmp_pct_of_ref_section_L1*100, 1)
     # print("Left edge pixel value (L=1)         :", left_edge_pixel_value_L1, "(pixel value)")
     # print("Right edge pixel value (L=1)        :", _right_edge_pixel_value, "(pixel value)")
-    print("Reference section (L=1)                :", "[", left_edge_pixel_value_L1, ",", _right_edge_pixel_value, "]", "(pixel value)")
-    print("Actual pct. of ref. section (L=1)      :", pct_of_ref_section_L1, "(%)")
 
 
     # NOTE: For the input image
     # Determine amplification factor "p" in the input image
+    if p_search_engine != "linear" and left_edge_pixel_value_L1 > BGColor_Gray:
+        if p_search_engine == "crossing":
+            p_final, pct_of_ref_section = determine_amplification_factor_by_crossing(_img_RGB, left_edge_pixel_value_L1, _pct_of_ref_section, _N_all_non_bgcolor)
+        else:
+            p_final, pct_of_ref_section = determine_amplification_factor_by_bisection(_img_RGB, left_edge_pixel_value_L1, _pct_of_ref_section, _N_all_non_bgcolor)
+
+        return p_final, left_edge_pixel_value_L1, pct_of_ref_section_L1, pct_of_ref_section
+
     tmp_p                       = p_init
     tmp_pct_of_ref_section      = 0.0
     tmp_img_RGB                 = np.empty((img_in_RGB.shape[0], img_in_RGB.shape[1], 3), dtype=np.uint8)
@@ -481,7 +589,6 @@ def determine_amplification_factor(_img_RGB, _right_edge_pixel_value, _pct_of_re
 
     p_final                     = round((tmp_p - p_interval), 2)
     pct_of_ref_section          = round(tmp_pct_of_ref_section*100, 1)
-    print("\nDetermined amplification factor \"p\"    :", p_final)
 
     return p_final, left_edge_pixel_value_L1, pct_of_ref_section_L1, pct_of_ref_section
 # End of determine_amplification_factor()
@@ -502,9 +609,8 @@ def adjust_pixel_value(_img_RGB, _p_final, _left_edge_pixel_value_L1, _right_edg
     # tmp_num_of_pixels = (_left_edge_pixel_value_L1 <= adjusted_img_Gray_non_bgcolor) & (adjusted_img_Gray_non_bgcolor <= _right_edge_pixel_value)
     tmp_num_of_pixels           = _left_edge_pixel_value_L1 <= adjusted_img_Gray_non_bgcolor
     final_pct_of_ref_section    = np.sum( tmp_num_of_pixels ) / _N_all_non_bgcolor
-    print("Final pct. of ref. section             :", round(final_pct_of_ref_section*100, 1), "(%)")
 
-    return adjusted_img_RGB
+    return adjusted_img_RGB, final_pct_of_ref_section
 # End of adjust_pixel_value()
 
 
@@ -514,13 +620,24 @@ def brightness_adjustment(_img_RGB, _right_edge_pixel_value, _pct_of_ref_section
     p_final, left_edge_pixel_value_L1, pct_of_ref_section_L1, pct_of_ref_section = determine_amplification_factor(_img_RGB, _right_edge_pixel_value, _pct_of_ref_section, _N_all)
     
     # Adjust brightness of the image
-    adjusted_img_RGB = adjust_pixel_value(_img_RGB, p_final, left_edge_pixel_value_L1, _right_edge_pixel_value, _N_all)
+    adjusted_img_RGB, final_pct_of_ref_section = adjust_pixel_value(_img_RGB, p_final, left_edge_pixel_value_L1, _right_edge_pixel_value, _N_all)
 
-    return adjusted_img_RGB, p_final, left_edge_pixel_value_L1, pct_of_ref_section_L1, pct_of_ref_section
+    return adjusted_img_RGB, p_final, left_edge_pixel_value_L1, pct_of_ref_section_L1, pct_of_ref_section, final_pct_of_ref_section
 # End of brightness_adjustment()
 
 
 
+# NOTE: brightness_adjustment() prints nothing, since the "high" and "low" images are adjusted at the same time
+def print_brightness_adjustment(_right_edge_pixel_value, _pct_of_ref_section, _left_edge_pixel_value_L1, _pct_of_ref_section_L1, _p_final, _final_pct_of_ref_section):
+    print("Theoretical pct. of ref. section (L=1) :", _pct_of_ref_section*100, "(%)")
+    print("Reference section (L=1)                :", "[", _left_edge_pixel_value_L1, ",", _right_edge_pixel_value, "]", "(pixel value)")
+    print("Actual pct. of ref. section (L=1)      :", _pct_of_ref_section_L1, "(%)")
+    print("\nDetermined amplification factor \"p\"    :", _p_final)
+    print("Final pct. of ref. section             :", round(_final_pct_of_ref_section*100, 1), "(%)")
+# End of print_brightness_adjustment()
+
+
+
 def save_images(_adjusted_img_out_RGB, _p_high, _p_low):
     # Save input image
     input_img_name      = "IMAGE_DATA/input.bmp"
@@ -574,8 +691,12 @@ if __name__ == "__main__":
     start_time     = time.time()
 
     # Calculate statistics for two input images
-    N_all_non_bgcolor, mean_pixel_value, std_pixel_value = calculate_statistics_for_input_image()
-    N_all_non_bgcolor_L1, max_pixel_value_L1             = calculate_statistics_for_input_image_L1()
+    # NOTE: One 256-bin histogram for each input image (background color included).
+    #       The statistics are derived from it.
+    hist_in_Gray    = np.bincount(img_in_Gray.ravel(),    minlength=256)
+    hist_in_Gray_L1 = np.bincount(img_in_Gray_L1.ravel(), minlength=256)
+    N_all_non_bgcolor, mean_pixel_value, std_pixel_value = calculate_statistics_for_input_image(hist_in_Gray)
+    N_all_non_bgcolor_L1, max_pixel_value_L1, bincount_L1 = calculate_statistics_for_input_image_L1(hist_in_Gray_L1)
 
     print("\n")
     print("=============================================================================")
@@ -587,26 +708,35 @@ if __name__ == "__main__":
     # threshold_pixel_value           = np.uint8(mean_pixel_value)
     high_img_in_RGB, low_img_in_RGB, N_high, N_low, mean_pixel_value_high, mean_pixel_value_low = decompose_input_image(threshold_pixel_value)
 
+    # NOTE: The right edge pixel value for the "low" image is already known here,
+    #       so "p" of the "high" and "low" images are determined at the same time.
+    #       OpenCV and NumPy release the GIL, so the two threads run on two cores.
+    right_edge_pixel_value_high     = max_pixel_value_L1
+    right_edge_pixel_value_low      = mean_pixel_value_high
+    # right_edge_pixel_value_low      = mean_pixel_value + 3*std_pixel_value
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future_low = executor.submit(brightness_adjustment, low_img_in_RGB, right_edge_pixel_value_low, pct_of_ref_sec4low, N_low)
+        adjusted_high_img_in_RGB, p_high, left_edge_pixel_value_high, pct_of_ref_section_L1_high, pct_of_ref_section_high, final_pct_of_ref_section_high  = brightness_adjustment(high_img_in_RGB, right_edge_pixel_value_high, pct_of_ref_sec4high, N_high)
+        adjusted_low_img_in_RGB, p_low, left_edge_pixel_value_low, pct_of_ref_section_L1_low, pct_of_ref_section_low, final_pct_of_ref_section_low           = future_low.result()
+    # end with
+
     print("\n")
     print("=============================================================================")
     print("   Step2. Adjust brightness of the \"high\" pixel value image")
     print("=============================================================================")
-    right_edge_pixel_value_high     = max_pixel_value_L1
-    adjusted_high_img_in_RGB, p_high, left_edge_pixel_value_high, pct_of_ref_section_L1_high, pct_of_ref_section_high         = brightness_adjustment(high_img_in_RGB, right_edge_pixel_value_high, pct_of_ref_sec4high, N_high)
+    print_brightness_adjustment(right_edge_pixel_value_high, pct_of_ref_sec4high, left_edge_pixel_value_high, pct_of_ref_section_L1_high, p_high, final_pct_of_ref_section_high)
 
     print("\n")
     print("=============================================================================")
     print("   Step3. Adjust brightness of the \"low\" pixel value image")
     print("=============================================================================")
-    right_edge_pixel_value_low      = mean_pixel_value_high
-    # right_edge_pixel_value_low      = mean_pixel_value + 3*std_pixel_value
-    adjusted_low_img_in_RGB, p_low, left_edge_pixel_value_low, pct_of_ref_section_L1_low, pct_of_ref_section_low          = brightness_adjustment(low_img_in_RGB, right_edge_pixel_value_low, pct_of_ref_sec4low, N_low)
+    print_brightness_adjustment(right_edge_pixel_value_low, pct_of_ref_sec4low, left_edge_pixel_value_low, pct_of_ref_section_L1_low, p_low, final_pct_of_ref_section_low)
 
     print("\n")
     print("=============================================================================")
     print("   Step4. Resynthesis \"high\" and \"low\" pixel value images")
     print("=============================================================================")
-    adjusted_img_out_RGB            = cv2.scaleAdd(adjusted_high_img_in_RGB, 1.0, adjusted_low_img_in_RGB)
+    adjusted_img_out_RGB            = resynthesize_adjusted_images(threshold_pixel_value, p_high, p_low)
     adjusted_img_out_Gray           = cv2.cvtColor(adjusted_img_out_RGB, cv2.COLOR_RGB2GRAY)
     mean_pixel_value_adjusted       = np.mean(adjusted_img_out_Gray[adjusted_img_out_Gray != BGColor_Gray])
 
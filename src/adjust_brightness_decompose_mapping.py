@@ -15,6 +15,8 @@ import sys
 import statistics
 import time
 
+from luminance_adjustment import create_amplification_LUT, create_p_grid, search_first_satisfying_index
+
 # Graph settings
 plt.style.use('seaborn-white')
 colors = cycler('color', ['#EE6666', '#3388BB', '#9988DD', '#EECC55', '#88BB44', '#FFBBBB'])
@@ -45,6 +47,8 @@ if len(args) != 3:
 # Set initial parameter
 p_init      = 1.0
 p_interval  = 0.01
+p_max       = 256.0 # All non-zero 8-bit values are saturated with p >= 255.5
+p_search_engine = "bisection" # "linear" or "bisection"
 ratio_of_ref_section = 0.01 # 1(%)
 bgcolor     = 0 # Background color : Black(0, 0, 0)
 print("\n")
@@ -209,43 +213,44 @@ def createFigure(_img_in_RGB_L1, _img_in_RGB, _img_adjusted_RGB, _ref_pixel_valu
 
 
 # Adjust Pixel Value for each RGB
-def adjust_pixel_value(_rgb_img, _adjust_param):
-    adjusted_img_RGB = np.empty((_rgb_img.shape[0], _rgb_img.shape[1], 3), dtype=np.uint8)
+def adjust_pixel_value(_rgb_img, _adjust_param, _dst=None):
+    # Apply adjustment to the interleaved RGB channels at once
+    return cv2.LUT(_rgb_img, create_amplification_LUT(_adjust_param), dst=_dst)
 
-    # Apply adjustment
-    adjusted_img_RGB[:, :, 0] = cv2.multiply(_rgb_img[:, :, 0], _adjust_param) # R
-    adjusted_img_RGB[:, :, 1] = cv2.multiply(_rgb_img[:, :, 1], _adjust_param) # G
-    adjusted_img_RGB[:, :, 2] = cv2.multiply(_rgb_img[:, :, 2], _adjust_param) # B
 
-    return adjusted_img_RGB
 
+# Search the threshold pixel value
+# Index of the bin just after the largest jump between two neighboring bins, skipping the darkest "_pct_of_skipped_bins" of the bins
+# NOTE: The first one of the largest jumps, and -1 if no bin is searched or the histogram is empty (no jump)
+# NOTE: The histogram is smoothed with the moving average of "_smoothing_window" bins before differencing
+def searchLargestJumpIndex(_hist, _pct_of_skipped_bins=0.1, _smoothing_window=1):
+    hist = np.asarray(_hist)
+    if not np.any(hist):
+        return -1
 
+    if _smoothing_window > 1:
+        hist = np.convolve(hist, np.ones(_smoothing_window) / _smoothing_window, mode="same")
 
-# Search the threshold pixel value
-def searchThresholdPixelValue(_img_in_RGB):
-    # Convert RGB to Grayscale
-    img_in_Gray = cv2.cvtColor(_img_in_RGB, cv2.COLOR_RGB2GRAY)
+    first_index = int(hist.size * _pct_of_skipped_bins)
+    diff        = np.abs(np.diff(hist))[first_index:]
+    if diff.size == 0:
+        return -1
 
-    # Get histogram of input image
-    hist, bins = np.histogram(img_in_Gray[img_in_Gray != bgcolor], bins=bin_number)
+    return first_index + int(np.argmax(diff)) + 1
 
-    # Convert "tuple" to "numpy array"
-    hist = np.array(hist) # print(hist.size)
-    bins = np.array(bins) # print(bins)
 
-    # Search a threshold pixel value
-    diff_max, index4bins = -1, -1
-    for i in range(int(hist.size*0.1), hist.size-1):
-        diff = np.abs(hist[i] - hist[i+1])
-        # print("diff = ", diff)
 
-        if diff > diff_max:
-            diff_max    = diff
-            index4bins  = i+1
-        # end if
-    # end for
+def searchThresholdPixelValue(_hist_in_Gray_non_bgcolor, _bin_number, _pct_of_skipped_bins=0.1, _smoothing_window=1):
+    # Get histogram of input image from its 256-bin histogram
+    # NOTE: Same bins and counts as np.histogram() of the pixels, since each pixel value falls into the same bin
+    pixel_values = np.flatnonzero(_hist_in_Gray_non_bgcolor).astype(np.uint8)
+    if pixel_values.size == 0:
+        raise ValueError("The input image has no pixel except the background color")
+    hist, bins   = np.histogram(np.arange(256, dtype=np.uint8), bins=_bin_number, range=(pixel_values[0], pixel_values[-1]), weights=_hist_in_Gray_non_bgcolor)
 
-    threshold_pixel_value = int(bins[index4bins]) + int(255/bin_number)
+    # Search a threshold pixel value
+    index4bins   = searchLargestJumpIndex(hist.astype(np.int64), _pct_of_skipped_bins, _smoothing_window)
+    threshold_pixel_value = int(bins[index4bins]) + int(255/_bin_number)
 
     return threshold_pixel_value
 
@@ -326,6 +331,20 @@ def decomposeImage(_img_in_RGB, _threshold_pixel_value):
 
 
 
+# Mapping of the pixel values from [_src_min, _src_max] to [_dst_min, _dst_max] as a 256-entry LUT
+# NOTE: The mapping is the same for every pixel value of every channel, so the float operations
+#       (and the truncation to uint8) are done once for 256 pixel values, not for each pixel
+def createMappingLUT(_src_min, _src_max, _dst_min, _dst_max):
+    pixel_values = np.arange(256, dtype=np.uint8)
+    mapping_LUT  = cv2.subtract(pixel_values, float(_src_min)).astype(float)
+    mapping_LUT  = cv2.divide(mapping_LUT,    float(_src_max-_src_min))
+    mapping_LUT  = cv2.multiply(mapping_LUT,  float(_dst_max-_dst_min))
+    mapping_LUT  = cv2.add(mapping_LUT,       float(_dst_min))
+
+    return mapping_LUT.astype(np.uint8)
+
+
+
 def mappingPixelValue(_b_index_high, _low_img_in_RGB, _high_img_in_RGB):
     # Convert RGB image to Grayscale image
     low_img_in_Gray  = cv2.cvtColor(_low_img_in_RGB,  cv2.COLOR_RGB2GRAY)
@@ -344,32 +363,9 @@ def mappingPixelValue(_b_index_high, _low_img_in_RGB, _high_img_in_RGB):
     high_max  = high_img_in_Gray_non_bgcolor.max()
     print("( high_min, high_max ) = (", high_min, ",", high_max, ")")
     
-    # Mapping "high" to "low"
-    tmp_img_uint8 = _high_img_in_RGB.copy()
-    tmp_img_float = tmp_img_uint8.astype(float)
-    
-    tmp_img_float[:,:,0] = cv2.subtract(tmp_img_uint8[:,:,0],   float(high_min)) # R
-    tmp_img_float[:,:,1] = cv2.subtract(tmp_img_uint8[:,:,1],   float(high_min)) # G
-    tmp_img_float[:,:,2] = cv2.subtract(tmp_img_uint8[:,:,2],   float(high_min)) # B
-
-    tmp_img_float[:,:,0] = cv2.divide(tmp_img_float[:,:,0],     float(high_max-high_min))
-    tmp_img_float[:,:,1] = cv2.divide(tmp_img_float[:,:,1],     float(high_max-high_min))
-    tmp_img_float[:,:,2] = cv2.divide(tmp_img_float[:,:,2],     float(high_max-high_min))
-
-    tmp_img_float[:,:,0] = cv2.multiply(tmp_img_float[:,:,0],   float(low_max-low_min))
-    tmp_img_float[:,:,1] = cv2.multiply(tmp_img_float[:,:,1],   float(low_max-low_min))
-    tmp_img_float[:,:,2] = cv2.multiply(tmp_img_float[:,:,2],   float(low_max-low_min))
-
-    tmp_img_float[:,:,0] = cv2.add(tmp_img_float[:,:,0],        float(low_min))
-    tmp_img_float[:,:,1] = cv2.add(tmp_img_float[:,:,1],        float(low_min))
-    tmp_img_float[:,:,2] = cv2.add(tmp_img_float[:,:,2],        float(low_min))
-
-    tmp_img_uint8 = tmp_img_float.astype(np.uint8)
-
-    mapped_high_img_in_RGB  = _high_img_in_RGB.copy()
-    mapped_high_img_in_RGB[:,:,0] = np.where(_b_index_high, tmp_img_uint8[:,:,0], bgcolor)
-    mapped_high_img_in_RGB[:,:,1] = np.where(_b_index_high, tmp_img_uint8[:,:,1], bgcolor)
-    mapped_high_img_in_RGB[:,:,2] = np.where(_b_index_high, tmp_img_uint8[:,:,2], bgcolor)
+    # Mapping "high" to "low" with one LUT for the RGB channels at once
+    mapped_high_img_in_RGB  = cv2.LUT(_high_img_in_RGB, createMappingLUT(high_min, high_max, low_min, low_max))
+    mapped_high_img_in_RGB[~_b_index_high] = bgcolor
 
     mapped_high_img_in_Gray = cv2.cvtColor(mapped_high_img_in_RGB, cv2.COLOR_RGB2GRAY)
     mapped_high_img_in_Gray_non_bgcolor = mapped_high_img_in_Gray[mapped_high_img_in_Gray != bgcolor]
@@ -415,18 +411,18 @@ def preProcess(_img_RGB):
     print("N_all                            :", N_all, "(pixels)")
 
     # Exclude background color
-    img_in_Gray_non_bgcolor = img_in_Gray[img_in_Gray != bgcolor]
+    # NOTE: The histogram of "img_in_Gray" is computed once in main, and shared with searchThresholdPixelValue()
     
     # Calc the number of pixels excluding background color
-    N_all_non_bgcolor       = np.sum(img_in_Gray != bgcolor)
+    N_all_non_bgcolor       = np.sum(hist_in_Gray_non_bgcolor)
     print("N_all_non_bgcolor                :", N_all_non_bgcolor, "(pixels)")
 
     # Calc mean pixel value
-    max_pixel_value         = np.max(img_in_Gray_non_bgcolor)
+    max_pixel_value         = np.uint8(np.flatnonzero(hist_in_Gray_non_bgcolor)[-1])
     print("Max pixel value                  :", max_pixel_value, "(pixel value)")
 
     # Calc mean pixel value
-    mean_pixel_value        = np.mean(img_in_Gray_non_bgcolor)
+    mean_pixel_value        = (hist_in_Gray_non_bgcolor @ np.arange(256)) / N_all_non_bgcolor
     print("Mean pixel value                 :", round(mean_pixel_value, 1), "(pixel value)")
 
     return N_all_non_bgcolor
@@ -456,34 +452,61 @@ def preProcess4L1():
     print("Ratio of max pixel value (L=1)  :", round(ratio_max_pixel_value_L1*100, 2), "(%)")
 
     # Calc most frequent pixel value (L=1)
-    bincount = np.bincount(img_in_Gray_non_bgcolor_L1)
-    most_frequent_pixel_value_L1   = np.argmax( bincount )
+    bincount_L1                    = np.bincount(img_in_Gray_non_bgcolor_L1)
+    most_frequent_pixel_value_L1   = np.argmax( bincount_L1 )
     print("Most frequent pixel value (L=1) :", most_frequent_pixel_value_L1, "(pixel value)")
 
-    return img_in_Gray_L1, img_in_Gray_non_bgcolor_L1, N_all_non_bgcolor_L1, max_pixel_value_L1, ratio_max_pixel_value_L1, 
+    return img_in_Gray_L1, img_in_Gray_non_bgcolor_L1, N_all_non_bgcolor_L1, max_pixel_value_L1, ratio_max_pixel_value_L1, bincount_L1
 
 
 
-def determineAdjustParameter(_img_RGB, _img_in_Gray_non_bgcolor_L1, _N_all_non_bgcolor_L1, _max_pixel_value_L1, _ratio_of_ref_section):
-    # Initialize
-    tmp_ratio_of_ref_section = 0.0
-    ref_pixel_value_L1       = _max_pixel_value_L1
+# Calculate the ratio of pixels in the reference section of the image adjusted with "p"
+def calcRatioOfRefSection(_img_RGB, _p, _ref_pixel_value_L1):
+    tmp_img_adjusted_RGB   = adjust_pixel_value(_img_RGB, _p)
+    tmp_img_adjusted_Gray  = cv2.cvtColor(tmp_img_adjusted_RGB, cv2.COLOR_RGB2GRAY)
 
-    # Determine reference pixel value in the input image(L=1)
-    while tmp_ratio_of_ref_section < _ratio_of_ref_section:
-        # Temporarily calc    
-        sum_of_pixels_in_section  = np.sum( (ref_pixel_value_L1 <= _img_in_Gray_non_bgcolor_L1) )
-        tmp_ratio_of_ref_section  = sum_of_pixels_in_section / _N_all_non_bgcolor_L1
+    # Exclude background color
+    tmp_adjusted_img_non_bgcolor_Gray = tmp_img_adjusted_Gray[tmp_img_adjusted_Gray != bgcolor]
+
+    sum_of_pixels_in_ref_section = np.sum(_ref_pixel_value_L1 <= tmp_adjusted_img_non_bgcolor_Gray)
+
+    return sum_of_pixels_in_ref_section / N_all_non_bgcolor
+
+
+
+# Search the reference pixel value (L=1) with the reversed cumulative histogram
+def searchReferencePixelValue(_bincount_L1, _max_pixel_value_L1, _N_all_non_bgcolor_L1, _ratio_of_ref_section):
+    # The number of pixels in the section [v, max] for every pixel value v
+    num_of_pixels_in_section = np.cumsum( _bincount_L1[:int(_max_pixel_value_L1)+1][::-1] )[::-1]
+    tmp_ratio_of_ref_section = num_of_pixels_in_section / _N_all_non_bgcolor_L1
+
+    # The largest pixel value whose section satisfies the ratio of reference section
+    b_index_satisfied       = tmp_ratio_of_ref_section >= _ratio_of_ref_section
+    reference_pixel_value_L1 = np.flatnonzero(b_index_satisfied)[-1] if np.any(b_index_satisfied) else 0
 
-        # Next pixel value
-        ref_pixel_value_L1 -= 1
+    return np.uint8(reference_pixel_value_L1), tmp_ratio_of_ref_section[reference_pixel_value_L1]
 
-    ref_pixel_value_L1 += 1
+
+
+def determineAdjustParameter(_img_RGB, _bincount_L1, _N_all_non_bgcolor_L1, _max_pixel_value_L1, _ratio_of_ref_section):
+    # Determine reference pixel value in the input image(L=1)
+    ref_pixel_value_L1, tmp_ratio_of_ref_section = searchReferencePixelValue(_bincount_L1, _max_pixel_value_L1, _N_all_non_bgcolor_L1, _ratio_of_ref_section)
     print("Reference pixel value (L=1)     :", ref_pixel_value_L1, "(pixel value)")
     print("Reference section (L=1)         :", ref_pixel_value_L1, "~", _max_pixel_value_L1, "(pixel value)")
     print("Ratio of reference section (L=1):", round(tmp_ratio_of_ref_section*100, 2), "(%)")
 
     # Determine tuning parameter
+    if p_search_engine == "bisection" and ref_pixel_value_L1 > bgcolor:
+        p_grid  = create_p_grid(p_init, p_interval, p_max)
+        index   = search_first_satisfying_index(
+            lambda _index: calcRatioOfRefSection(_img_RGB, p_grid[_index], ref_pixel_value_L1) >= _ratio_of_ref_section,
+            len(p_grid))
+
+        # NOTE: The linear search returns the "p" next to the satisfying one
+        p_final = round(p_grid[index] + p_interval, 2)
+
+        return p_final, ref_pixel_value_L1, tmp_ratio_of_ref_section
+
     p = p_init
     tmp_ratio = 0.0
     while tmp_ratio < _ratio_of_ref_section:
@@ -562,12 +585,12 @@ def BrightnessAdjustment(_img_RGB):
     print(" STEP1: Get max pixel value (L=1)")  
     print("====================================")
     N_all_non_bgcolor = preProcess(_img_RGB)
-    img_in_Gray_L1, img_in_Gray_non_bgcolor_L1, N_all_non_bgcolor_L1, max_pixel_value_L1, ratio_max_pixel_value_L1 = preProcess4L1()
+    img_in_Gray_L1, img_in_Gray_non_bgcolor_L1, N_all_non_bgcolor_L1, max_pixel_value_L1, ratio_max_pixel_value_L1, bincount_L1 = preProcess4L1()
 
     print("\n\n================================================")
     print(" STEP2: Search for reference pixel value (L=1)")
     print("=================================================")
-    p_final, ref_pixel_value_L1, ratio_of_ref_section_L1 = determineAdjustParameter(_img_RGB, img_in_Gray_non_bgcolor_L1, N_all_non_bgcolor_L1, max_pixel_value_L1, ratio_of_ref_section)
+    p_final, ref_pixel_value_L1, ratio_of_ref_section_L1 = determineAdjustParameter(_img_RGB, bincount_L1, N_all_non_bgcolor_L1, max_pixel_value_L1, ratio_of_ref_section)
 
     print("\n\n============================")
     print(" STEP3: Adjust pixel value")
@@ -592,9 +615,13 @@ if __name__ == "__main__":
     # Start time count
     start_time = time.time()
 
+    # 256-bin histogram of the input image, shared by preProcess() and searchThresholdPixelValue()
+    hist_in_Gray_non_bgcolor          = np.bincount(img_in_Gray.ravel(), minlength=256)
+    hist_in_Gray_non_bgcolor[bgcolor] = 0
+
     N_all_non_bgcolor = preProcess(img_in_RGB)
     bin_number  = 255
-    threshold_pixel_value           = searchThresholdPixelValue(img_in_RGB)
+    threshold_pixel_value           = searchThresholdPixelValue(hist_in_Gray_non_bgcolor, bin_number)
     b_index_high, low_img_in_RGB, high_img_in_RGB = decomposeImage(img_in_RGB, threshold_pixel_value)
     mapped_high_img_in_RGB = mappingPixelValue(b_index_high, low_img_in_RGB, high_img_in_RGB)
     mapped_img_in_RGB  = cv2.scaleAdd(low_img_in_RGB, 1.0, mapped_high_img_in_RGB)
@@ -7,7 +7,6 @@
 import numpy as np
 from matplotlib import pyplot as plt
 from matplotlib import cycler
-from scipy import stats
 import matplotlib.gridspec as gridspec
 import matplotlib.patches as pat
 import cv2
@@ -16,6 +15,8 @@ import sys
 import statistics
 import time
 
+from luminance_adjustment import create_amplification_LUT, create_p_grid, search_first_satisfying_index
+
 
 # Graph settings
 # plt.style.use('seaborn-white')
@@ -48,6 +49,8 @@ if len(args) != 3:
 # Set initial parameter
 p_init               = 1.0
 p_interval           = 0.01
+p_max                = 256.0 # All non-zero 8-bit values are saturated with p >= 255.5
+p_search_engine      = "bisection" # "linear" or "bisection"
 ratio_of_ref_section = 0.001 # 1(%)
 BGColor              = [0, 0, 0] # Background color
 BGColor_Gray         = np.uint8(0.299*BGColor[0]+0.587*BGColor[1]+0.114*BGColor[2])
@@ -216,40 +219,44 @@ def createFigure(_img_in_RGB_L1, _img_in_RGB, _img_adjusted_RGB, _ref_pixel_valu
 
 
 # Adjust Pixel Value for each RGB
-def adjust_pixel_value(_rgb_img, _adjust_param):
-    adjusted_img_RGB = np.empty((_rgb_img.shape[0], _rgb_img.shape[1], 3), dtype=np.uint8)
+def adjust_pixel_value(_rgb_img, _adjust_param, _dst=None):
+    # Apply adjustment to the interleaved RGB channels at once
+    return cv2.LUT(_rgb_img, create_amplification_LUT(_adjust_param), dst=_dst)
 
-    # Apply adjustment
-    adjusted_img_RGB[:, :, 0] = cv2.multiply(_rgb_img[:, :, 0], _adjust_param) # R
-    adjusted_img_RGB[:, :, 1] = cv2.multiply(_rgb_img[:, :, 1], _adjust_param) # G
-    adjusted_img_RGB[:, :, 2] = cv2.multiply(_rgb_img[:, :, 2], _adjust_param) # B
 
-    return adjusted_img_RGB
 
+# Index of the bin just after the largest jump between two neighboring bins, skipping the darkest "_pct_of_skipped_bins" of the bins
+# NOTE: The first one of the largest jumps, and -1 if no bin is searched or the histogram is empty (no jump)
+# NOTE: The histogram is smoothed with the moving average of "_smoothing_window" bins before differencing
+def searchLargestJumpIndex(_hist, _pct_of_skipped_bins=0.1, _smoothing_window=1):
+    hist = np.asarray(_hist)
+    if not np.any(hist):
+        return -1
 
+    if _smoothing_window > 1:
+        hist = np.convolve(hist, np.ones(_smoothing_window) / _smoothing_window, mode="same")
 
-# Search the threshold pixel value
-def searchThresholdPixelValue():
-    # Get histogram of input image
-    hist, bins = np.histogram(img_in_Gray[img_in_Gray != BGColor_Gray], bins=bin_number)
+    first_index = int(hist.size * _pct_of_skipped_bins)
+    diff        = np.abs(np.diff(hist))[first_index:]
+    if diff.size == 0:
+        return -1
 
-    # Convert "tuple" to "numpy array"
-    hist = np.array(hist) # print(hist.size)
-    bins = np.array(bins) # print(bins)
+    return first_index + int(np.argmax(diff)) + 1
 
-    # Search a threshold pixel value
-    diff_max, index4bins = -1, -1
-    for i in range(int(hist.size*0.1), hist.size-1):
-        diff = np.abs(hist[i] - hist[i+1])
-        # print("diff = ", diff)
 
-        if diff > diff_max:
-            diff_max    = diff
-            index4bins  = i+1
-        # end if
-    # end for
 
-    threshold_pixel_value = int(bins[index4bins]) + int(255/bin_number)
+# Search the threshold pixel value
+def searchThresholdPixelValue(_hist_in_Gray_non_bgcolor, _bin_number, _pct_of_skipped_bins=0.1, _smoothing_window=1):
+    # Get histogram of input image from its 256-bin histogram
+    # NOTE: Same bins and counts as np.histogram() of the pixels, since each pixel value falls into the same bin
+    pixel_values = np.flatnonzero(_hist_in_Gray_non_bgcolor).astype(np.uint8)
+    if pixel_values.size == 0:
+        raise ValueError("The input image has no pixel except the background color")
+    hist, bins   = np.histogram(np.arange(256, dtype=np.uint8), bins=_bin_number, range=(pixel_values[0], pixel_values[-1]), weights=_hist_in_Gray_non_bgcolor)
+
+    # Search a threshold pixel value
+    index4bins   = searchLargestJumpIndex(hist.astype(np.int64), _pct_of_skipped_bins, _smoothing_window)
+    threshold_pixel_value = int(bins[index4bins]) + int(255/_bin_number)
 
     return threshold_pixel_value
 
@@ -280,38 +287,43 @@ def separateBackgroundColor():
 
 
 
-def transformPixelValueDistributionStatistically():
-    tmp_img_uint8 = img_in_RGB_non_bgcolor.copy()
-    tmp_img_float = tmp_img_uint8.astype(float)
-    
+# Statistical transform of the pixel values as a 256-entry LUT
+# NOTE: The transform is the same for every pixel value of every channel, so the float operations
+#       (and the truncation to uint8) are done once for 256 pixel values, not for each pixel
+def createStatisticalTransformLUT(_mean_pixel_value, _std_pixel_value, _ideal_mean_pixel_value, _ideal_std_pixel_value):
+    transform_LUT = np.arange(256, dtype=float)
+
     # Make the mean pixel value "0"
-    tmp_img_float[:,:,0] = cv2.subtract(tmp_img_float[:,:,0],   float(mean_pixel_value)) # R
-    tmp_img_float[:,:,1] = cv2.subtract(tmp_img_float[:,:,1],   float(mean_pixel_value)) # G
-    tmp_img_float[:,:,2] = cv2.subtract(tmp_img_float[:,:,2],   float(mean_pixel_value)) # B
+    transform_LUT = cv2.subtract(transform_LUT, float(_mean_pixel_value))
 
     # Make the std pixel value "ideal_std_pixel_value"
-    multiply_value = ideal_std_pixel_value / std_pixel_value
-    tmp_img_float[:,:,0] = cv2.multiply(tmp_img_float[:,:,0],   float(multiply_value))
-    tmp_img_float[:,:,1] = cv2.multiply(tmp_img_float[:,:,1],   float(multiply_value))
-    tmp_img_float[:,:,2] = cv2.multiply(tmp_img_float[:,:,2],   float(multiply_value))
+    multiply_value = _ideal_std_pixel_value / _std_pixel_value
+    transform_LUT = cv2.multiply(transform_LUT, float(multiply_value))
 
     # Make the mean pixel value "ideal_mean_pixel_value"
-    tmp_img_float[:,:,0] = cv2.add(tmp_img_float[:,:,0],        float(ideal_mean_pixel_value))
-    tmp_img_float[:,:,1] = cv2.add(tmp_img_float[:,:,1],        float(ideal_mean_pixel_value))
-    tmp_img_float[:,:,2] = cv2.add(tmp_img_float[:,:,2],        float(ideal_mean_pixel_value))
+    transform_LUT = cv2.add(transform_LUT,      float(_ideal_mean_pixel_value))
 
     # Convert float to np.uint8
-    tmp_img_uint8 = tmp_img_float.astype(np.uint8)
+    return transform_LUT.astype(np.uint8)
+
 
-    # Exclude background color from calculation
-    pre_processed_img_in_RGB = tmp_img_uint8
-    pre_processed_img_in_RGB[:,:,0] = np.where(b_index_non_bgcolor, tmp_img_uint8[:,:,0], 0) # R
-    pre_processed_img_in_RGB[:,:,1] = np.where(b_index_non_bgcolor, tmp_img_uint8[:,:,1], 0) # G
-    pre_processed_img_in_RGB[:,:,2] = np.where(b_index_non_bgcolor, tmp_img_uint8[:,:,2], 0) # B
+
+# NOTE: Nothing is written or shown here (see showStatisticallyTransformedImage())
+def transformPixelValueDistributionStatistically(_img_RGB, _b_index_non_bgcolor, _mean_pixel_value, _std_pixel_value, _ideal_mean_pixel_value, _ideal_std_pixel_value):
+    transform_LUT = createStatisticalTransformLUT(_mean_pixel_value, _std_pixel_value, _ideal_mean_pixel_value, _ideal_std_pixel_value)
+
+    # Transform the RGB channels at once, and exclude background color from calculation
+    pre_processed_img_in_RGB = cv2.LUT(_img_RGB, transform_LUT)
+    pre_processed_img_in_RGB[~_b_index_non_bgcolor] = 0
     print("\nStatistically, transformed pixel value distribution.")
 
+    return pre_processed_img_in_RGB
+
+
+
+def showStatisticallyTransformedImage(_pre_processed_img_in_RGB):
     # Save image
-    pre_processed_img_in_BGR = cv2.cvtColor(pre_processed_img_in_RGB, cv2.COLOR_RGB2BGR)
+    pre_processed_img_in_BGR = cv2.cvtColor(_pre_processed_img_in_RGB, cv2.COLOR_RGB2BGR)
     cv2.imwrite("images/transformed.bmp", pre_processed_img_in_BGR)
 
     # Create figure
@@ -325,7 +337,7 @@ def transformPixelValueDistributionStatistically():
 
     ax2 = fig.add_subplot(gs[0,1])
     ax2.set_title('After')
-    ax2.imshow(pre_processed_img_in_RGB)
+    ax2.imshow(_pre_processed_img_in_RGB)
     ax2.set_xticks([]), ax2.set_yticks([])
 
     ax3 = fig.add_subplot(gs[1,0])
@@ -333,29 +345,48 @@ def transformPixelValueDistributionStatistically():
     ax3.axvline(threshold_pixel_value, color='red')
 
     ax4 = fig.add_subplot(gs[1,1])
-    ax4 = rgbHist(pre_processed_img_in_RGB, ax4, "After")
+    ax4 = rgbHist(_pre_processed_img_in_RGB, ax4, "After")
     ax4.axvline(threshold_pixel_value, color='red')
 
     plt.show()
 
-    return pre_processed_img_in_RGB
 
 
+# Percentile pixel value from the cumulative histogram, as scipy.stats.scoreatpercentile() of the pixels without sorting them
+def calcPercentileFromHistogram(_hist, _pct):
+    cumsum_of_hist  = np.cumsum(_hist)
+    index           = _pct / 100. * (int(cumsum_of_hist[-1]) - 1)
+
+    # The "i"-th smallest pixel value is the first one whose cumulative number of pixels exceeds "i"
+    lower           = int(index)
+    lower_value     = int(np.searchsorted(cumsum_of_hist, lower, side="right"))
+    if lower == index:
+        return float(lower_value)
 
+    upper_value     = int(np.searchsorted(cumsum_of_hist, lower + 1, side="right"))
+    weights         = ((lower + 1 - index), (index - lower))
+
+    return (lower_value*weights[0] + upper_value*weights[1]) / (weights[0] + weights[1])
+
+
+
+# NOTE: Every preprocessing below is a function of the pixel value,
+#       so it is done for 256 pixel values (a LUT) and the image is touched once with cv2.LUT()
 def robustScalePixelValueDistribution():
     # Exclude background color pixel
-    tmp_img = img_in_Gray[b_index_non_bgcolor]
+    hist_in_Gray_non_bgcolor = np.bincount(img_in_Gray.ravel(), minlength=256)
+    hist_in_Gray_non_bgcolor[BGColor_Gray] = 0
 
     # Calc quartile pixel value
-    first_quater    = np.uint8(stats.scoreatpercentile(tmp_img, 25))
-    second_quater   = np.uint8(np.median(tmp_img))
-    third_quater    = np.uint8(stats.scoreatpercentile(tmp_img, 75))
+    first_quater    = np.uint8(calcPercentileFromHistogram(hist_in_Gray_non_bgcolor, 25))
+    second_quater   = np.uint8(calcPercentileFromHistogram(hist_in_Gray_non_bgcolor, 50))
+    third_quater    = np.uint8(calcPercentileFromHistogram(hist_in_Gray_non_bgcolor, 75))
     print ("1st quartile                     :", first_quater,   "(pixel value)")
     print ("2nd quartile (median)            :", second_quater,  "(pixel value")
     print ("3rd quartile                     :", third_quater,   "(pixel value)")
 
-    # RobustScale
-    robust_scaled_img_in_RGB_f = (img_in_RGB.copy().astype(float)-second_quater) / (third_quater-first_quater)
+    # RobustScale (for each pixel value)
+    robust_scaled_LUT_f = (np.arange(256, dtype=float)-second_quater) / (third_quater-first_quater)
 
     # # Make the min pixel value "0"
     # tmp_img_float = tmp_img_float + (-tmp_min)
@@ -392,20 +423,22 @@ def robustScalePixelValueDistribution():
 
     # plt.show()
     
-    return robust_scaled_img_in_RGB_f
+    return robust_scaled_LUT_f
 
 
 
-def preProcessPixelValueDistribution(_robust_scaled_img_in_RGB_f):
-    scaled_min_pixel_value, scaled_max_pixel_value = np.min(_robust_scaled_img_in_RGB_f), np.max(_robust_scaled_img_in_RGB_f)
+def preProcessPixelValueDistribution(_robust_scaled_LUT_f):
+    # Min and max of the robust scaled image, i.e., of the pixel values in the RGB channels of the input image
+    b_pixel_value_in_image = np.bincount(img_in_RGB.ravel(), minlength=256) > 0
+    scaled_min_pixel_value, scaled_max_pixel_value = np.min(_robust_scaled_LUT_f[b_pixel_value_in_image]), np.max(_robust_scaled_LUT_f[b_pixel_value_in_image])
     print("( min, max ) = (", scaled_min_pixel_value, ",", scaled_max_pixel_value, ")")
     
 
     # Mapping
-    robust_scaled_img_in_RGB_f = (_robust_scaled_img_in_RGB_f-float(scaled_min_pixel_value)) / (float(scaled_max_pixel_value)-float(scaled_min_pixel_value)) * float(threshold_pixel_value)
-    robust_scaled_img_in_RGB = robust_scaled_img_in_RGB_f.astype(np.uint8)
+    pre_processed_LUT_f = (_robust_scaled_LUT_f-float(scaled_min_pixel_value)) / (float(scaled_max_pixel_value)-float(scaled_min_pixel_value)) * float(threshold_pixel_value)
+    pre_processed_LUT   = pre_processed_LUT_f.astype(np.uint8)
 
-    pre_processed_img_in_RGB = robust_scaled_img_in_RGB
+    pre_processed_img_in_RGB = cv2.LUT(img_in_RGB, pre_processed_LUT)
     print("Pre-processing done.")
 
     # Save image
@@ -460,8 +493,8 @@ def dealWithOutlierPixelValue():
     # img_in_RGB_non_outlier[:,:,1] = np.where(bool_G_only_outlier, img_in_RGB[:,:,1]/2.52, img_in_RGB[:,:,1])
     # img_in_RGB_non_outlier[:,:,2] = np.where(bool_B_only_outlier, img_in_RGB[:,:,2]/2.52, img_in_RGB[:,:,2])
     gamma = 2
-    img_in_RGB_non_outlier_f = threshold_pixel_value*(img_in_RGB.copy().astype(float)/threshold_pixel_value)**(1/gamma)
-    img_in_RGB_non_outlier   = img_in_RGB_non_outlier_f.astype(np.uint8)
+    non_outlier_LUT_f        = threshold_pixel_value*(np.arange(256, dtype=float)/threshold_pixel_value)**(1/gamma)
+    img_in_RGB_non_outlier   = cv2.LUT(img_in_RGB, non_outlier_LUT_f.astype(np.uint8))
 
     # Save image
     cv2.imwrite("images/non_outlier.bmp", cv2.cvtColor(img_in_RGB_non_outlier, cv2.COLOR_RGB2BGR))
@@ -551,34 +584,61 @@ def preProcess4L1():
     print("Ratio of max pixel value (L=1)  :", round(ratio_max_pixel_value_L1*100, 2), "(%)")
 
     # Calc most frequent pixel value (L=1)
-    bincount = np.bincount(img_in_Gray_non_bgcolor_L1)
-    most_frequent_pixel_value_L1   = np.argmax( bincount )
+    bincount_L1                    = np.bincount(img_in_Gray_non_bgcolor_L1)
+    most_frequent_pixel_value_L1   = np.argmax( bincount_L1 )
     print("Most frequent pixel value (L=1) :", most_frequent_pixel_value_L1, "(pixel value)")
 
-    return img_in_Gray_L1, img_in_Gray_non_bgcolor_L1, N_all_non_bgcolor_L1, max_pixel_value_L1, ratio_max_pixel_value_L1, 
+    return img_in_Gray_L1, img_in_Gray_non_bgcolor_L1, N_all_non_bgcolor_L1, max_pixel_value_L1, ratio_max_pixel_value_L1, bincount_L1
 
 
 
-def determineAdjustParameter(_img_RGB, _img_in_Gray_non_bgcolor_L1, _N_all_non_bgcolor_L1, _max_pixel_value_L1, _ratio_of_ref_section):
-    # Initialize
-    tmp_ratio_of_ref_section = 0.0
-    ref_pixel_value_L1       = _max_pixel_value_L1
+# Calculate the ratio of pixels in the reference section of the image adjusted with "p"
+def calcRatioOfRefSection(_img_RGB, _p, _ref_pixel_value_L1):
+    tmp_img_adjusted_RGB   = adjust_pixel_value(_img_RGB, _p)
+    tmp_img_adjusted_Gray  = cv2.cvtColor(tmp_img_adjusted_RGB, cv2.COLOR_RGB2GRAY)
+
+    # Exclude background color
+    tmp_adjusted_img_non_bgcolor_Gray = tmp_img_adjusted_Gray[tmp_img_adjusted_Gray != BGColor_Gray]
+
+    sum_of_pixels_in_ref_section = np.sum(_ref_pixel_value_L1 <= tmp_adjusted_img_non_bgcolor_Gray)
+
+    return sum_of_pixels_in_ref_section / N_all_non_bgcolor
 
-    # Determine reference pixel value in the input image(L=1)
-    while tmp_ratio_of_ref_section < _ratio_of_ref_section:
-        # Temporarily calc    
-        sum_of_pixels_in_section  = np.sum( (ref_pixel_value_L1 <= _img_in_Gray_non_bgcolor_L1) )
-        tmp_ratio_of_ref_section  = sum_of_pixels_in_section / _N_all_non_bgcolor_L1
 
-        # Next pixel value
-        ref_pixel_value_L1 -= 1
 
-    ref_pixel_value_L1 += 1
+# Search the reference pixel value (L=1) with the reversed cumulative histogram
+def searchReferencePixelValue(_bincount_L1, _max_pixel_value_L1, _N_all_non_bgcolor_L1, _ratio_of_ref_section):
+    # The number of pixels in the section [v, max] for every pixel value v
+    num_of_pixels_in_section = np.cumsum( _bincount_L1[:int(_max_pixel_value_L1)+1][::-1] )[::-1]
+    tmp_ratio_of_ref_section = num_of_pixels_in_section / _N_all_non_bgcolor_L1
+
+    # The largest pixel value whose section satisfies the ratio of reference section
+    b_index_satisfied       = tmp_ratio_of_ref_section >= _ratio_of_ref_section
+    reference_pixel_value_L1 = np.flatnonzero(b_index_satisfied)[-1] if np.any(b_index_satisfied) else 0
+
+    return np.uint8(reference_pixel_value_L1), tmp_ratio_of_ref_section[reference_pixel_value_L1]
+
+
+
+def determineAdjustParameter(_img_RGB, _bincount_L1, _N_all_non_bgcolor_L1, _max_pixel_value_L1, _ratio_of_ref_section):
+    # Determine reference pixel value in the input image(L=1)
+    ref_pixel_value_L1, tmp_ratio_of_ref_section = searchReferencePixelValue(_bincount_L1, _max_pixel_value_L1, _N_all_non_bgcolor_L1, _ratio_of_ref_section)
     print("Reference pixel value (L=1)     :", ref_pixel_value_L1, "(pixel value)")
     print("Reference section (L=1)         :", ref_pixel_value_L1, "~", _max_pixel_value_L1, "(pixel value)")
     print("Ratio of reference section (L=1):", round(tmp_ratio_of_ref_section*100, 2), "(%)")
 
     # Determine tuning parameter
+    if p_search_engine == "bisection" and ref_pixel_value_L1 > BGColor_Gray:
+        p_grid  = create_p_grid(p_init, p_interval, p_max)
+        index   = search_first_satisfying_index(
+            lambda _index: calcRatioOfRefSection(_img_RGB, p_grid[_index], ref_pixel_value_L1) >= _ratio_of_ref_section,
+            len(p_grid))
+
+        # NOTE: The linear search returns the "p" next to the satisfying one
+        p_final = round(p_grid[index] + p_interval, 2)
+
+        return p_final, ref_pixel_value_L1, tmp_ratio_of_ref_section
+
     p = p_init
     tmp_ratio = 0.0
     while tmp_ratio < _ratio_of_ref_section:
@@ -657,12 +717,12 @@ def BrightnessAdjustment(_img_RGB):
     print(" STEP1: Get max pixel value (L=1)")  
     print("====================================")
     N_all_non_bgcolor = preProcess(_img_RGB)
-    img_in_Gray_L1, img_in_Gray_non_bgcolor_L1, N_all_non_bgcolor_L1, max_pixel_value_L1, ratio_max_pixel_value_L1 = preProcess4L1()
+    img_in_Gray_L1, img_in_Gray_non_bgcolor_L1, N_all_non_bgcolor_L1, max_pixel_value_L1, ratio_max_pixel_value_L1, bincount_L1 = preProcess4L1()
 
     print("\n\n================================================")
     print(" STEP2: Search for reference pixel value (L=1)")
     print("=================================================")
-    p_final, ref_pixel_value_L1, ratio_of_ref_section_L1 = determineAdjustParameter(_img_RGB, img_in_Gray_non_bgcolor_L1, N_all_non_bgcolor_L1, max_pixel_value_L1, ratio_of_ref_section)
+    p_final, ref_pixel_value_L1, ratio_of_ref_section_L1 = determineAdjustParameter(_img_RGB, bincount_L1, N_all_non_bgcolor_L1, max_pixel_value_L1, ratio_of_ref_section)
 
     print("\n\n============================")
     print(" STEP3: Adjust pixel value")
@@ -697,16 +757,17 @@ if __name__ == "__main__":
 
     N_all, N_all_non_bgcolor, mean_pixel_value, std_pixel_value = preProcess(img_in_RGB)
     bin_number              = 50
-    # threshold_pixel_value   = searchThresholdPixelValue()
+    # threshold_pixel_value   = searchThresholdPixelValue(np.bincount(img_in_Gray[img_in_Gray != BGColor_Gray], minlength=256), bin_number)
     # threshold_pixel_value   = mean_pixel_value + std_pixel_value*2
     threshold_pixel_value   = mean_pixel_value
     # ideal_std_pixel_value   = threshold_pixel_value/4
     # ideal_mean_pixel_value  = threshold_pixel_value/2
     img_in_RGB_bgcolor, img_in_RGB_non_bgcolor = separateBackgroundColor()
-    # robust_scaled_img_in_RGB_f     = robustScalePixelValueDistribution()
-    # pre_processed_img_in_RGB       = preProcessPixelValueDistribution(robust_scaled_img_in_RGB_f)
+    # robust_scaled_LUT_f            = robustScalePixelValueDistribution()
+    # pre_processed_img_in_RGB       = preProcessPixelValueDistribution(robust_scaled_LUT_f)
     dealWithOutlierPixelValue()
-    # pre_processed_img_in_RGB = transformPixelValueDistributionStatistically()
+    # pre_processed_img_in_RGB = transformPixelValueDistributionStatistically(img_in_RGB, b_index_non_bgcolor, mean_pixel_value, std_pixel_value, ideal_mean_pixel_value, ideal_std_pixel_value)
+    # showStatisticallyTransformedImage(pre_processed_img_in_RGB)
     # adjusted_img_out_RGB    = BrightnessAdjustment(pre_processed_img_in_RGB)
     # adjusted_img_out_Gray   = cv2.cvtColor(adjusted_img_out_RGB, cv2.COLOR_RGB2GRAY)
 
@@ -15,6 +15,8 @@ import sys
 import statistics
 import time
 
+from luminance_adjustment import create_amplification_LUT, create_p_grid, search_first_satisfying_index
+
 # Graph settings
 plt.style.use('seaborn-white')
 colors = cycler('color', ['#EE6666', '#3388BB', '#9988DD', '#EECC55', '#88BB44', '#FFBBBB'])
@@ -44,6 +46,8 @@ if len(args) != 3:
 # Set initial parameter
 p_init      = 1.0
 p_interval  = 0.01
+p_max       = 256.0 # All non-zero 8-bit values are saturated with p >= 255.5
+p_search_engine = "bisection" # "linear" or "bisection"
 ratio_of_reference_section = 0.01 # 1(%)
 bgcolor     = 0 # Background color : Black(0, 0, 0)
 bin_number  = 255 
@@ -209,15 +213,9 @@ def createFigure(_img_in_RGB_LR1, _img_in_RGB, _img_adjusted_RGB, _standard_pixe
 
 
 # Adjust Pixel Value for each RGB
-def adjust_pixel_value(_rgb_img, _adjust_param):
-    adjusted_img_RGB = np.empty((_rgb_img.shape[0], _rgb_img.shape[1], 3), dtype=np.uint8)
-
-    # Apply adjustment
-    adjusted_img_RGB[:, :, 0] = cv2.multiply(_rgb_img[:, :, 0], _adjust_param) # R
-    adjusted_img_RGB[:, :, 1] = cv2.multiply(_rgb_img[:, :, 1], _adjust_param) # G
-    adjusted_img_RGB[:, :, 2] = cv2.multiply(_rgb_img[:, :, 2], _adjust_param) # B
-
-    return adjusted_img_RGB
+def adjust_pixel_value(_rgb_img, _adjust_param, _dst=None):
+    # Apply adjustment to the interleaved RGB channels at once
+    return cv2.LUT(_rgb_img, create_amplification_LUT(_adjust_param), dst=_dst)
 
 
 
@@ -276,34 +274,61 @@ def preProcess4LR1():
     print("Ratio of max pixel value (LR=1)  :", round(ratio_max_pixel_value_LR1*100, 2), "(%)")
 
     # Calc most frequent pixel value (LR=1)
-    bincount = np.bincount(img_in_Gray_non_bgcolor_LR1)
-    most_frequent_pixel_value_LR1   = np.argmax( bincount )
+    bincount_LR1                    = np.bincount(img_in_Gray_non_bgcolor_LR1)
+    most_frequent_pixel_value_LR1   = np.argmax( bincount_LR1 )
     print("Most frequent pixel value (LR=1) :", most_frequent_pixel_value_LR1, "(pixel value)")
 
-    return img_in_Gray_LR1, img_in_Gray_non_bgcolor_LR1, N_all_non_bgcolor_LR1, max_pixel_value_LR1, ratio_max_pixel_value_LR1, 
+    return img_in_Gray_LR1, img_in_Gray_non_bgcolor_LR1, N_all_non_bgcolor_LR1, max_pixel_value_LR1, ratio_max_pixel_value_LR1, bincount_LR1
 
 
 
-def determineAdjustParameter(_ratio_of_reference_section):
-    # Initialize
-    tmp_ratio_of_reference_section = 0.0
-    reference_pixel_value_LR1      = max_pixel_value_LR1
+# Calculate the ratio of pixels in the reference section of the image adjusted with "p"
+def calcRatioOfRefSection(_img_RGB, _p, _ref_pixel_value_L1):
+    tmp_img_adjusted_RGB   = adjust_pixel_value(_img_RGB, _p)
+    tmp_img_adjusted_Gray  = cv2.cvtColor(tmp_img_adjusted_RGB, cv2.COLOR_RGB2GRAY)
 
-    # Determine reference pixel value in the input image(LR=1)
-    while tmp_ratio_of_reference_section < _ratio_of_reference_section:
-        # Temporarily calc    
-        sum_of_pixels_in_section        = np.sum( (reference_pixel_value_LR1 <= img_in_Gray_non_bgcolor_LR1) )
-        tmp_ratio_of_reference_section  = sum_of_pixels_in_section / N_all_non_bgcolor_LR1
+    # Exclude background color
+    tmp_adjusted_img_non_bgcolor_Gray = tmp_img_adjusted_Gray[tmp_img_adjusted_Gray != bgcolor]
+
+    sum_of_pixels_in_ref_section = np.sum(_ref_pixel_value_L1 <= tmp_adjusted_img_non_bgcolor_Gray)
+
+    return sum_of_pixels_in_ref_section / N_all_non_bgcolor
+
+
+
+# Search the reference pixel value (LR=1) with the reversed cumulative histogram
+def searchReferencePixelValue(_bincount_LR1, _max_pixel_value_LR1, _N_all_non_bgcolor_LR1, _ratio_of_reference_section):
+    # The number of pixels in the section [v, max] for every pixel value v
+    num_of_pixels_in_section = np.cumsum( _bincount_LR1[:int(_max_pixel_value_LR1)+1][::-1] )[::-1]
+    tmp_ratio_of_reference_section = num_of_pixels_in_section / _N_all_non_bgcolor_LR1
 
-        # Next pixel value
-        reference_pixel_value_LR1 -= 1
+    # The largest pixel value whose section satisfies the ratio of reference section
+    b_index_satisfied       = tmp_ratio_of_reference_section >= _ratio_of_reference_section
+    reference_pixel_value_LR1 = np.flatnonzero(b_index_satisfied)[-1] if np.any(b_index_satisfied) else 0
 
-    reference_pixel_value_LR1 += 1
+    return np.uint8(reference_pixel_value_LR1), tmp_ratio_of_reference_section[reference_pixel_value_LR1]
+
+
+
+def determineAdjustParameter(_ratio_of_reference_section):
+    # Determine reference pixel value in the input image(LR=1)
+    reference_pixel_value_LR1, tmp_ratio_of_reference_section = searchReferencePixelValue(bincount_LR1, max_pixel_value_LR1, N_all_non_bgcolor_LR1, _ratio_of_reference_section)
     print("Reference pixel value (LR=1)     :", reference_pixel_value_LR1, "(pixel value)")
     print("Reference section (LR=1)         :", reference_pixel_value_LR1, "~", max_pixel_value_LR1, "(pixel value)")
     print("Ratio of reference section (LR=1):", round(tmp_ratio_of_reference_section*100, 2), "(%)")
 
     # Determine tuning parameter
+    if p_search_engine == "bisection" and reference_pixel_value_LR1 > bgcolor:
+        p_grid  = create_p_grid(p_init, p_interval, p_max)
+        index   = search_first_satisfying_index(
+            lambda _index: calcRatioOfRefSection(img_in_RGB, p_grid[_index], reference_pixel_value_LR1) >= _ratio_of_reference_section,
+            len(p_grid))
+
+        # NOTE: The linear search returns the "p" next to the satisfying one
+        p_final = round(p_grid[index] + p_interval, 2)
+
+        return p_final, reference_pixel_value_LR1, tmp_ratio_of_reference_section
+
     p = p_init
     tmp_ratio = 0.0
     while tmp_ratio < _ratio_of_reference_section:
@@ -351,25 +376,19 @@ def adjustPixelValue(_p_final, _standard_pixel_value_LR1):
 
 
 
-def searchThresholdPixelValue(_img_in_RGB):
+def searchThresholdPixelValue(_img_in_RGB, _bin_number=bin_number, _pct_of_skipped_bins=0.1):
     # Convert RGB to Grayscale
     img_in_Gray = cv2.cvtColor(_img_in_RGB, cv2.COLOR_RGB2GRAY)
 
     # Get histogram of input image
-    hist, bins = np.histogram(img_in_Gray[img_in_Gray != bgcolor], bins=bin_number)
-
-    # Convert "tuple" to "numpy array"
-    hist = np.array(hist) # print(hist.size)
-    bins = np.array(bins) # print(bins)
-
-    max_pixel_number, index = -1, -1
-    for i in range(int(hist.size*0.1), hist.size-1):
-        diff = hist[i] - hist[i+1]
-        print("diff = ", np.abs(diff))
+    hist, bins = np.histogram(img_in_Gray[img_in_Gray != bgcolor], bins=_bin_number)
 
-        if diff > max_pixel_number:
-            max_pixel_number = diff
-            index = i+1
+    # Search the largest fall between two neighboring bins, skipping the darkest bins
+    # NOTE: The first one of the largest falls, and -1 if no fall is larger than -1
+    first_index = int(hist.size*_pct_of_skipped_bins)
+    diff        = (hist[:-1] - hist[1:])[first_index:]
+    print("\n".join("diff =  " + str(abs_diff) for abs_diff in np.abs(diff)))
+    index       = first_index + int(np.argmax(diff)) + 1 if diff.size > 0 and diff.max() > -1 else -1
 
     print("index = ", index)
     threshold_pixel_value = int(bins[index])
@@ -427,7 +446,7 @@ if __name__ == "__main__":
     # print(" STEP1 : Get max pixel value (LR=1)")  
     # print("====================================")
     # N_all_non_bgcolor = preProcess()
-    # img_in_Gray_LR1, img_in_Gray_non_bgcolor_LR1, N_all_non_bgcolor_LR1, max_pixel_value_LR1, ratio_max_pixel_value_LR1 = preProcess4LR1()
+    # img_in_Gray_LR1, img_in_Gray_non_bgcolor_LR1, N_all_non_bgcolor_LR1, max_pixel_value_LR1, ratio_max_pixel_value_LR1, bincount_LR1 = preProcess4LR1()
 
     # print("\n\n================================================")
     # print(" STEP2 : Search for reference pixel value (LR=1)")
@@ -3,6 +3,8 @@ import cv2
 import glob
 import sys
 
+from luminance_adjustment import stream_frames, stream_frames_parallel, create_reference_L1, read_reference_L1, create_amplification_LUT
+
 
 
 # ----------------------------
@@ -22,133 +24,35 @@ def read_img(_img_name):
 # --------------------------------------------
 # ----- Correct pixel value for each RGB -----
 # --------------------------------------------
-def correct_pixel_value(_rgb_img, _param):
-    # Apply correction
-    corrected_img_RGB = np.empty((_rgb_img.shape[0], _rgb_img.shape[1], 3), dtype=np.uint8)
-    corrected_img_RGB[:, :, 0] = cv2.multiply(_rgb_img[:, :, 0], _param) # R
-    corrected_img_RGB[:, :, 1] = cv2.multiply(_rgb_img[:, :, 1], _param) # G
-    corrected_img_RGB[:, :, 2] = cv2.multiply(_rgb_img[:, :, 2], _param) # B
-
-    return corrected_img_RGB
-
-
-
-# ------------------------------
-# ----- Write output Image -----
-# ------------------------------
-def write_img(_img_name, _i):
-    # convert color (RGB → BGR)
-    img_out_BGR = cv2.cvtColor(_img_name, cv2.COLOR_RGB2BGR)
-
-    img_name = "images/serial_number_images/adjusted_image{0:03d}.bmp"
-
-    cv2.imwrite(img_name.format(_i), img_out_BGR)
-
-    return
+def correct_pixel_value(_rgb_img, _param, _dst=None):
+    # Apply correction to the interleaved RGB channels at once
+    return cv2.LUT(_rgb_img, create_amplification_LUT(_param), dst=_dst)
 
 
 
-# -------------------------------------------
-# ----- Processing on input image(LR=1) -----
-# -------------------------------------------
 reference_section = 0.01 # 1%
 
-args = sys.argv
-img_in_RGB_LR1 = read_img(args[1])
-
-# Calc max pixel value of the input image(LR=1)
-img_in_Gray_LR1     = cv2.cvtColor(img_in_RGB_LR1, cv2.COLOR_RGB2GRAY)
-N_all_nonzero_LR1   = np.sum(img_in_Gray_LR1 > 0)
-max_pixel_value_LR1 = np.max(img_in_Gray_LR1)
-print("\n-----", args[1], "-----")
-print("Max pixel value\n>", max_pixel_value_LR1, "(pixel value)")
-
-# Calc the ratio of the maximum pixel value
-ratio_max_pixel_value = np.sum(img_in_Gray_LR1 == max_pixel_value_LR1) / N_all_nonzero_LR1
-ratio_max_pixel_value = round(ratio_max_pixel_value, 4)
-print("\nRatio of the max pixel value\n>", ratio_max_pixel_value, " (", round(ratio_max_pixel_value*100, 2), "(%) )")
-
-# Check whether the maximum pixel value is 255 in the input image(LR=1)
-if max_pixel_value_LR1 == 255:
-    # Calc most frequent pixel value
-    img_in_Gray_nonzero_LR1         = img_in_Gray_LR1[img_in_Gray_LR1 > 0]
-    bincount = np.bincount(img_in_Gray_nonzero_LR1)
-    most_frequent_pixel_value_LR1   = np.argmax( bincount )
-    print("\nMost frequent pixel value\n>", most_frequent_pixel_value_LR1, "(pixel value)")
-
-    # Check whether the most frequent pixel value is 255 in the input image(LR=1)
-    if most_frequent_pixel_value_LR1 == 255:
-        print("\n========================================================================================")
-        print("** There is a possibility that pixel value \"255\" is too much in the input image(LR=1).")
-            
-        # Determine standard pixel value in the input image(LR=1)
-        tmp_reference_section = 0.0
-        standard_pixel_value_LR1 = 254
-        while tmp_reference_section < reference_section:
-            # Temporarily, calc
-            sum_pixels_in_section = np.sum( (standard_pixel_value_LR1 <= img_in_Gray_LR1) & (img_in_Gray_LR1 < 255) )
-            tmp_reference_section = sum_pixels_in_section / N_all_nonzero_LR1
-
-            # Next pixel value
-            standard_pixel_value_LR1 -= 1
-
-        # print("\n** final reference section")
-        # print("** >", tmp_reference_section*100, "(%)")
-
-        print("\n** Standard pixel value")
-        print("** >", standard_pixel_value_LR1, "(pixel value)")
-
-        # Calc median pixel value in the section b/w standard pixel value and maximum pixel value(255)
-        section_bw_standard_255_LR1 = img_in_Gray_LR1[ (standard_pixel_value_LR1 <= img_in_Gray_LR1) & (img_in_Gray_LR1 < 255) ]
-        median_bw_standard_255_LR1  = int(np.median(section_bw_standard_255_LR1))
-        print("\n** Median pixel value in the section between", standard_pixel_value_LR1, "and 255")
-        print("** >", median_bw_standard_255_LR1, "(pixel value)")
-
-        # Update ratio_max_pixel_value
-        ratio_old = ratio_max_pixel_value
-        ratio_max_pixel_value = np.sum(img_in_Gray_LR1 == median_bw_standard_255_LR1) / N_all_nonzero_LR1
-        ratio_max_pixel_value = round(ratio_max_pixel_value, 4)
-        print("\n** Ratio of the pixel value", median_bw_standard_255_LR1)
-        print("** >", ratio_max_pixel_value, "(", round(ratio_max_pixel_value*100, 3), "(%) )")
-
-        print("\n** Changed ratio as follows.")
-        print("** >", ratio_old, " → ", ratio_max_pixel_value)
-        print("** >", round(ratio_old*100, 2), "(%) → ", round(ratio_max_pixel_value*100, 3), "(%)")
-
-        print("========================================================================================")
-
-
-
-# -----------------------------------------------
-# ----- Correct pixel value 
-#           for all images in the directory -----
-# -----------------------------------------------
-#image_files = glob.glob("images/serial_number_images/*.bmp")
-#image_files = glob.glob("images/serial_number_images/Data_0.1t/data0/*.png")
-
 # Set initial parameter
 p_init      = 1.0
 p_interval  = 0.01
 p_final     = 3.0 # 0.1:1.4 0.3:1.2
 
-img_count = 0
-# for i in image_files:
-#for i in range(180):
-for i in range(360):
-    # Read input image
-    # img_in_RGB = read_img(i)
-    img_in_RGB = read_img("images/serial_number_images/image{0:03d}.bmp".format(i))
-    # img_in_RGB = read_img("images/serial_number_images/Data_0.1t/data0/image{0:03d}.png".format(i))
+# Frame-parallel
+# NOTE: With "num_of_workers" > 1, chunks of "frame_chunk_size" contiguous frames are read, corrected and returned
+#       by a process pool, and written in order. "p_final" is the same for all frames, so the frames are as in one run.
+num_of_workers      = 1
+frame_chunk_size    = 8
 
+def correct_frame(_img_in_RGB, _p_final=p_final):
     # Then, calc number of pixels that pixel value is not 0
-    img_in_Gray     = cv2.cvtColor(img_in_RGB, cv2.COLOR_RGB2GRAY)
-    N_all_nonzero   = np.sum(img_in_Gray > 0)
+    # img_in_Gray     = cv2.cvtColor(_img_in_RGB, cv2.COLOR_RGB2GRAY)
+    # N_all_nonzero   = np.sum(img_in_Gray > 0)
 
     # Determine parameter
     # p = p_init
     # tmp_ratio_255 = 0.0
     # while tmp_ratio_255 < ratio_max_pixel_value:
-    #     tmp_corrected_img_RGB = correct_pixel_value(img_in_RGB, p)
+    #     tmp_corrected_img_RGB = correct_pixel_value(_img_in_RGB, p)
     #     tmp_corrected_img_Gray = cv2.cvtColor(tmp_corrected_img_RGB, cv2.COLOR_RGB2GRAY)
 
     #     # Temporarily, calc ratio of pixel value 255
@@ -160,13 +64,89 @@ for i in range(360):
     # p_final = round(p, 2)
 
     # Make output image
-    img_out_RGB = correct_pixel_value(img_in_RGB, p_final)
+    return correct_pixel_value(_img_in_RGB, _p_final)
+
+
 
-    # Write output image
-    write_img(img_out_RGB, img_count)
+# Correct a chunk of contiguous frames on a worker of the pool
+# NOTE: Returns the corrected frames and "p" of each frame
+def correct_frame_chunk(_frames, _p_final=p_final):
+    return [correct_frame(img_in_RGB, _p_final) for img_in_RGB in _frames], [_p_final] * len(_frames)
 
-    # Update image count
-    img_count += 1
 
-print("\nNumber of input images\n>", img_count)
-print("\n")
\ No newline at end of file
+
+if __name__ == "__main__":
+    args = sys.argv
+
+    # -------------------------------------------
+    # ----- Processing on input image(LR=1) -----
+    # -------------------------------------------
+    # NOTE: The reference (L=1) of the whole sequence is computed once by create_reference_L1(),
+    #       or read from a JSON file written by write_reference_L1() (e.g., "LR1.json")
+    if args[1].endswith(".json"):
+        reference_L1 = read_reference_L1(args[1])
+    else:
+        reference_L1 = create_reference_L1(read_img(args[1]), _reference_section=reference_section)
+
+    # Calc max pixel value of the input image(LR=1)
+    max_pixel_value_LR1 = reference_L1["max_pixel_value_L1"]
+    print("\n-----", args[1], "-----")
+    print("Max pixel value\n>", max_pixel_value_LR1, "(pixel value)")
+
+    # Calc the ratio of the maximum pixel value
+    ratio_max_pixel_value = reference_L1["ratio_max_pixel_value_L1"]
+    print("\nRatio of the max pixel value\n>", ratio_max_pixel_value, " (", round(ratio_max_pixel_value*100, 2), "(%) )")
+
+    # Check whether the maximum pixel value is 255 in the input image(LR=1)
+    if max_pixel_value_LR1 == 255:
+        # Calc most frequent pixel value
+        most_frequent_pixel_value_LR1   = reference_L1["most_frequent_pixel_value_L1"]
+        print("\nMost frequent pixel value\n>", most_frequent_pixel_value_LR1, "(pixel value)")
+
+        # Check whether the most frequent pixel value is 255 in the input image(LR=1)
+        if most_frequent_pixel_value_LR1 == 255:
+            print("\n========================================================================================")
+            print("** There is a possibility that pixel value \"255\" is too much in the input image(LR=1).")
+            
+            # Determine standard pixel value in the input image(LR=1)
+            standard_pixel_value_LR1 = reference_L1["standard_pixel_value_L1"]
+
+            print("\n** Standard pixel value")
+            print("** >", standard_pixel_value_LR1, "(pixel value)")
+
+            # Calc median pixel value in the section b/w standard pixel value and maximum pixel value(255)
+            median_bw_standard_255_LR1  = reference_L1["median_pixel_value_L1"]
+            print("\n** Median pixel value in the section between", standard_pixel_value_LR1, "and 255")
+            print("** >", median_bw_standard_255_LR1, "(pixel value)")
+
+            # Update ratio_max_pixel_value
+            ratio_old = ratio_max_pixel_value
+            ratio_max_pixel_value = reference_L1["reference_ratio_L1"]
+            print("\n** Ratio of the pixel value", median_bw_standard_255_LR1)
+            print("** >", ratio_max_pixel_value, "(", round(ratio_max_pixel_value*100, 3), "(%) )")
+
+            print("\n** Changed ratio as follows.")
+            print("** >", ratio_old, " → ", ratio_max_pixel_value)
+            print("** >", round(ratio_old*100, 2), "(%) → ", round(ratio_max_pixel_value*100, 3), "(%)")
+
+            print("========================================================================================")
+
+    # -----------------------------------------------
+    # ----- Correct pixel value 
+    #           for all frames of the video -----
+    # -----------------------------------------------
+    # NOTE: The frames are read from a video file or an image sequence and written one by one
+    #       on three threads (decode, correct, encode) connected by bounded queues,
+    #       so only a few frames are held at once whatever the number of frames.
+    #       e.g., python auto_correct_pixel_value_maximum_4video.py LR1.bmp turntable.mp4 IMAGE_DATA/adjusted.mp4
+    src_frames = args[2] if len(args) > 2 else "images/serial_number_images/image%03d.bmp"
+    dst_frames = args[3] if len(args) > 3 else "images/serial_number_images/adjusted_image%03d.bmp"
+    #src_frames = "images/serial_number_images/Data_0.1t/data0/image%03d.png"
+
+    if num_of_workers > 1:
+        img_count = len(stream_frames_parallel(src_frames, dst_frames, correct_frame_chunk, num_of_workers, frame_chunk_size))
+    else:
+        img_count = stream_frames(src_frames, dst_frames, correct_frame)
+
+    print("\nNumber of input images\n>", img_count)
+    print("\n")
\ No newline at end of file
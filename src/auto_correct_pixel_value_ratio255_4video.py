@@ -1,8 +1,11 @@
 import numpy as np
 import cv2
+import functools
 import glob
 import sys
 
+from luminance_adjustment import stream_frame_sequence, stream_frames, stream_frames_parallel, get_p_grid_and_LUTs, search_first_satisfying_index_from, create_p_smoother, adjust_frames_by_keyframes, create_reference_L1, read_reference_L1, create_amplification_LUT
+
 
 
 # ----------------------------
@@ -22,113 +25,176 @@ def read_img(_img_name):
 # --------------------------------------------
 # ----- Correct pixel value for each RGB -----
 # --------------------------------------------
-def correct_pixel_value(_rgb_img, _param):
-    # Multiply
-    red   = cv2.multiply(_rgb_img[:, :, 0], _param) # R
-    green = cv2.multiply(_rgb_img[:, :, 1], _param) # G
-    blue  = cv2.multiply(_rgb_img[:, :, 2], _param) # B
+def correct_pixel_value(_rgb_img, _param, _dst=None):
+    # Apply correction to the interleaved RGB channels at once
+    return cv2.LUT(_rgb_img, create_amplification_LUT(_param), dst=_dst)
 
-    # Apply correction
-    corrected_img_RGB = np.empty((_rgb_img.shape[0], _rgb_img.shape[1], 3), dtype=np.uint8)
-    corrected_img_RGB[:, :, 0] = red
-    corrected_img_RGB[:, :, 1] = green
-    corrected_img_RGB[:, :, 2] = blue
 
-    return corrected_img_RGB
 
+# -----------------------------------------------
+# ----- Correct pixel value 
+#           for all frames of the video -----
+# -----------------------------------------------
+# Set initial parameter
+p_init = 1.0
+p_interval = 0.01
 
+# Temporally coherent "p"
+# NOTE: With "b_warm_start", "p" of each frame is searched outward from "p" of the previous frame
+#       (the number of pixels with 255 never decreases as "p" grows, so it is the same "p" as the search from "p_init").
+#       "p_smoothing" smooths "p" of consecutive frames to suppress flicker: None, "ema" or "median"
+b_warm_start        = True
+p_smoothing         = None
+p_smoothing_alpha   = 0.5 # Weight of the current frame (ema)
+p_smoothing_window  = 5   # Number of frames (median)
 
-# ------------------------------
-# ----- Write output Image -----
-# ------------------------------
-def write_img(_img_name, _i):
-    # convert color (RGB → BGR)
-    img_out_BGR = cv2.cvtColor(_img_name, cv2.COLOR_RGB2BGR)
+# Keyframes
+# NOTE: With "keyframe_interval" > 1, "p" is determined only every "keyframe_interval" frames
+#       (and on the frames whose histogram is farther than "keyframe_distance" from the one of the previous keyframe),
+#       and linearly interpolated between them. The other frames only cost a LUT and the encoding.
+keyframe_interval   = 1    # 1: every frame
+keyframe_distance   = None # Bhattacharyya distance, e.g., 0.05
 
-    img_name = "images/serial_number_images/corrected_image{0:03d}.bmp"
+# Frame-parallel
+# NOTE: With "num_of_workers" > 1, chunks of "frame_chunk_size" contiguous frames are read, corrected and returned
+#       by a process pool, and written in order. The warm start, smoothing and keyframes restart at each chunk.
+num_of_workers      = 1
+frame_chunk_size    = 8
 
-    cv2.imwrite(img_name.format(_i), img_out_BGR)
 
-    return
 
+# Determine "p" of frames one after another
+# NOTE: Returns "determine_p(img_in_RGB)" and the list of the number of iterations of the search of each frame.
+#       The grid of "p" and its LUTs are built once per process (the workers of the pool build them in init_worker()),
+#       and "p" of the previous frame is kept in the closure, so that each run (or chunk) has its own warm start.
+def create_p_determiner(_ratio_overexpose, _b_warm_start=b_warm_start):
+    p_grid, LUTs      = get_p_grid_and_LUTs(p_init, p_interval)
+    previous_index    = [0]
+    num_of_iterations = []
 
+    def determine_p(_img_in_RGB):
+        # Then, calc number of pixels that pixel value is 0
+        img_in_Gray     = cv2.cvtColor(_img_in_RGB, cv2.COLOR_RGB2GRAY)
+        N_all_nonzero   = np.sum(img_in_Gray > 0)
 
-# -------------------------------------------
-# ----- Processing on input image(LR=1) -----
-# -------------------------------------------
-args = sys.argv
-img_in_RGB_LR1 = read_img(args[1])
+        # Calc the theoretical number of pixels that the pixel value is 255 after correction
+        N_theor = int(N_all_nonzero * _ratio_overexpose)
 
-# From the input image with LR = 1, 
-#   calc the ratio that the pixel is 255 after correction
-img_in_LR1_gray         = cv2.cvtColor(img_in_RGB_LR1, cv2.COLOR_RGB2GRAY)
-img_in_LR1_gray_nonzero = img_in_LR1_gray[img_in_LR1_gray > 0]
-N_all_nonzero_LR1       = np.sum(img_in_LR1_gray_nonzero > 0)
-ratio_overexpose        = round( np.sum(img_in_LR1_gray == 255) / N_all_nonzero_LR1, 5)
-ratio_overexpose_per    = ratio_overexpose * 100
+        # Determine parameter
+        if not _b_warm_start:
+            p = p_init
+            count_overexpose_255 = 0
+            while count_overexpose_255 < N_theor:
+                tmp_corrected_img_RGB = correct_pixel_value(_img_in_RGB, p)
+                tmp_corrected_img_Gray = cv2.cvtColor(tmp_corrected_img_RGB, cv2.COLOR_RGB2GRAY)
 
-if ratio_overexpose_per < 0.01: # < 0.01(%)
-    ratio_overexpose = 0.01 * 0.01 # 1.0e-04
-    print("\n** Note :")
-    print("** Set ratio_overexpose = 0.0001 (0.01%)")
-    print("**  because in the input image with LR = 1 (", args[2], "),")
-    print("**  the ratio of pixels that are overexposed is too small (< 0.01%).")
+                # Count number of max pixel value(==255)
+                count_overexpose_255 = np.sum(tmp_corrected_img_Gray == 255)
 
-print("\nratio_overexpose\n>", ratio_overexpose, " (", round(ratio_overexpose*100, 3), "(%) )")
+                # Update parameter
+                p += p_interval
 
+            num_of_iterations.append(int(round((p - p_init) / p_interval)))
 
+        elif N_theor == 0:
+            # NOTE: The loop above never runs
+            p = p_init
+            num_of_iterations.append(0)
 
-# -----------------------------------------------
-# ----- Correct pixel value 
-#           for all images in the directory -----
-# -----------------------------------------------
-#image_files = glob.glob("images/serial_number_images/*.bmp")
-
-img_count = 0
-#for i in image_files:
-for i in range(180):
-    # Read input image
-    #img_in_RGB = read_img(i)
-    img_in_RGB = read_img("images/serial_number_images/image{0:03d}.bmp".format(i))
+        else:
+            tmp_corrected_img_RGB = np.empty_like(_img_in_RGB)
+            iterations = [0]
+            def is_overexposed(_index):
+                iterations[0] += 1
+                tmp_corrected_img_Gray = cv2.cvtColor(cv2.LUT(_img_in_RGB, LUTs[_index], dst=tmp_corrected_img_RGB), cv2.COLOR_RGB2GRAY)
 
-    # Set initial parameter
-    p_init = 1.0
-    p_interval = 0.01
+                # Count number of max pixel value(==255)
+                return np.sum(tmp_corrected_img_Gray == 255) >= N_theor
 
-    # Calc all number of pixels of the input image
-    N_all = img_in_RGB.shape[0]*img_in_RGB.shape[1]
+            previous_index[0] = search_first_satisfying_index_from(is_overexposed, len(p_grid), previous_index[0])
+            num_of_iterations.append(iterations[0])
 
-    # Then, calc number of pixels that pixel value is 0
-    img_in_Gray     = cv2.cvtColor(img_in_RGB, cv2.COLOR_RGB2GRAY)
-    N_all_nonzero   = np.sum(img_in_Gray > 0)
+            # NOTE: The loop above stops at the "p" next to the satisfying one
+            p = p_grid[previous_index[0]] + p_interval
 
-    # Calc the theoretical number of pixels that the pixel value is 255 after correction
-    N_theor = int(N_all_nonzero * ratio_overexpose)
+        return round(p, 2)
 
-    # Determine parameter
-    p = p_init
-    count_overexpose_255 = 0
-    while count_overexpose_255 < N_theor:
-        tmp_corrected_img_RGB = correct_pixel_value(img_in_RGB, p)
-        tmp_corrected_img_Gray = cv2.cvtColor(tmp_corrected_img_RGB, cv2.COLOR_RGB2GRAY)
+    return determine_p, num_of_iterations
 
-        # Count number of max pixel value(==255)
-        count_overexpose_255 = np.sum(tmp_corrected_img_Gray == 255)
 
-        # Update parameter
-        p += p_interval
 
-    p_final = round(p, 2)
+# Correct a frame with "p" of "_determine_p", smoothed with "_smooth_p"
+def correct_frame(_img_in_RGB, _determine_p, _smooth_p):
+    p_final = _smooth_p(_determine_p(_img_in_RGB))
 
     # Make output image
-    img_out_RGB = correct_pixel_value(img_in_RGB, p_final)
-
-    # Write output image
-    write_img(img_out_RGB, img_count)
-
-    # Update image count
-    img_count += 1
-
-    if i == 179:
-        print("\nNumber of input images\n>", i+1)
-        print("\n")
\ No newline at end of file
+    return correct_pixel_value(_img_in_RGB, p_final)
+
+
+
+# Correct a chunk of contiguous frames on a worker of the pool
+# NOTE: The warm start, smoothing and keyframes start over at each chunk. Returns the corrected frames and "p" of each frame
+def correct_frame_chunk(_frames, _ratio_overexpose):
+    determine_p, _ = create_p_determiner(_ratio_overexpose)
+
+    p_of_frames = []
+    if keyframe_interval > 1 or keyframe_distance is not None:
+        corrected_frames = list(adjust_frames_by_keyframes(_frames, determine_p, keyframe_interval, keyframe_distance, _p_of_frames=p_of_frames))
+    else:
+        smooth_p         = create_p_smoother(p_smoothing, p_smoothing_alpha, p_smoothing_window)
+        p_of_frames      = [smooth_p(determine_p(img_in_RGB)) for img_in_RGB in _frames]
+        corrected_frames = [correct_pixel_value(img_in_RGB, p_final) for img_in_RGB, p_final in zip(_frames, p_of_frames)]
+
+    return corrected_frames, p_of_frames
+
+
+
+if __name__ == "__main__":
+    args = sys.argv
+
+    # -------------------------------------------
+    # ----- Processing on input image(LR=1) -----
+    # -------------------------------------------
+    # NOTE: The reference (L=1) of the whole sequence is computed once by create_reference_L1(),
+    #       or read from a JSON file written by write_reference_L1() (e.g., "LR1.json")
+    if args[1].endswith(".json"):
+        reference_L1 = read_reference_L1(args[1])
+    else:
+        reference_L1 = create_reference_L1(read_img(args[1]))
+
+    # From the input image with LR = 1, 
+    #   calc the ratio that the pixel is 255 after correction
+    ratio_overexpose        = reference_L1["ratio_overexpose_L1"]
+    ratio_overexpose_per    = ratio_overexpose * 100
+
+    if ratio_overexpose_per < 0.01: # < 0.01(%)
+        ratio_overexpose = 0.01 * 0.01 # 1.0e-04
+        print("\n** Note :")
+        print("** Set ratio_overexpose = 0.0001 (0.01%)")
+        print("**  because in the input image with LR = 1 (", args[1], "),")
+        print("**  the ratio of pixels that are overexposed is too small (< 0.01%).")
+
+    print("\nratio_overexpose\n>", ratio_overexpose, " (", round(ratio_overexpose*100, 3), "(%) )")
+
+    # NOTE: The frames are read from a video file or an image sequence and written one by one
+    #       on three threads (decode, correct, encode) connected by bounded queues,
+    #       so only a few frames are held at once whatever the number of frames.
+    #       e.g., python auto_correct_pixel_value_ratio255_4video.py LR1.bmp turntable.mp4 IMAGE_DATA/corrected.mp4
+    src_frames = args[2] if len(args) > 2 else "images/serial_number_images/image%03d.bmp"
+    dst_frames = args[3] if len(args) > 3 else "images/serial_number_images/corrected_image%03d.bmp"
+
+    # NOTE: The ratio from the reference (L=1) is passed on to each chunk (functools.partial),
+    #       so that a worker of the pool neither reads "args" nor decodes the input image with LR = 1 again
+    determine_p, num_of_iterations = create_p_determiner(ratio_overexpose)
+    if num_of_workers > 1:
+        img_count = len(stream_frames_parallel(src_frames, dst_frames, functools.partial(correct_frame_chunk, _ratio_overexpose=ratio_overexpose), num_of_workers, frame_chunk_size))
+    elif keyframe_interval > 1 or keyframe_distance is not None:
+        img_count = stream_frame_sequence(src_frames, dst_frames, lambda _frames: adjust_frames_by_keyframes(_frames, determine_p, keyframe_interval, keyframe_distance))
+    else:
+        smooth_p  = create_p_smoother(p_smoothing, p_smoothing_alpha, p_smoothing_window)
+        img_count = stream_frames(src_frames, dst_frames, functools.partial(correct_frame, _determine_p=determine_p, _smooth_p=smooth_p))
+
+    print("\nNumber of input images\n>", img_count)
+    if len(num_of_iterations) > 0:
+        print("\nNumber of iterations of the search of p (per keyframe)\n>", round(np.mean(num_of_iterations), 1), "(mean),", max(num_of_iterations), "(max),", len(num_of_iterations), "keyframes")
+    print("\n")
\ No newline at end of file
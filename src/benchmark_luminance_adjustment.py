@@ -0,0 +1,70 @@
+##########################################
+#   @file   benchmark_luminance_adjustment.py
+#   @author Tomomasa Uchida
+#   @date   2026/10/18
+##########################################
+
+import argparse
+import json
+import os
+
+from luminance_adjustment.benchmark import benchmark_sizes, benchmark_foreground_fractions, benchmark_repeat, benchmark_seed, package_variants, benchmark_variants, script_variants, run_benchmark, compare_benchmarks, compare_wall_clock_times
+
+
+
+def main():
+    parser   = argparse.ArgumentParser(description="Benchmark of the brightness adjustment variants with synthetic renders and the bundled images")
+    parser.add_argument('-s',   '--sizes',      type=int,   nargs="+", default=benchmark_sizes, help="Width (= height) of the synthetic renders")
+    parser.add_argument('-f',   '--fractions',  type=float, nargs="+", default=benchmark_foreground_fractions, help="Foreground fractions of the synthetic renders")
+    parser.add_argument('-v',   '--variants',   nargs="+", default=benchmark_variants, choices=package_variants + list(script_variants), help="\"decompose_<threshold method>\" for each threshold strategy of luminance_adjustment.threshold")
+    parser.add_argument('-r',   '--repeat',     type=int, default=benchmark_repeat)
+    parser.add_argument('-e',   '--engine',     default="crossing", choices=["linear", "bisection", "crossing"])
+    parser.add_argument(        '--seed',       type=int, default=benchmark_seed)
+    parser.add_argument(        '--no_fixtures', action="store_true", help="Skip the bundled images")
+    parser.add_argument('-o',   '--output',     default="IMAGE_DATA/benchmark.json")
+    parser.add_argument('-b',   '--baseline',   default=None, help="Benchmark result (JSON) to compare with")
+    args     = parser.parse_args()
+
+    result = run_benchmark(args.sizes, args.fractions, args.variants, args.repeat, args.engine, not args.no_fixtures, args.seed)
+
+    if os.path.dirname(args.output) != "":
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    for record in result["records"]:
+        if "error" in record:
+            print(record["image"], record["size"], record["variant"], ": ERROR", record["error"])
+        else:
+            print(record["image"], record["size"], record.get("foreground_fraction", ""), record["variant"], ":", round(record["stage_times"]["total"], 4), "[sec]")
+    # end for
+
+    # NOTE: The scripts are only timed end to end
+    if len(result["script_records"]) > 0:
+        print("\nScripts (wall-clock time)")
+    for record in result["script_records"]:
+        if "error" in record:
+            print(record["image"], record["size"], record["variant"], ": ERROR", record["error"])
+        else:
+            print(record["image"], record["size"], record.get("foreground_fraction", ""), record["variant"], ":", round(record["wall_clock_time"], 4), "[sec]")
+    # end for
+    print("Benchmark result                 :", args.output)
+
+    # Regression comparison
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        print("\n(image, size, fraction, variant, engine)  stage  baseline[sec] -> [sec]  (ratio)")
+        for key, stage, baseline_t, t, ratio in compare_benchmarks(baseline, result):
+            print(key, stage, round(baseline_t, 4), "->", round(t, 4), "(x" + str(round(ratio, 2)) + ")")
+
+        script_comparison = compare_wall_clock_times(baseline, result)
+        if len(script_comparison) > 0:
+            print("\n(image, size, fraction, script, -)  wall-clock baseline[sec] -> [sec]  (ratio)")
+        for key, baseline_t, t, ratio in script_comparison:
+            print(key, round(baseline_t, 4), "->", round(t, 4), "(x" + str(round(ratio, 2)) + ")")
+    # end if
+
+if __name__=="__main__":
+    main()
@@ -3,6 +3,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 plt.style.use('seaborn-white')
 import sys
+from luminance_adjustment import create_amplification_LUT
 args = sys.argv
 
 plt.style.use('seaborn-white')
@@ -59,13 +60,9 @@ param = float(args[2])
 # -------------------------------
 # ----- Correct pixel value -----
 # -------------------------------
-def correct_pixel_value(_rgb_img, _param):
-  corrected_img_RGB = np.empty((_rgb_img.shape[0], _rgb_img.shape[1], 3), dtype=np.uint8)
-  corrected_img_RGB[:, :, 0] = cv2.multiply(_rgb_img[:, :, 0], _param)
-  corrected_img_RGB[:, :, 1] = cv2.multiply(_rgb_img[:, :, 1], _param)
-  corrected_img_RGB[:, :, 2] = cv2.multiply(_rgb_img[:, :, 2], _param)
-
-  return corrected_img_RGB
+def correct_pixel_value(_rgb_img, _param, _dst=None):
+  # Apply correction to the interleaved RGB channels at once
+  return cv2.LUT(_rgb_img, create_amplification_LUT(_param), dst=_dst)
 
 img_out_RGB = correct_pixel_value(img_in_RGB, param)
 # print('R Max:',np.max(img_out_RGB[:, :, 0]),' Min:',np.min(img_out_RGB[:, :, 0]))
@@ -14,6 +14,8 @@ import subprocess
 import sys
 import statistics
 
+from luminance_adjustment import create_amplification_LUT
+
 # Graph settings
 plt.style.use('seaborn-white')
 colors = cycler('color', ['#EE6666', '#3388BB', '#9988DD', '#EECC55', '#88BB44', '#FFBBBB'])
@@ -270,15 +272,9 @@ def createFigure(_img_in_RGB_LR1, _img_in_RGB, _img_corrected_RGB, _standard_pix
 
 
 # Correct Pixel Value for Each RGB
-def correct_pixel_value(_rgb_img, _correct_param):
-    corrected_img_RGB = np.empty((_rgb_img.shape[0], _rgb_img.shape[1], 3), dtype=np.uint8)
-
-    # Apply correction
-    corrected_img_RGB[:, :, 0] = cv2.multiply(_rgb_img[:, :, 0], _correct_param) # R
-    corrected_img_RGB[:, :, 1] = cv2.multiply(_rgb_img[:, :, 1], _correct_param) # G
-    corrected_img_RGB[:, :, 2] = cv2.multiply(_rgb_img[:, :, 2], _correct_param) # B
-
-    return corrected_img_RGB
+def correct_pixel_value(_rgb_img, _correct_param, _dst=None):
+    # Apply correction to the interleaved RGB channels at once
+    return cv2.LUT(_rgb_img, create_amplification_LUT(_correct_param), dst=_dst)
 
 
 
@@ -337,27 +333,33 @@ def preProcess4LR1():
     print("Ratio of max pixel value (LR=1)  :", round(ratio_max_pixel_value_LR1*100, 2), "(%)")
 
     # Calc most frequent pixel value (LR=1)
-    bincount = np.bincount(img_in_Gray_non_bgcolor_LR1)
-    most_frequent_pixel_value_LR1   = np.argmax( bincount )
+    bincount_LR1                    = np.bincount(img_in_Gray_non_bgcolor_LR1)
+    most_frequent_pixel_value_LR1   = np.argmax( bincount_LR1 )
     print("Most frequent pixel value (LR=1) :", most_frequent_pixel_value_LR1, "(pixel value)")
 
-    return img_in_Gray_LR1, img_in_Gray_non_bgcolor_LR1, N_all_non_bgcolor_LR1, max_pixel_value_LR1, ratio_max_pixel_value_LR1, 
+    return img_in_Gray_LR1, img_in_Gray_non_bgcolor_LR1, N_all_non_bgcolor_LR1, max_pixel_value_LR1, ratio_max_pixel_value_LR1, bincount_LR1
 
 
 
-def determineCorrectParameter(_ratio_of_reference_section):
-    # Initialize
-    tmp_reference_section         = 0.0
-    standard_pixel_value_LR1      = max_pixel_value_LR1
+# Search the reference pixel value (LR=1) with the reversed cumulative histogram
+def searchReferencePixelValue(_bincount_LR1, _max_pixel_value_LR1, _N_all_non_bgcolor_LR1, _ratio_of_reference_section):
+    # The number of pixels in the section [v, max] for every pixel value v
+    num_of_pixels_in_section = np.cumsum( _bincount_LR1[:int(_max_pixel_value_LR1)+1][::-1] )[::-1]
+    tmp_ratio_of_reference_section = num_of_pixels_in_section / _N_all_non_bgcolor_LR1
 
-    # Determine standard pixel value in the input image(LR=1)
-    while tmp_reference_section < _ratio_of_reference_section:
-        # Temporarily calc    
-        sum_of_pixels_in_section  = np.sum( (standard_pixel_value_LR1 <= img_in_Gray_non_bgcolor_LR1) )
-        tmp_reference_section     = sum_of_pixels_in_section / N_all_non_bgcolor_LR1
+    # The largest pixel value whose section satisfies the ratio of reference section
+    b_index_satisfied       = tmp_ratio_of_reference_section >= _ratio_of_reference_section
+    reference_pixel_value_LR1 = np.flatnonzero(b_index_satisfied)[-1] if np.any(b_index_satisfied) else 0
 
-        # Next pixel value
-        standard_pixel_value_LR1 -= 1
+    return np.uint8(reference_pixel_value_LR1), tmp_ratio_of_reference_section[reference_pixel_value_LR1]
+
+
+
+def determineCorrectParameter(_ratio_of_reference_section):
+    # Determine standard pixel value in the input image(LR=1)
+    # NOTE: The standard pixel value is one below the reference pixel value
+    reference_pixel_value_LR1, tmp_reference_section = searchReferencePixelValue(bincount_LR1, max_pixel_value_LR1, N_all_non_bgcolor_LR1, _ratio_of_reference_section)
+    standard_pixel_value_LR1      = reference_pixel_value_LR1 - 1
 
     print("Standard pixel value (LR=1)      :", standard_pixel_value_LR1, "(pixel value)")
     print("Reference section                :", standard_pixel_value_LR1, "~", max_pixel_value_LR1, "(pixel value)")
@@ -444,7 +446,7 @@ if __name__ == "__main__":
     print(" STEP1 : Get max pixel value (LR=1)")  
     print("====================================")
     N_all_non_bgcolor = preProcess()
-    img_in_Gray_LR1, img_in_Gray_non_bgcolor_LR1, N_all_non_bgcolor_LR1, max_pixel_value_LR1, ratio_max_pixel_value_LR1 = preProcess4LR1()
+    img_in_Gray_LR1, img_in_Gray_non_bgcolor_LR1, N_all_non_bgcolor_LR1, max_pixel_value_LR1, ratio_max_pixel_value_LR1, bincount_LR1 = preProcess4LR1()
 
     print("\n\n================================================")
     print(" STEP2 : Search for standard pixel value (LR=1)")
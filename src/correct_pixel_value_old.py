@@ -14,6 +14,8 @@ import subprocess
 import sys
 import statistics
 
+from luminance_adjustment import create_amplification_LUT
+
 # Graph settings
 plt.style.use('seaborn-white')
 colors = cycler('color', ['#EE6666', '#3388BB', '#9988DD', '#EECC55', '#88BB44', '#FFBBBB'])
@@ -199,15 +201,9 @@ def createHistogram(_img_in_RGB_LR1, _img_in_RGB, _img_corrected_RGB, _standard_
 
 
 # Correct Pixel Value for Each RGB
-def correct_pixel_value(_rgb_img, _correct_param):
-    corrected_img_RGB = np.empty((_rgb_img.shape[0], _rgb_img.shape[1], 3), dtype=np.uint8)
-
-    # Apply correction
-    corrected_img_RGB[:, :, 0] = cv2.multiply(_rgb_img[:, :, 0], _correct_param) # R
-    corrected_img_RGB[:, :, 1] = cv2.multiply(_rgb_img[:, :, 1], _correct_param) # G
-    corrected_img_RGB[:, :, 2] = cv2.multiply(_rgb_img[:, :, 2], _correct_param) # B
-
-    return corrected_img_RGB
+def correct_pixel_value(_rgb_img, _correct_param, _dst=None):
+    # Apply correction to the interleaved RGB channels at once
+    return cv2.LUT(_rgb_img, create_amplification_LUT(_correct_param), dst=_dst)
 
 
 
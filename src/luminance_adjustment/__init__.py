@@ -0,0 +1,24 @@
+###############################################
+#   @file   __init__.py
+#   @author Tomomasa Uchida
+#   @date   2026/10/18
+###############################################
+
+# NOTE: Nothing is read, printed or plotted at import time,
+#       so a worker can import this package once and process many images in-process.
+
+from .stats import chunk_size, BGColor, BGColor_Gray, convert_BGColor_to_Gray, convert_RGB_to_Gray, create_bgcolor_index, calc_histogram, exclude_bgcolor_from_histogram, calculate_statistics_from_histogram, calc_otsu_threshold_from_histogram, calc_percentile_from_histogram, calculate_statistics, calculate_statistics_L1
+from .reference import reference_section_of_255, search_reference_pixel_value_L1, search_left_edge_pixel_value_L1, search_standard_pixel_value_L1, create_reference_L1_from_histogram, create_reference_L1, get_reference_pixel_value_L1, write_reference_L1, read_reference_L1
+from .solve import p_init, p_interval, p_max, p_search_engine, create_p_grid, create_amplification_LUTs, get_p_grid_and_LUTs, search_first_satisfying_index, search_first_satisfying_index_from, count_distinct_RGB_values, search_threshold_crossing_index_of_pixels, search_threshold_crossing_index, calc_pct_of_ref_section, search_amplification_factor_index, determine_amplification_factor, determine_amplification_factor_from, determine_amplification_factor_for_decomposed_image, determine_amplification_factors_of_labels_by_crossing
+from .apply import create_amplification_LUT, adjust_pixel_value
+from .preprocess import create_mapping_LUT, map_pixel_value, calc_mean_and_std_from_histogram, create_statistical_transform_LUT, transform_pixel_value_distribution_statistically, calc_quartiles_from_histogram, robust_scale_stage, histogram_stages, register_histogram_stage, create_min_max_mapping_stage, create_gamma_stage, create_LUT_stage, compose_preprocessing_LUT, split_preprocessing_stages, preprocess_pixel_value
+from .threshold import jump_bin_number, jump_pct_of_skipped_bins, jump_smoothing_window, search_largest_jump_index, calc_threshold_by_mean_std, calc_threshold_by_mean_2std, calc_threshold_by_otsu, calc_threshold_by_third_quartile, calc_threshold_by_histogram_jump, calc_multi_otsu_thresholds_from_histogram, threshold_strategies, register_threshold_strategy, get_threshold_strategy
+from .decompose import label_bgcolor, label_low, label_high, calc_threshold_pixel_value_from_histogram, calc_threshold_pixel_value, decompose_image, resynthesize_images, create_label_map, calc_labelled_histogram, calculate_layer_statistics, decompose_image_into_labels, create_class_label_map, decompose_image_into_classes, extract_layer_pixels, create_layer_LUTs, adjust_layers
+from .pipeline import adjust_brightness, adjust_brightness_by_reference_pixel_value, determine_amplification_factor_of_decomposed_image, determine_amplification_factors_of_layers, adjust_brightness_of_decomposed_image, adjust_brightness_decompose, determine_amplification_factors_of_classes, adjust_brightness_decompose_into_classes
+from .util import write_text_atomically
+from .metrics import enable_metrics, disable_metrics, reset_metrics, is_metrics_enabled, is_memory_traced, get_metric_events, measure_stage, add_count, create_prometheus_text, write_metrics_jsonl, write_metrics_prometheus, write_metrics
+from .image_io import read_image, write_image
+from .cache import max_cache_bytes, calc_image_file_hash, create_cache_key, read_cache_entry, write_cache_entry, evict_cache_entries, get_statistics_L1, get_reference_section_L1
+from .batch import read_manifest, pair_images_by_glob, process_pair, run_batch
+from .sequence import p_smoothing_methods, p_smoothing_alpha, p_smoothing_window, keyframe_interval, create_p_smoother, create_p_solver, create_sequence_adjuster, calc_histogram_distance, interpolate_p, adjust_frames_by_keyframes, create_keyframe_adjuster, adjust_frame_chunk
+from .stream import frame_queue_size, frames_per_second, frame_chunk_size, video_fourccs, is_video_file, read_frames, get_frames_per_second, write_frames, create_references_L1_of_frames, stream_frame_sequence, stream_frames, read_and_adjust_frame_chunk, stream_frames_parallel, adjust_video, adjust_video_parallel
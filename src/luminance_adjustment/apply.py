@@ -0,0 +1,23 @@
+###############################################
+#   @file   apply.py
+#   @author Tomomasa Uchida
+#   @date   2026/10/18
+###############################################
+
+import numpy as np
+import cv2
+
+
+
+# Create the saturating uint8 lookup table of the amplification factor
+def create_amplification_LUT(_p):
+    return cv2.multiply(np.arange(256, dtype=np.uint8), _p)
+# End of create_amplification_LUT()
+
+
+
+# Adjust pixel value for each RGB
+def adjust_pixel_value(_img_RGB, _p, _dst=None):
+    # Apply adjustment to the interleaved RGB channels at once
+    return cv2.LUT(_img_RGB, create_amplification_LUT(_p), dst=_dst)
+# End of adjust_pixel_value()
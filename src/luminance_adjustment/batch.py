@@ -0,0 +1,167 @@
+###############################################
+#   @file   batch.py
+#   @author Tomomasa Uchida
+#   @date   2026/10/18
+###############################################
+
+import csv
+import functools
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from .cache import max_cache_bytes, get_reference_section_L1
+from .image_io import read_image, write_image
+from .metrics import enable_metrics, is_metrics_enabled, reset_metrics, get_metric_events, write_metrics
+from .pipeline import pct_of_reference_section, adjust_brightness, adjust_brightness_by_reference_pixel_value
+from .solve import p_search_engine, get_p_grid_and_LUTs
+
+# Columns of the results table
+results_fieldnames = [
+    "input", "input_L1", "output",
+    "p_final", "reference_pixel_value_L1", "max_pixel_value_L1",
+    "read_time", "adjust_time", "write_time", "total_time",
+    "error",
+]
+
+
+
+# Read (input, input_L1) pairs from a manifest
+# NOTE: One pair per line, separated by a comma. Empty lines and lines starting with "#" are skipped.
+def read_manifest(_manifest_name):
+    pairs = []
+    with open(_manifest_name, newline="") as f:
+        for row in csv.reader(f):
+            if len(row) == 0 or row[0].strip() == "" or row[0].lstrip().startswith("#"):
+                continue
+
+            if len(row) != 2:
+                raise ValueError("Expected \"input,input_L1\" in " + _manifest_name + ": " + ",".join(row))
+
+            pairs.append((row[0].strip(), row[1].strip()))
+        # end for
+    # end with
+
+    return pairs
+# End of read_manifest()
+
+
+
+# Pair the input images with the input images (L=1) in sorted order
+def pair_images_by_glob(_pattern, _pattern_L1):
+    img_names    = sorted(glob.glob(_pattern))
+    img_names_L1 = sorted(glob.glob(_pattern_L1))
+    if len(img_names) != len(img_names_L1):
+        raise ValueError("The number of input images (" + str(len(img_names)) + ") and input images with L=1 (" + str(len(img_names_L1)) + ") differ")
+
+    return list(zip(img_names, img_names_L1))
+# End of pair_images_by_glob()
+
+
+
+# Run once in each worker process
+def init_worker(_engine, _b_metrics=False, _b_trace_memory=False):
+    # NOTE: One OpenCV thread per process, so that the processes do not compete for the cores
+    cv2.setNumThreads(1)
+
+    if _b_metrics:
+        enable_metrics(_b_trace_memory)
+
+    # Build the grid of "p" and its tables before the first image
+    if _engine == "crossing":
+        get_p_grid_and_LUTs()
+# End of init_worker()
+
+
+
+# Adjust brightness of one (input, input_L1) pair and write the adjusted image
+# NOTE: The index of the pair is prepended to the output name, since the input names may collide (e.g., "input.bmp")
+# NOTE: With "_cache_dir", the statistics (L=1) are shared between runs and pairs with the same input image with L=1
+def process_pair(_index, _pair, _output_dir, _pct_of_reference_section=pct_of_reference_section, _engine=p_search_engine, _cache_dir=None, _max_cache_bytes=max_cache_bytes):
+    img_name, img_name_L1 = _pair
+    result = dict.fromkeys(results_fieldnames, "")
+    result["input"], result["input_L1"] = img_name, img_name_L1
+
+    if is_metrics_enabled():
+        reset_metrics()
+
+    start_time = time.perf_counter()
+    try:
+        img_RGB     = read_image(img_name)
+        if _cache_dir is None:
+            img_RGB_L1  = read_image(img_name_L1)
+        else:
+            # NOTE: The input image with L=1 is decoded only when it is not in the cache
+            reference_pixel_value_L1, max_pixel_value_L1, _ = get_reference_section_L1(img_name_L1, _pct_of_reference_section, _cache_dir, _max_cache_bytes=_max_cache_bytes)
+        read_time   = time.perf_counter()
+
+        if _cache_dir is None:
+            adjusted_img_RGB, p_final, reference_pixel_value_L1, max_pixel_value_L1 = adjust_brightness(img_RGB, img_RGB_L1, _pct_of_reference_section, _engine)
+        else:
+            adjusted_img_RGB, p_final = adjust_brightness_by_reference_pixel_value(img_RGB, reference_pixel_value_L1, _pct_of_reference_section, _engine)
+        adjust_time = time.perf_counter()
+
+        adjusted_img_name = os.path.join(_output_dir, "{0:06d}_{1}_adjusted_{2}.bmp".format(_index, os.path.splitext(os.path.basename(img_name))[0], p_final))
+        write_image(adjusted_img_name, adjusted_img_RGB)
+        write_time  = time.perf_counter()
+
+    except Exception as e:
+        # NOTE: One broken pair must not stop the whole batch
+        result["error"]      = type(e).__name__ + ": " + str(e)
+        result["total_time"] = round(time.perf_counter() - start_time, 4)
+        add_metric_events(result, img_name)
+
+        return result
+
+    result["output"]                   = adjusted_img_name
+    result["p_final"]                  = p_final
+    result["reference_pixel_value_L1"] = int(reference_pixel_value_L1)
+    result["max_pixel_value_L1"]       = int(max_pixel_value_L1)
+    result["read_time"]                = round(read_time   - start_time,  4)
+    result["adjust_time"]              = round(adjust_time - read_time,   4)
+    result["write_time"]               = round(write_time  - adjust_time, 4)
+    result["total_time"]               = round(write_time  - start_time,  4)
+    add_metric_events(result, img_name)
+
+    return result
+# End of process_pair()
+
+
+
+# Pass the metrics of the pair from the worker process to run_batch()
+def add_metric_events(_result, _img_name):
+    if is_metrics_enabled():
+        _result["metrics"] = [dict(event, input=_img_name) for event in get_metric_events()]
+# End of add_metric_events()
+
+
+
+# Adjust brightness of all pairs with a process pool and write the results table (CSV)
+# NOTE: With "_metrics_name", the metrics of all pairs are written as Prometheus text (".prom") or JSON lines
+def run_batch(_pairs, _output_dir, _results_name, _max_workers=None, _chunksize=1, _pct_of_reference_section=pct_of_reference_section, _engine=p_search_engine, _cache_dir=None, _max_cache_bytes=max_cache_bytes, _metrics_name=None, _b_trace_memory=False):
+    os.makedirs(_output_dir, exist_ok=True)
+
+    process = functools.partial(process_pair, _output_dir=_output_dir, _pct_of_reference_section=_pct_of_reference_section, _engine=_engine, _cache_dir=_cache_dir, _max_cache_bytes=_max_cache_bytes)
+    num_of_errors, metric_events = 0, []
+    with ProcessPoolExecutor(max_workers=_max_workers, initializer=init_worker, initargs=(_engine, _metrics_name is not None, _b_trace_memory)) as executor, \
+         open(_results_name, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=results_fieldnames)
+        writer.writeheader()
+
+        # NOTE: Results are written in the order of "_pairs"
+        for result in executor.map(process, range(len(_pairs)), _pairs, chunksize=_chunksize):
+            metric_events += result.pop("metrics", [])
+            writer.writerow(result)
+            if result["error"] != "":
+                num_of_errors += 1
+        # end for
+    # end with
+
+    if _metrics_name is not None:
+        write_metrics(_metrics_name, metric_events)
+
+    return num_of_errors
+# End of run_batch()
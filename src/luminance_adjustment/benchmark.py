@@ -0,0 +1,333 @@
+###############################################
+#   @file   benchmark.py
+#   @author Tomomasa Uchida
+#   @date   2026/10/18
+###############################################
+
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from .apply import create_amplification_LUT, adjust_pixel_value
+from .decompose import decompose_image_into_labels, adjust_layers
+from .image_io import read_image, write_image
+from .pipeline import pct_of_reference_section, pct_of_ref_sec4high, pct_of_ref_sec4low, determine_amplification_factors_of_layers
+from .reference import search_reference_pixel_value_L1
+from .solve import p_search_engine, determine_amplification_factor
+from .threshold import threshold_strategies, get_threshold_strategy
+from .stats import BGColor, convert_BGColor_to_Gray, convert_RGB_to_Gray, calc_histogram, calculate_statistics, calculate_statistics_L1
+
+# Default parameter
+benchmark_sizes                 = [512, 1024, 2048, 4096, 8192]
+benchmark_foreground_fractions  = [0.25, 0.5]
+benchmark_repeat                = 3
+benchmark_seed                  = 0
+ratio_of_input_to_L1            = 0.35 # The input image is rendered darker than the input image with L=1
+
+# Variants timed stage by stage with this package: "decompose_<threshold method>" for each threshold strategy
+package_variants = ["adjust_brightness"] + ["decompose_" + threshold_method for threshold_method in threshold_strategies]
+benchmark_variants = ["adjust_brightness", "decompose_mean_std", "decompose_otsu"]
+
+# Variants timed end to end as scripts: (script, arguments after the input images)
+# NOTE: These keep their state in module globals, so they cannot be imported.
+#       Their stages cannot be timed separately, so only their wall-clock times are reported ("script_records")
+script_variants = {
+    "adjust_brightness_decompose_mapping"   : ("adjust_brightness_decompose_mapping.py", ["L1"]),
+    "acpv_decompose_SD"                     : ("acpv_decompose_SD.py",                   ["L1"]),
+    "acpv_decompose_mean"                   : ("acpv_decompose_mean.py",                 ["0.1", "0.01"]),
+    "acpv_decompose_quartile"               : ("acpv_decompose_quartile.py",             ["0.1", "0.01"]),
+    "acpv_maximum_old"                      : ("acpv_maximum_old.py",                    ["L1"]),
+}
+
+# Bundled images: (input, input_L1), relative to "src"
+fixture_pairs = {
+    "ookabuto"      : ("Brightness_Adjustment/resources/sample/ookabuto/input.bmp",         "Brightness_Adjustment/resources/sample/ookabuto/LR1.bmp"),
+    "hachimanyama"  : ("Brightness_Adjustment/resources/sample/hachimanyama/input.bmp",     "Brightness_Adjustment/resources/sample/hachimanyama/hachimanyama_LR1.bmp"),
+    "funehoko"      : ("Brightness_Adjustment_Decompose_ver/resources/funehoko/input.bmp",  "Brightness_Adjustment_Decompose_ver/resources/funehoko/funehoko_LR1.bmp"),
+    "borobu"        : ("Brightness_Adjustment_Decompose_ver/resources/borobu/input.bmp",    "Brightness_Adjustment_Decompose_ver/resources/borobu/bad_LR1.bmp"),
+}
+src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+
+# Create a synthetic render: black background and blob-like foreground of "_foreground_fraction"
+# NOTE: The same "_seed" gives the same pair of images
+def create_synthetic_images(_size, _foreground_fraction, _seed=benchmark_seed):
+    rng = np.random.default_rng(_seed)
+
+    # Foreground: the pixels above the (1 - fraction) quantile of a smooth random field
+    field = cv2.resize(rng.random((16, 16), dtype=np.float32), (_size, _size), interpolation=cv2.INTER_CUBIC)
+    b_index_bgcolor = field <= np.quantile(field, 1.0 - _foreground_fraction)
+    del field
+
+    # Input image with L=1: smooth shading with noise, never the background color
+    shading    = cv2.resize(rng.integers(40, 200, (8, 8, 3), dtype=np.uint8), (_size, _size), interpolation=cv2.INTER_LINEAR)
+    img_RGB_L1 = cv2.add(shading, rng.integers(0, 56, (_size, _size, 3), dtype=np.uint8))
+    del shading
+
+    # Input image: the same render, but darker
+    img_RGB = cv2.LUT(img_RGB_L1, create_amplification_LUT(ratio_of_input_to_L1))
+    img_RGB = cv2.max(img_RGB, 1)
+
+    img_RGB_L1[b_index_bgcolor] = BGColor
+    img_RGB[b_index_bgcolor]    = BGColor
+
+    return img_RGB, img_RGB_L1
+# End of create_synthetic_images()
+
+
+
+# Same procedure as adjust_brightness(), timed stage by stage
+def time_adjust_brightness(_img_RGB, _img_RGB_L1, _pct_of_reference_section=pct_of_reference_section, _engine=p_search_engine, _BGColor=BGColor):
+    BGColor_Gray = convert_BGColor_to_Gray(_BGColor)
+    stage_times  = {}
+
+    start = time.perf_counter()
+    N_all_non_bgcolor, _, _ = calculate_statistics(_img_RGB, BGColor_Gray)
+    stage_times["statistics"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    N_all_non_bgcolor_L1, max_pixel_value_L1, bincount_L1 = calculate_statistics_L1(_img_RGB_L1, BGColor_Gray)
+    stage_times["statistics_L1"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reference_pixel_value_L1, _ = search_reference_pixel_value_L1(bincount_L1, max_pixel_value_L1, N_all_non_bgcolor_L1, _pct_of_reference_section)
+    stage_times["reference"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    p_final = determine_amplification_factor(_img_RGB, reference_pixel_value_L1, _pct_of_reference_section, N_all_non_bgcolor, _engine, BGColor_Gray)
+    stage_times["solve"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    adjust_pixel_value(_img_RGB, p_final)
+    stage_times["apply"] = time.perf_counter() - start
+
+    return stage_times, {"p_final": p_final}
+# End of time_adjust_brightness()
+
+
+
+# Same procedure as adjust_brightness_decompose(), timed stage by stage
+def time_adjust_brightness_decompose(_img_RGB, _img_RGB_L1, _pct_of_ref_sec4high=pct_of_ref_sec4high, _pct_of_ref_sec4low=pct_of_ref_sec4low, _threshold_method="mean_std", _engine=p_search_engine, _BGColor=BGColor):
+    BGColor_Gray = convert_BGColor_to_Gray(_BGColor)
+    stage_times  = {}
+
+    start = time.perf_counter()
+    N_all_non_bgcolor_L1, max_pixel_value_L1, bincount_L1 = calculate_statistics_L1(_img_RGB_L1, BGColor_Gray)
+    stage_times["statistics_L1"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    calc_threshold, b_high_includes_threshold = get_threshold_strategy(_threshold_method)
+    img_Gray              = convert_RGB_to_Gray(_img_RGB)
+    threshold_pixel_value = calc_threshold(calc_histogram(img_Gray), BGColor_Gray)
+    stage_times["threshold"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    label_map, N_high, N_low, mean_pixel_value_high, _ = decompose_image_into_labels(_img_RGB, threshold_pixel_value, _BGColor, b_high_includes_threshold, img_Gray)
+    stage_times["decompose"] = time.perf_counter() - start
+
+    # NOTE: "high" and "low" at the same time, as in adjust_brightness_decompose()
+    start = time.perf_counter()
+    p_high, p_low = determine_amplification_factors_of_layers(_img_RGB, label_map, N_high, N_low, max_pixel_value_L1, mean_pixel_value_high, _pct_of_ref_sec4high, _pct_of_ref_sec4low, N_all_non_bgcolor_L1, bincount_L1, _engine, _BGColor)
+    stage_times["solve"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    adjust_layers(_img_RGB, label_map, [None, p_low, p_high], _BGColor)
+    stage_times["apply"] = time.perf_counter() - start
+
+    return stage_times, {"p_high": p_high, "p_low": p_low}
+# End of time_adjust_brightness_decompose()
+
+
+
+# Run one of "package_variants" once
+def time_package_variant(_variant, _img_RGB, _img_RGB_L1, _engine=p_search_engine):
+    if _variant == "adjust_brightness":
+        return time_adjust_brightness(_img_RGB, _img_RGB_L1, _engine=_engine)
+    elif _variant == "decompose_otsu":
+        # NOTE: adjust_brightness_decompose_otsu.py uses 0.01 for "_pct_of_ref_sec4low"
+        return time_adjust_brightness_decompose(_img_RGB, _img_RGB_L1, _pct_of_ref_sec4low=0.01, _threshold_method="otsu", _engine=_engine)
+    elif _variant.startswith("decompose_") and _variant[len("decompose_"):] in threshold_strategies:
+        return time_adjust_brightness_decompose(_img_RGB, _img_RGB_L1, _threshold_method=_variant[len("decompose_"):], _engine=_engine)
+    else:
+        raise ValueError("Unknown variant: " + _variant)
+# End of time_package_variant()
+
+
+
+# Run one of "script_variants" once in a scratch directory and return the wall-clock time
+# NOTE: The scripts write their figures and images into "images/" or "IMAGE_DATA/"
+def time_script_variant(_variant, _img_name, _img_name_L1, _timeout=None):
+    script_name, extra_args = script_variants[_variant]
+    args = [sys.executable, os.path.join(src_dir, script_name), _img_name]
+    args += [_img_name_L1 if arg == "L1" else arg for arg in extra_args]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.makedirs(os.path.join(work_dir, "images"))
+        os.makedirs(os.path.join(work_dir, "IMAGE_DATA"))
+        env = dict(os.environ, MPLBACKEND="Agg")
+
+        start = time.perf_counter()
+        res   = subprocess.run(args, cwd=work_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=_timeout)
+        total = time.perf_counter() - start
+    # end with
+
+    if res.returncode != 0:
+        stderr_lines = res.stderr.decode(errors="replace").strip().splitlines()
+        raise RuntimeError(script_name + " exited with " + str(res.returncode) + (": " + stderr_lines[-1] if len(stderr_lines) > 0 else ""))
+
+    return total
+# End of time_script_variant()
+
+
+
+# Repeat a variant and keep the minimum time of each stage
+def repeat_variant(_time_variant, _repeat):
+    best_stage_times, outputs = None, {}
+    for _ in range(_repeat):
+        stage_times, outputs = _time_variant()
+        stage_times["total"] = sum(stage_times.values())
+        if best_stage_times is None:
+            best_stage_times = stage_times
+        else:
+            best_stage_times = {stage: min(best_stage_times[stage], stage_times[stage]) for stage in stage_times}
+    # end for
+
+    return {stage: round(t, 6) for stage, t in best_stage_times.items()}, outputs
+# End of repeat_variant()
+
+
+
+# Benchmark "_variants" with one pair
+# NOTE: Returns the records of "package_variants" (stage times) and the ones of "script_variants" (wall-clock times)
+def benchmark_pair(_record_base, _img_RGB, _img_RGB_L1, _variants, _repeat, _engine=p_search_engine, _img_name=None, _img_name_L1=None):
+    records, script_records = [], []
+    for variant in _variants:
+        record = dict(_record_base, variant=variant)
+        try:
+            if variant in package_variants:
+                record["engine"] = _engine
+                record["stage_times"], record["outputs"] = repeat_variant(lambda: time_package_variant(variant, _img_RGB, _img_RGB_L1, _engine), _repeat)
+            else:
+                record["wall_clock_time"] = round(min(time_script_variant(variant, _img_name, _img_name_L1) for _ in range(_repeat)), 6)
+
+        except Exception as e:
+            record["error"] = type(e).__name__ + ": " + str(e)
+
+        if variant in package_variants:
+            records.append(record)
+        else:
+            script_records.append(record)
+    # end for
+
+    return records, script_records
+# End of benchmark_pair()
+
+
+
+# Information for comparing the results of different machines
+def create_environment_info():
+    return {
+        "python"    : platform.python_version(),
+        "numpy"     : np.__version__,
+        "opencv"    : cv2.__version__,
+        "platform"  : platform.platform(),
+        "processor" : platform.processor(),
+        "cpu_count" : os.cpu_count(),
+    }
+# End of create_environment_info()
+
+
+
+# Benchmark all variants with the synthetic renders and the bundled images
+def run_benchmark(_sizes=benchmark_sizes, _foreground_fractions=benchmark_foreground_fractions, _variants=benchmark_variants, _repeat=benchmark_repeat, _engine=p_search_engine, _b_fixtures=True, _seed=benchmark_seed):
+    b_script_variants = any(variant in script_variants for variant in _variants)
+    records, script_records = [], []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Synthetic renders
+        for size in _sizes:
+            for foreground_fraction in _foreground_fractions:
+                img_RGB, img_RGB_L1 = create_synthetic_images(size, foreground_fraction, _seed)
+                img_name, img_name_L1 = None, None
+                if b_script_variants:
+                    img_name, img_name_L1 = os.path.join(tmp_dir, "input.bmp"), os.path.join(tmp_dir, "input_L1.bmp")
+                    write_image(img_name,    img_RGB)
+                    write_image(img_name_L1, img_RGB_L1)
+
+                record_base = {"image": "synthetic", "size": size, "foreground_fraction": foreground_fraction, "seed": _seed}
+                pair_records, pair_script_records = benchmark_pair(record_base, img_RGB, img_RGB_L1, _variants, _repeat, _engine, img_name, img_name_L1)
+                records        += pair_records
+                script_records += pair_script_records
+                del img_RGB, img_RGB_L1
+            # end for
+        # end for
+    # end with
+
+    # Bundled images
+    if _b_fixtures:
+        for fixture, (img_name, img_name_L1) in fixture_pairs.items():
+            img_name, img_name_L1 = os.path.join(src_dir, img_name), os.path.join(src_dir, img_name_L1)
+            img_RGB, img_RGB_L1   = read_image(img_name), read_image(img_name_L1)
+            record_base = {"image": fixture, "size": list(img_RGB.shape[:2])}
+            pair_records, pair_script_records = benchmark_pair(record_base, img_RGB, img_RGB_L1, _variants, _repeat, _engine, img_name, img_name_L1)
+            records        += pair_records
+            script_records += pair_script_records
+        # end for
+
+    return {"environment": create_environment_info(), "repeat": _repeat, "records": records, "script_records": script_records}
+# End of run_benchmark()
+
+
+
+# Key of a record for comparing two benchmark results
+def create_record_key(_record):
+    return (_record["image"], str(_record["size"]), _record.get("foreground_fraction"), _record["variant"], _record.get("engine"))
+# End of create_record_key()
+
+
+
+# Compare the stage times with a baseline: [(key, stage, baseline time, time, ratio)]
+def compare_benchmarks(_baseline, _result):
+    baseline_records = {create_record_key(record): record for record in _baseline["records"] if "stage_times" in record}
+    comparison = []
+    for record in _result["records"]:
+        baseline_record = baseline_records.get(create_record_key(record))
+        if baseline_record is None or "stage_times" not in record:
+            continue
+
+        for stage, t in record["stage_times"].items():
+            if stage not in baseline_record["stage_times"]:
+                continue
+
+            baseline_t = baseline_record["stage_times"][stage]
+            comparison.append((create_record_key(record), stage, baseline_t, t, t / baseline_t if baseline_t > 0 else float("inf")))
+        # end for
+    # end for
+
+    return comparison
+# End of compare_benchmarks()
+
+
+
+# Compare the wall-clock times of "script_variants" with a baseline: [(key, baseline time, time, ratio)]
+def compare_wall_clock_times(_baseline, _result):
+    baseline_records = {create_record_key(record): record for record in _baseline.get("script_records", []) if "wall_clock_time" in record}
+    comparison = []
+    for record in _result["script_records"]:
+        baseline_record = baseline_records.get(create_record_key(record))
+        if baseline_record is None or "wall_clock_time" not in record:
+            continue
+
+        baseline_t, t = baseline_record["wall_clock_time"], record["wall_clock_time"]
+        comparison.append((create_record_key(record), baseline_t, t, t / baseline_t if baseline_t > 0 else float("inf")))
+    # end for
+
+    return comparison
+# End of compare_wall_clock_times()
\ No newline at end of file
@@ -0,0 +1,148 @@
+###############################################
+#   @file   cache.py
+#   @author Tomomasa Uchida
+#   @date   2026/10/18
+###############################################
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .image_io import read_image
+from .reference import search_reference_pixel_value_L1
+from .stats import BGColor, convert_BGColor_to_Gray, calculate_statistics_L1
+from .util import write_text_atomically
+
+# Default parameter
+max_cache_bytes = 64 * 1024 * 1024 # 64(MB)
+
+
+
+# Hash of the image file itself, so that a cached image is never decoded
+def calc_image_file_hash(_img_name):
+    hash_of_file = hashlib.sha256()
+    with open(_img_name, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hash_of_file.update(chunk)
+    # end with
+
+    return hash_of_file.hexdigest()
+# End of calc_image_file_hash()
+
+
+
+def create_cache_key(_img_name_L1, _BGColor=BGColor):
+    BGColor_str = "_".join(str(int(value)) for value in _BGColor)
+
+    return calc_image_file_hash(_img_name_L1) + "_" + BGColor_str
+# End of create_cache_key()
+
+
+
+def read_cache_entry(_cache_dir, _key):
+    entry_name = os.path.join(_cache_dir, _key + ".json")
+    try:
+        with open(entry_name) as f:
+            entry = json.load(f)
+
+        # Mark as recently used
+        os.utime(entry_name)
+
+    except (FileNotFoundError, ValueError):
+        return None
+
+    return entry
+# End of read_cache_entry()
+
+
+
+# NOTE: The entry is written to a temporary file and then renamed,
+#       so that processes sharing the cache never read a half-written entry
+def write_cache_entry(_cache_dir, _key, _entry, _max_cache_bytes=max_cache_bytes):
+    write_text_atomically(os.path.join(_cache_dir, _key + ".json"), json.dumps(_entry))
+
+    evict_cache_entries(_cache_dir, _max_cache_bytes)
+# End of write_cache_entry()
+
+
+
+# Remove the least recently used entries until the cache fits in "_max_cache_bytes"
+def evict_cache_entries(_cache_dir, _max_cache_bytes=max_cache_bytes):
+    entries = []
+    for entry in os.scandir(_cache_dir):
+        if not entry.name.endswith(".json"):
+            continue
+
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+    # end for
+
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, entry_name in sorted(entries):
+        if total_bytes <= _max_cache_bytes:
+            break
+
+        # NOTE: Another process may have removed it already
+        try:
+            os.remove(entry_name)
+        except FileNotFoundError:
+            pass
+
+        total_bytes -= size
+    # end for
+# End of evict_cache_entries()
+
+
+
+def create_cache_entry(_img_name_L1, _BGColor=BGColor):
+    img_RGB_L1 = read_image(_img_name_L1)
+    N_all_non_bgcolor_L1, max_pixel_value_L1, bincount_L1 = calculate_statistics_L1(img_RGB_L1, convert_BGColor_to_Gray(_BGColor))
+
+    return {
+        "N_all_non_bgcolor_L1"      : int(N_all_non_bgcolor_L1),
+        "max_pixel_value_L1"        : int(max_pixel_value_L1),
+        "bincount_L1"               : bincount_L1.tolist(),
+        "reference_pixel_value_L1"  : {},
+    }
+# End of create_cache_entry()
+
+
+
+# Statistics (L=1) of calculate_statistics_L1() through the cache
+def get_statistics_L1(_img_name_L1, _cache_dir, _BGColor=BGColor, _max_cache_bytes=max_cache_bytes):
+    key   = create_cache_key(_img_name_L1, _BGColor)
+    entry = read_cache_entry(_cache_dir, key)
+    if entry is None:
+        entry = create_cache_entry(_img_name_L1, _BGColor)
+        write_cache_entry(_cache_dir, key, entry, _max_cache_bytes)
+
+    return entry["N_all_non_bgcolor_L1"], np.uint8(entry["max_pixel_value_L1"]), np.array(entry["bincount_L1"], dtype=np.int64)
+# End of get_statistics_L1()
+
+
+
+# Reference section [reference, max] (L=1) of search_reference_pixel_value_L1() through the cache
+def get_reference_section_L1(_img_name_L1, _pct_of_reference_section, _cache_dir, _BGColor=BGColor, _max_cache_bytes=max_cache_bytes):
+    key   = create_cache_key(_img_name_L1, _BGColor)
+    entry = read_cache_entry(_cache_dir, key)
+    if entry is None:
+        entry = create_cache_entry(_img_name_L1, _BGColor)
+
+    # The reference pixel value for each pct. of reference section
+    pct_key = repr(float(_pct_of_reference_section))
+    if pct_key not in entry["reference_pixel_value_L1"]:
+        reference_pixel_value_L1, pct_of_reference_section_L1 = search_reference_pixel_value_L1(
+            np.array(entry["bincount_L1"], dtype=np.int64), entry["max_pixel_value_L1"], entry["N_all_non_bgcolor_L1"], _pct_of_reference_section)
+        entry["reference_pixel_value_L1"][pct_key] = [int(reference_pixel_value_L1), float(pct_of_reference_section_L1)]
+        write_cache_entry(_cache_dir, key, entry, _max_cache_bytes)
+
+    reference_pixel_value_L1, pct_of_reference_section_L1 = entry["reference_pixel_value_L1"][pct_key]
+
+    return np.uint8(reference_pixel_value_L1), np.uint8(entry["max_pixel_value_L1"]), pct_of_reference_section_L1
+# End of get_reference_section_L1()
@@ -0,0 +1,224 @@
+###############################################
+#   @file   decompose.py
+#   @author Tomomasa Uchida
+#   @date   2026/10/18
+###############################################
+
+import numpy as np
+import cv2
+
+from .apply import create_amplification_LUT
+from .stats import chunk_size, BGColor, BGColor_Gray, convert_BGColor_to_Gray, convert_RGB_to_Gray, create_bgcolor_index, calc_histogram
+from .threshold import get_threshold_strategy
+
+# Labels of the label map
+label_bgcolor   = 0
+label_low       = 1
+label_high      = 2
+
+
+
+# Threshold pixel value for the decomposition from the histogram of the grayscale image (background color included)
+# NOTE: "_threshold_method" is one of "threshold_strategies", e.g.,
+#   "mean_std" : mean + std (adjust_brightness_decompose.py)
+#   "otsu"     : Otsu's method (adjust_brightness_decompose_otsu.py)
+def calc_threshold_pixel_value_from_histogram(_hist, _threshold_method="mean_std", _BGColor_Gray=BGColor_Gray):
+    calc_threshold, _ = get_threshold_strategy(_threshold_method)
+
+    return calc_threshold(_hist, _BGColor_Gray)
+# End of calc_threshold_pixel_value_from_histogram()
+
+
+
+def calc_threshold_pixel_value(_img_RGB, _threshold_method="mean_std", _BGColor=BGColor):
+    return calc_threshold_pixel_value_from_histogram(calc_histogram(convert_RGB_to_Gray(_img_RGB)), _threshold_method, convert_BGColor_to_Gray(_BGColor))
+# End of calc_threshold_pixel_value()
+
+
+
+# Decompose the image into two images (high pixel value image and low pixel value image)
+# NOTE: Otsu's method puts the threshold pixel value itself into the high pixel value image
+def decompose_image(_img_RGB, _threshold_pixel_value, _BGColor=BGColor, _high_includes_threshold=False):
+    img_Gray        = convert_RGB_to_Gray(_img_RGB)
+    b_index_bgcolor = create_bgcolor_index(_img_RGB, _BGColor)
+    if _high_includes_threshold:
+        b_index_high = (img_Gray >= _threshold_pixel_value) & (~b_index_bgcolor)
+        b_index_low  = (img_Gray  < _threshold_pixel_value) & (~b_index_bgcolor)
+    else:
+        b_index_high = (img_Gray  > _threshold_pixel_value) & (~b_index_bgcolor)
+        b_index_low  = (img_Gray <= _threshold_pixel_value) & (~b_index_bgcolor)
+    N_high, N_low   = np.count_nonzero(b_index_high), np.count_nonzero(b_index_low)
+
+    # Apply decomposition and create low and high pixel value images
+    high_img_RGB    = np.where(b_index_high[:,:,np.newaxis], _img_RGB, np.array(_BGColor, dtype=np.uint8))
+    low_img_RGB     = np.where(b_index_low[:,:,np.newaxis],  _img_RGB, np.array(_BGColor, dtype=np.uint8))
+
+    # Calulate mean pixel value
+    BGColor_Gray            = convert_BGColor_to_Gray(_BGColor)
+    high_img_Gray           = convert_RGB_to_Gray(high_img_RGB)
+    low_img_Gray            = convert_RGB_to_Gray(low_img_RGB)
+    mean_pixel_value_high   = np.uint8(np.mean(high_img_Gray[high_img_Gray != BGColor_Gray]))
+    mean_pixel_value_low    = np.uint8(np.mean(low_img_Gray[low_img_Gray   != BGColor_Gray]))
+
+    return high_img_RGB, low_img_RGB, N_high, N_low, mean_pixel_value_high, mean_pixel_value_low
+# End of decompose_image()
+
+
+
+# Resynthesize the adjusted high and low pixel value images
+def resynthesize_images(_high_img_RGB, _low_img_RGB):
+    return cv2.scaleAdd(_high_img_RGB, 1.0, _low_img_RGB)
+# End of resynthesize_images()
+
+
+
+# Label each pixel as background, low or high pixel value, instead of creating two masked copies of the image
+# NOTE: Otsu's method puts the threshold pixel value itself into the high pixel value image
+# NOTE: "_img_Gray" is the grayscale image of "_img_RGB" if already converted
+def create_label_map(_img_RGB, _threshold_pixel_value, _BGColor=BGColor, _high_includes_threshold=False, _img_Gray=None):
+    img_Gray = convert_RGB_to_Gray(_img_RGB) if _img_Gray is None else _img_Gray
+    if _high_includes_threshold:
+        b_index_high = img_Gray >= _threshold_pixel_value
+    else:
+        b_index_high = img_Gray  > _threshold_pixel_value
+
+    label_map = b_index_high.view(np.uint8) + np.uint8(label_low)
+    label_map[create_bgcolor_index(_img_RGB, _BGColor)] = label_bgcolor
+
+    return label_map, img_Gray
+# End of create_label_map()
+
+
+
+# Grayscale histogram of each label: "hist[label, pixel value]"
+def calc_labelled_histogram(_img_Gray, _label_map, _num_of_labels):
+    img_Gray, label_map = _img_Gray.ravel(), _label_map.ravel()
+    hist = np.zeros(_num_of_labels * 256, dtype=np.int64)
+    for start in range(0, img_Gray.shape[0], chunk_size):
+        labelled_pixel_value = label_map[start:start+chunk_size].astype(np.intp) * 256 + img_Gray[start:start+chunk_size]
+        hist += np.bincount(labelled_pixel_value, minlength=_num_of_labels * 256)
+    # end for
+
+    return hist.reshape(_num_of_labels, 256)
+# End of calc_labelled_histogram()
+
+
+
+# Number of pixels and mean pixel value of each label from one labelled histogram
+# NOTE: Same mean pixel value as the masked image, i.e., pixels whose grayscale value is the background color are excluded
+def calculate_layer_statistics(_img_Gray, _label_map, _num_of_labels=3, _BGColor_Gray=BGColor_Gray):
+    hist            = calc_labelled_histogram(_img_Gray, _label_map, _num_of_labels)
+    N_of_layers     = hist.sum(axis=1)
+
+    hist[:, int(_BGColor_Gray)] = 0
+    N_non_bgcolor   = hist.sum(axis=1)
+    sum_of_pixel_values = hist @ np.arange(256, dtype=np.int64)
+    mean_of_layers  = [np.uint8(sum_of_pixel_values[label] / N_non_bgcolor[label]) if N_non_bgcolor[label] > 0 else np.uint8(0) for label in range(_num_of_labels)]
+
+    return N_of_layers, mean_of_layers
+# End of calculate_layer_statistics()
+
+
+
+# Decompose the image into a label map instead of high and low pixel value images
+def decompose_image_into_labels(_img_RGB, _threshold_pixel_value, _BGColor=BGColor, _high_includes_threshold=False, _img_Gray=None):
+    label_map, img_Gray         = create_label_map(_img_RGB, _threshold_pixel_value, _BGColor, _high_includes_threshold, _img_Gray)
+    N_of_layers, mean_of_layers = calculate_layer_statistics(img_Gray, label_map, 3, convert_BGColor_to_Gray(_BGColor))
+
+    return label_map, N_of_layers[label_high], N_of_layers[label_low], mean_of_layers[label_high], mean_of_layers[label_low]
+# End of decompose_image_into_labels()
+
+
+
+# Label each pixel with its class from the darkest one ("label_low") to the brightest one
+# NOTE: "_threshold_pixel_values" are in ascending order, and a pixel value equal to a threshold pixel value belongs to the darker class,
+#       so the same label map as create_label_map() for one threshold pixel value
+def create_class_label_map(_img_RGB, _threshold_pixel_values, _BGColor=BGColor, _img_Gray=None):
+    img_Gray  = convert_RGB_to_Gray(_img_RGB) if _img_Gray is None else _img_Gray
+    label_LUT = (np.searchsorted(np.asarray(_threshold_pixel_values, dtype=np.int64), np.arange(256), side="left") + label_low).astype(np.uint8)
+
+    label_map = cv2.LUT(img_Gray, label_LUT)
+    label_map[create_bgcolor_index(_img_RGB, _BGColor)] = label_bgcolor
+
+    return label_map, img_Gray
+# End of create_class_label_map()
+
+
+
+# Decompose the image into a label map of "len(_threshold_pixel_values) + 1" classes
+# NOTE: "N_of_labels[label]" and "mean_of_labels[label]" ("label_bgcolor" included)
+def decompose_image_into_classes(_img_RGB, _threshold_pixel_values, _BGColor=BGColor, _img_Gray=None):
+    label_map, img_Gray          = create_class_label_map(_img_RGB, _threshold_pixel_values, _BGColor, _img_Gray)
+    N_of_labels, mean_of_labels  = calculate_layer_statistics(img_Gray, label_map, len(_threshold_pixel_values) + 2, convert_BGColor_to_Gray(_BGColor))
+
+    return label_map, N_of_labels, mean_of_labels
+# End of decompose_image_into_classes()
+
+
+
+# Rows of the image processed at once
+def calc_num_of_rows_in_chunk(_img):
+    return max(1, chunk_size // max(1, _img.shape[1]))
+# End of calc_num_of_rows_in_chunk()
+
+
+
+# The pixels of one label as an (N, 1, 3) image, which the search of "p" accepts as it is
+# NOTE: An empty layer gives one background pixel, i.e., the same search as the masked image without any pixel
+def extract_layer_pixels(_img_RGB, _label_map, _label, _BGColor=BGColor, _N_of_label=None):
+    N_of_label = np.count_nonzero(_label_map == _label) if _N_of_label is None else int(_N_of_label)
+    if N_of_label == 0:
+        return np.array(_BGColor, dtype=np.uint8).reshape(1, 1, 3)
+
+    layer_pixels, index = np.empty((N_of_label, 1, 3), dtype=np.uint8), 0
+    num_of_rows = calc_num_of_rows_in_chunk(_img_RGB)
+    for start in range(0, _img_RGB.shape[0], num_of_rows):
+        pixels = _img_RGB[start:start+num_of_rows][_label_map[start:start+num_of_rows] == _label]
+        layer_pixels[index:index+pixels.shape[0], 0] = pixels
+        index += pixels.shape[0]
+    # end for
+
+    return layer_pixels
+# End of extract_layer_pixels()
+
+
+
+# Table of the composite: "layer_LUTs[label, pixel value, channel]"
+# NOTE: The LUT of "_p_of_layers[label]" for each label, and the background color for "label_bgcolor"
+def create_layer_LUTs(_p_of_layers, _BGColor=BGColor):
+    layer_LUTs = np.empty((len(_p_of_layers), 256, 3), dtype=np.uint8)
+    layer_LUTs[label_bgcolor] = np.array(_BGColor, dtype=np.uint8)
+    for label in range(label_low, len(_p_of_layers)):
+        layer_LUTs[label] = create_amplification_LUT(_p_of_layers[label]).reshape(256, 1)
+    # end for
+
+    return layer_LUTs
+# End of create_layer_LUTs()
+
+
+
+# Adjust each label with its own "p" directly into one output image: "_p_of_layers[label]"
+# NOTE: Each pixel and channel is read once and looked up once in the table of create_layer_LUTs(),
+#       instead of one LUT pass for each label followed by a masked copy
+# NOTE: For the black background, the same image as resynthesize_images() of the adjusted high and low pixel value images,
+#       and the background color is kept as it is for the other ones
+def adjust_layers(_img_RGB, _label_map, _p_of_layers, _BGColor=BGColor, _dst=None):
+    adjusted_img_RGB = np.empty_like(_img_RGB) if _dst is None else _dst
+    layer_LUTs       = create_layer_LUTs(_p_of_layers, _BGColor).ravel()
+    channel_offset   = np.arange(3, dtype=np.intp)
+
+    # Index of each pixel and channel in the table: (label * 256 + pixel value) * 3 + channel
+    # NOTE: A quarter of the rows of the other chunks, since the index is 8 bytes for each channel
+    num_of_rows = max(1, calc_num_of_rows_in_chunk(_img_RGB) // 4)
+    index       = np.empty((min(num_of_rows, _img_RGB.shape[0]),) + _img_RGB.shape[1:], dtype=np.intp)
+    for start in range(0, _img_RGB.shape[0], num_of_rows):
+        img_RGB   = _img_RGB[start:start+num_of_rows]
+        tmp_index = index[:img_RGB.shape[0]]
+        np.multiply(img_RGB, 3, out=tmp_index, dtype=np.intp)
+        tmp_index += _label_map[start:start+num_of_rows, :, np.newaxis] * np.intp(256 * 3)
+        tmp_index += channel_offset
+        np.take(layer_LUTs, tmp_index, out=adjusted_img_RGB[start:start+num_of_rows])
+    # end for
+
+    return adjusted_img_RGB
+# End of adjust_layers()
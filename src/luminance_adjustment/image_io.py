@@ -0,0 +1,28 @@
+###############################################
+#   @file   image_io.py
+#   @author Tomomasa Uchida
+#   @date   2026/10/18
+###############################################
+
+import cv2
+
+from .metrics import measure_stage
+
+
+
+def read_image(_img_name):
+    with measure_stage("decode"):
+        img_BGR = cv2.imread(_img_name)
+        if img_BGR is None:
+            raise FileNotFoundError("Cannot read image: " + _img_name)
+
+        return cv2.cvtColor(img_BGR, cv2.COLOR_BGR2RGB)
+# End of read_image()
+
+
+
+def write_image(_img_name, _img_RGB):
+    with measure_stage("encode"):
+        if not cv2.imwrite(_img_name, cv2.cvtColor(_img_RGB, cv2.COLOR_RGB2BGR)):
+            raise OSError("Cannot write image: " + _img_name)
+# End of write_image()
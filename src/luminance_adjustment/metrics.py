@@ -0,0 +1,188 @@
+###############################################
+#   @file   metrics.py
+#   @author Tomomasa Uchida
+#   @date   2026/10/18
+###############################################
+
+import contextlib
+import json
+import time
+import tracemalloc
+
+from .util import write_text_atomically
+
+# State of this process
+# NOTE: Disabled by default. Then measure_stage() returns a shared no-op context
+#       and add_count() returns at once, so the pipelines pay almost nothing.
+b_metrics_enabled   = False
+b_trace_memory      = False
+metric_events       = []
+memory_stack        = [] # [traced memory at the start, peak traced memory seen so far] of the open stages
+
+# Prefix of the Prometheus-style metric names
+metric_prefix       = "luminance_adjustment_"
+
+# Labels kept only in JSON lines, since one series per image is too many for Prometheus
+prometheus_excluded_labels = ("input",)
+
+null_context        = contextlib.nullcontext()
+
+
+
+# NOTE: "_b_trace_memory" records the bytes allocated in each stage with tracemalloc, which slows down the pipelines
+def enable_metrics(_b_trace_memory=False):
+    global b_metrics_enabled, b_trace_memory
+    b_metrics_enabled, b_trace_memory = True, _b_trace_memory
+    if b_trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+# End of enable_metrics()
+
+
+
+def disable_metrics():
+    global b_metrics_enabled, b_trace_memory
+    if b_trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    b_metrics_enabled, b_trace_memory = False, False
+# End of disable_metrics()
+
+
+
+def reset_metrics():
+    del metric_events[:]
+    del memory_stack[:]
+# End of reset_metrics()
+
+
+
+def is_metrics_enabled():
+    return b_metrics_enabled
+# End of is_metrics_enabled()
+
+
+
+def is_memory_traced():
+    return b_metrics_enabled and b_trace_memory
+# End of is_memory_traced()
+
+
+
+def get_metric_events():
+    return list(metric_events)
+# End of get_metric_events()
+
+
+
+@contextlib.contextmanager
+def measure_stage_enabled(_stage, _labels):
+    if b_trace_memory:
+        # NOTE: reset_peak() also clears the peak of the outer stage, so keep it on the stack
+        current, peak = tracemalloc.get_traced_memory()
+        if len(memory_stack) > 0:
+            memory_stack[-1][1] = max(memory_stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        memory_stack.append([current, current])
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        event = dict(_labels, type="stage", stage=_stage, seconds=time.perf_counter() - start)
+
+        if b_trace_memory:
+            start_memory, inner_peak = memory_stack.pop()
+            peak = max(tracemalloc.get_traced_memory()[1], inner_peak)
+            if len(memory_stack) > 0:
+                memory_stack[-1][1] = max(memory_stack[-1][1], peak)
+            event["bytes_allocated"] = peak - start_memory
+
+        metric_events.append(event)
+    # end try
+# End of measure_stage_enabled()
+
+
+
+# Record the duration of a stage: "with measure_stage("solve"):"
+def measure_stage(_stage, **_labels):
+    if not b_metrics_enabled:
+        return null_context
+
+    return measure_stage_enabled(_stage, _labels)
+# End of measure_stage()
+
+
+
+# Record a count, e.g., the number of iterations of the search of "p" or the number of pixels
+def add_count(_name, _value=1, **_labels):
+    if not b_metrics_enabled:
+        return
+
+    metric_events.append(dict(_labels, type="count", name=_name, value=int(_value)))
+# End of add_count()
+
+
+
+# One JSON object per event, appended to the file
+def write_metrics_jsonl(_file_name, _events=None):
+    events = metric_events if _events is None else _events
+    with open(_file_name, "a") as f:
+        for event in events:
+            f.write(json.dumps(event) + "\n")
+    # end with
+# End of write_metrics_jsonl()
+
+
+
+def create_prometheus_labels(_labels):
+    if len(_labels) == 0:
+        return ""
+
+    return "{" + ",".join(key + "=\"" + str(value).replace("\\", "\\\\").replace("\"", "\\\"") + "\"" for key, value in _labels) + "}"
+# End of create_prometheus_labels()
+
+
+
+# Sum up the events into counters in the Prometheus text format
+def create_prometheus_text(_events=None):
+    events  = metric_events if _events is None else _events
+    metrics = {} # name -> {labels: value}
+    for event in events:
+        if event["type"] == "stage":
+            labels = tuple(sorted((key, value) for key, value in event.items() if key not in ("type", "seconds", "bytes_allocated") + prometheus_excluded_labels))
+            for name, value in [("stage_seconds_total", event["seconds"]), ("stage_calls_total", 1), ("stage_bytes_allocated_total", event.get("bytes_allocated"))]:
+                if value is not None:
+                    metrics.setdefault(name, {})
+                    metrics[name][labels] = metrics[name].get(labels, 0) + value
+            # end for
+        else:
+            name   = event["name"] + "_total"
+            labels = tuple(sorted((key, value) for key, value in event.items() if key not in ("type", "name", "value") + prometheus_excluded_labels))
+            metrics.setdefault(name, {})
+            metrics[name][labels] = metrics[name].get(labels, 0) + event["value"]
+    # end for
+
+    lines = []
+    for name in sorted(metrics):
+        lines.append("# TYPE " + metric_prefix + name + " counter")
+        for labels in sorted(metrics[name]):
+            lines.append(metric_prefix + name + create_prometheus_labels(labels) + " " + repr(metrics[name][labels]))
+    # end for
+
+    return "\n".join(lines) + "\n"
+# End of create_prometheus_text()
+
+
+
+def write_metrics_prometheus(_file_name, _events=None):
+    write_text_atomically(_file_name, create_prometheus_text(_events))
+# End of write_metrics_prometheus()
+
+
+
+# Prometheus text format for ".prom", otherwise JSON lines
+def write_metrics(_file_name, _events=None):
+    if _file_name.endswith(".prom"):
+        write_metrics_prometheus(_file_name, _events)
+    else:
+        write_metrics_jsonl(_file_name, _events)
+# End of write_metrics()
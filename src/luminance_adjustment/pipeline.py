@@ -0,0 +1,238 @@
+###############################################
+#   @file   pipeline.py
+#   @author Tomomasa Uchida
+#   @date   2026/10/18
+###############################################
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .apply import adjust_pixel_value
+from .decompose import label_low, label_high, decompose_image_into_labels, decompose_image_into_classes, extract_layer_pixels, adjust_layers
+from .metrics import is_memory_traced, measure_stage, add_count
+from .reference import search_reference_pixel_value_L1, search_left_edge_pixel_value_L1
+from .solve import p_search_engine, determine_amplification_factor, determine_amplification_factor_for_decomposed_image, determine_amplification_factors_of_labels_by_crossing
+from .threshold import get_threshold_strategy, calc_multi_otsu_thresholds_from_histogram
+from .stats import BGColor, BGColor_Gray, convert_BGColor_to_Gray, convert_RGB_to_Gray, calc_histogram, calculate_statistics, calculate_statistics_L1
+
+# Default parameter
+pct_of_reference_section    = 0.01  #  1(%)
+pct_of_ref_sec4high         = 0.01  #  1(%)
+pct_of_ref_sec4low          = 0.1   # 10(%)
+
+
+
+# Same procedure as adjust_brightness.py
+def adjust_brightness(_img_RGB, _img_RGB_L1, _pct_of_reference_section=pct_of_reference_section, _engine=p_search_engine, _BGColor=BGColor):
+    BGColor_Gray = convert_BGColor_to_Gray(_BGColor)
+
+    # Step1. Get max pixel value (L=1)
+    with measure_stage("statistics"):
+        N_all_non_bgcolor, _, _                                 = calculate_statistics(_img_RGB, BGColor_Gray)
+    with measure_stage("statistics_L1"):
+        N_all_non_bgcolor_L1, max_pixel_value_L1, bincount_L1   = calculate_statistics_L1(_img_RGB_L1, BGColor_Gray)
+    add_count("pixels", N_all_non_bgcolor_L1, image="L1")
+
+    # Step2. Search for reference pixel value (L=1)
+    with measure_stage("reference"):
+        reference_pixel_value_L1, _ = search_reference_pixel_value_L1(bincount_L1, max_pixel_value_L1, N_all_non_bgcolor_L1, _pct_of_reference_section)
+
+    # Step3. Adjust pixel value
+    adjusted_img_RGB, p_final = adjust_brightness_by_reference_pixel_value(_img_RGB, reference_pixel_value_L1, _pct_of_reference_section, _engine, _BGColor, N_all_non_bgcolor)
+
+    return adjusted_img_RGB, p_final, reference_pixel_value_L1, max_pixel_value_L1
+# End of adjust_brightness()
+
+
+
+# Adjust brightness with a reference pixel value (L=1) that is already known (e.g., from the cache)
+# NOTE: The input image with L=1 is not needed here
+def adjust_brightness_by_reference_pixel_value(_img_RGB, _reference_pixel_value_L1, _pct_of_reference_section=pct_of_reference_section, _engine=p_search_engine, _BGColor=BGColor, _N_all_non_bgcolor=None):
+    BGColor_Gray = convert_BGColor_to_Gray(_BGColor)
+    if _N_all_non_bgcolor is None:
+        with measure_stage("statistics"):
+            _N_all_non_bgcolor, _, _ = calculate_statistics(_img_RGB, BGColor_Gray)
+    add_count("pixels", _N_all_non_bgcolor, image="input")
+
+    with measure_stage("solve", engine=_engine):
+        p_final = determine_amplification_factor(_img_RGB, _reference_pixel_value_L1, _pct_of_reference_section, _N_all_non_bgcolor, _engine, BGColor_Gray)
+
+    with measure_stage("apply"):
+        adjusted_img_RGB = adjust_pixel_value(_img_RGB, p_final)
+
+    return adjusted_img_RGB, p_final
+# End of adjust_brightness_by_reference_pixel_value()
+
+
+
+# Determine "p" of the high or low pixel value image (or of its pixels from extract_layer_pixels())
+def determine_amplification_factor_of_decomposed_image(_img_RGB, _N_all_non_bgcolor, _right_edge_pixel_value, _pct_of_ref_section, _N_all_non_bgcolor_L1, _bincount_L1, _engine=p_search_engine, _BGColor_Gray=BGColor_Gray):
+    # Determine left edge pixel value in the input image with L=1
+    with measure_stage("reference"):
+        left_edge_pixel_value_L1, _ = search_left_edge_pixel_value_L1(_bincount_L1, _right_edge_pixel_value, _N_all_non_bgcolor_L1, _pct_of_ref_section)
+
+    # Determine amplification factor "p" in the image
+    with measure_stage("solve", engine=_engine):
+        p_final, _ = determine_amplification_factor_for_decomposed_image(_img_RGB, left_edge_pixel_value_L1, _pct_of_ref_section, _N_all_non_bgcolor, _engine, _BGColor_Gray)
+
+    return p_final
+# End of determine_amplification_factor_of_decomposed_image()
+
+
+
+# Determine "p" of the "high" and "low" pixel value images
+# NOTE: The two searches only share the statistics (L=1) and OpenCV and NumPy release the GIL,
+#       so the "low" one runs on a worker thread while the "high" one runs on this thread.
+#       They run one after the other with "_b_parallel=False" or while tracing memory,
+#       since the stages measured with tracemalloc must not overlap.
+def determine_amplification_factors_of_layers(_img_RGB, _label_map, _N_high, _N_low, _right_edge_pixel_value_high, _right_edge_pixel_value_low, _pct_of_ref_sec4high, _pct_of_ref_sec4low, _N_all_non_bgcolor_L1, _bincount_L1, _engine=p_search_engine, _BGColor=BGColor, _b_parallel=True):
+    BGColor_Gray = convert_BGColor_to_Gray(_BGColor)
+
+    def determine_p_of_layer(_label, _N_of_label, _right_edge_pixel_value, _pct_of_ref_section):
+        layer_pixels_RGB = extract_layer_pixels(_img_RGB, _label_map, _label, _BGColor, _N_of_label)
+        return determine_amplification_factor_of_decomposed_image(layer_pixels_RGB, _N_of_label, _right_edge_pixel_value, _pct_of_ref_section, _N_all_non_bgcolor_L1, _bincount_L1, _engine, BGColor_Gray)
+    # End of determine_p_of_layer()
+
+    args_high = (label_high, _N_high, _right_edge_pixel_value_high, _pct_of_ref_sec4high)
+    args_low  = (label_low,  _N_low,  _right_edge_pixel_value_low,  _pct_of_ref_sec4low)
+    if not _b_parallel or is_memory_traced():
+        return determine_p_of_layer(*args_high), determine_p_of_layer(*args_low)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future_low = executor.submit(determine_p_of_layer, *args_low)
+        p_high     = determine_p_of_layer(*args_high)
+        p_low      = future_low.result()
+    # end with
+
+    return p_high, p_low
+# End of determine_amplification_factors_of_layers()
+
+
+
+# Adjust brightness of the high or low pixel value image
+def adjust_brightness_of_decomposed_image(_img_RGB, _N_all_non_bgcolor, _right_edge_pixel_value, _pct_of_ref_section, _N_all_non_bgcolor_L1, _bincount_L1, _engine=p_search_engine, _BGColor_Gray=BGColor_Gray):
+    p_final = determine_amplification_factor_of_decomposed_image(_img_RGB, _N_all_non_bgcolor, _right_edge_pixel_value, _pct_of_ref_section, _N_all_non_bgcolor_L1, _bincount_L1, _engine, _BGColor_Gray)
+
+    with measure_stage("apply"):
+        adjusted_img_RGB = adjust_pixel_value(_img_RGB, p_final)
+
+    return adjusted_img_RGB, p_final
+# End of adjust_brightness_of_decomposed_image()
+
+
+
+# Same procedure as adjust_brightness_decompose.py ("mean_std") and adjust_brightness_decompose_otsu.py ("otsu")
+# NOTE: "_threshold_method" is one of "threshold_strategies" (see threshold.py)
+# NOTE: adjust_brightness_decompose_otsu.py uses 0.01 for "_pct_of_ref_sec4low"
+# NOTE: The input image is decomposed into a label map, not into two masked copies,
+#       and both layers are adjusted directly into one output image
+def adjust_brightness_decompose(_img_RGB, _img_RGB_L1, _pct_of_ref_sec4high=pct_of_ref_sec4high, _pct_of_ref_sec4low=pct_of_ref_sec4low, _threshold_method="mean_std", _engine=p_search_engine, _BGColor=BGColor, _b_parallel=True):
+    BGColor_Gray = convert_BGColor_to_Gray(_BGColor)
+    with measure_stage("statistics_L1"):
+        N_all_non_bgcolor_L1, max_pixel_value_L1, bincount_L1 = calculate_statistics_L1(_img_RGB_L1, BGColor_Gray)
+    add_count("pixels", N_all_non_bgcolor_L1, image="L1")
+
+    # Step1. Decompose the input image to "high" and "low" pixel value images
+    # NOTE: The grayscale image and its histogram are shared by the threshold and the decomposition
+    calc_threshold, b_high_includes_threshold = get_threshold_strategy(_threshold_method)
+    with measure_stage("threshold", method=_threshold_method):
+        img_Gray              = convert_RGB_to_Gray(_img_RGB)
+        threshold_pixel_value = calc_threshold(calc_histogram(img_Gray), BGColor_Gray)
+    with measure_stage("decompose"):
+        label_map, N_high, N_low, mean_pixel_value_high, _ = decompose_image_into_labels(_img_RGB, threshold_pixel_value, _BGColor, b_high_includes_threshold, img_Gray)
+    del img_Gray
+    add_count("pixels", N_high, image="high")
+    add_count("pixels", N_low,  image="low")
+
+    # Step2. Determine "p" of the "high" and "low" pixel value images at the same time
+    # NOTE: The right edge for the "low" one (the mean of the "high" one) is already known here
+    p_high, p_low = determine_amplification_factors_of_layers(_img_RGB, label_map, N_high, N_low, max_pixel_value_L1, mean_pixel_value_high, _pct_of_ref_sec4high, _pct_of_ref_sec4low, N_all_non_bgcolor_L1, bincount_L1, _engine, _BGColor, _b_parallel)
+
+    # Step3. Adjust "high" and "low" pixel values into one image
+    with measure_stage("apply"):
+        adjusted_img_RGB = adjust_layers(_img_RGB, label_map, [None, p_low, p_high], _BGColor)
+
+    return adjusted_img_RGB, p_high, p_low
+# End of adjust_brightness_decompose()
+
+
+
+# Determine "p" of every class of the label map: "p_of_labels[label]"
+# NOTE: With the "crossing" engine, the pixels of all classes are searched in one pass, each with the reference section of its own class.
+#       A class whose left edge pixel value is the background color, and every class with the other engines, is searched by itself.
+def determine_amplification_factors_of_classes(_img_RGB, _label_map, _N_of_labels, _right_edge_pixel_values, _pcts_of_ref_section, _N_all_non_bgcolor_L1, _bincount_L1, _engine=p_search_engine, _BGColor=BGColor):
+    BGColor_Gray = convert_BGColor_to_Gray(_BGColor)
+    labels       = range(label_low, len(_N_of_labels))
+
+    # Determine left edge pixel value of each class in the input image with L=1
+    left_edge_pixel_values_L1 = [None] * len(_N_of_labels)
+    with measure_stage("reference"):
+        for label in labels:
+            left_edge_pixel_values_L1[label], _ = search_left_edge_pixel_value_L1(_bincount_L1, _right_edge_pixel_values[label], _N_all_non_bgcolor_L1, _pcts_of_ref_section[label])
+    # end with
+
+    p_of_labels = [None] * len(_N_of_labels)
+    with measure_stage("solve", engine=_engine):
+        if _engine == "crossing":
+            labels_in_one_pass = [label for label in labels if left_edge_pixel_values_L1[label] > BGColor_Gray and _N_of_labels[label] > 0]
+        else:
+            labels_in_one_pass = []
+        if labels_in_one_pass:
+            p_of_labels = determine_amplification_factors_of_labels_by_crossing(_img_RGB, _label_map, labels_in_one_pass, left_edge_pixel_values_L1, _pcts_of_ref_section, _N_of_labels)
+
+        for label in labels:
+            if label in labels_in_one_pass:
+                continue
+            layer_pixels_RGB = extract_layer_pixels(_img_RGB, _label_map, label, _BGColor, _N_of_labels[label])
+            p_of_labels[label], _ = determine_amplification_factor_for_decomposed_image(layer_pixels_RGB, left_edge_pixel_values_L1[label], _pcts_of_ref_section[label], _N_of_labels[label], _engine, BGColor_Gray)
+        # end for
+    # end with
+
+    return p_of_labels
+# End of determine_amplification_factors_of_classes()
+
+
+
+# Decompose the input image into "_num_of_classes" classes instead of "high" and "low" pixel value images,
+# and adjust each class with its own "p"
+# NOTE: "_pcts_of_ref_section" and the returned "p" are from the darkest class to the brightest one.
+#       By default, "_pct_of_ref_sec4high" for the brightest class and "_pct_of_ref_sec4low" for the others.
+# NOTE: "_threshold_pixel_values" are found by multi-level Otsu's method if not given.
+#       The right edge of the reference section of each class is the mean pixel value of the next brighter class,
+#       as the "low" pixel value image of adjust_brightness_decompose() uses the mean of the "high" one.
+def adjust_brightness_decompose_into_classes(_img_RGB, _img_RGB_L1, _num_of_classes=3, _pcts_of_ref_section=None, _threshold_pixel_values=None, _engine=p_search_engine, _BGColor=BGColor):
+    BGColor_Gray = convert_BGColor_to_Gray(_BGColor)
+    if _threshold_pixel_values is not None:
+        _num_of_classes = len(_threshold_pixel_values) + 1
+    if _num_of_classes < 2:
+        raise ValueError("The number of classes must be 2 or more: " + str(_num_of_classes))
+    if _pcts_of_ref_section is None:
+        _pcts_of_ref_section = [pct_of_ref_sec4low] * (_num_of_classes - 1) + [pct_of_ref_sec4high]
+    if len(_pcts_of_ref_section) != _num_of_classes:
+        raise ValueError("The number of \"_pcts_of_ref_section\" must be " + str(_num_of_classes))
+
+    with measure_stage("statistics_L1"):
+        N_all_non_bgcolor_L1, max_pixel_value_L1, bincount_L1 = calculate_statistics_L1(_img_RGB_L1, BGColor_Gray)
+    add_count("pixels", N_all_non_bgcolor_L1, image="L1")
+
+    # Step1. Decompose the input image into classes
+    with measure_stage("threshold", method="multi_otsu" if _threshold_pixel_values is None else "given"):
+        img_Gray = convert_RGB_to_Gray(_img_RGB)
+        if _threshold_pixel_values is None:
+            _threshold_pixel_values = calc_multi_otsu_thresholds_from_histogram(calc_histogram(img_Gray), _num_of_classes, BGColor_Gray)
+    with measure_stage("decompose"):
+        label_map, N_of_labels, mean_of_labels = decompose_image_into_classes(_img_RGB, _threshold_pixel_values, _BGColor, img_Gray)
+    del img_Gray
+    for label in range(label_low, len(N_of_labels)):
+        add_count("pixels", N_of_labels[label], image="class" + str(label))
+
+    # Step2. Determine "p" of all classes
+    pcts_of_ref_section     = [None] + list(_pcts_of_ref_section)
+    right_edge_pixel_values = [None] + list(mean_of_labels[label_low+1:]) + [max_pixel_value_L1]
+    p_of_labels = determine_amplification_factors_of_classes(_img_RGB, label_map, N_of_labels, right_edge_pixel_values, pcts_of_ref_section, N_all_non_bgcolor_L1, bincount_L1, _engine, _BGColor)
+
+    # Step3. Adjust all classes into one image
+    with measure_stage("apply"):
+        adjusted_img_RGB = adjust_layers(_img_RGB, label_map, p_of_labels, _BGColor)
+
+    return adjusted_img_RGB, p_of_labels[label_low:], list(_threshold_pixel_values)
+# End of adjust_brightness_decompose_into_classes()
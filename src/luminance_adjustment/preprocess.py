@@ -0,0 +1,213 @@
+###############################################
+#   @file   preprocess.py
+#   @author Tomomasa Uchida
+#   @date   2026/10/18
+###############################################
+
+import numpy as np
+import cv2
+
+from .stats import BGColor, convert_BGColor_to_Gray, convert_RGB_to_Gray, calc_histogram, exclude_bgcolor_from_histogram, calc_percentile_from_histogram
+
+
+
+# Mapping of the pixel values from [_src_min, _src_max] to [_dst_min, _dst_max] as a 256-entry LUT
+# (mappingPixelValue() of adjust_brightness_decompose_mapping.py and statistically_trans_pixel_value_distribution.py)
+# NOTE: The same float operations and truncation to uint8 as the scripts do for each pixel,
+#       done once for 256 pixel values
+def create_mapping_LUT(_src_min, _src_max, _dst_min, _dst_max):
+    pixel_values = np.arange(256, dtype=np.uint8)
+    mapping_LUT  = cv2.subtract(pixel_values, float(_src_min)).astype(np.float64)
+    mapping_LUT  = cv2.divide(mapping_LUT,    float(_src_max - _src_min))
+    mapping_LUT  = cv2.multiply(mapping_LUT,  float(_dst_max - _dst_min))
+    mapping_LUT  = cv2.add(mapping_LUT,       float(_dst_min))
+
+    return mapping_LUT.astype(np.uint8).reshape(256)
+# End of create_mapping_LUT()
+
+
+
+# Map pixel value for each RGB in one pass
+def map_pixel_value(_img_RGB, _src_min, _src_max, _dst_min, _dst_max, _dst=None):
+    return cv2.LUT(_img_RGB, create_mapping_LUT(_src_min, _src_max, _dst_min, _dst_max), dst=_dst)
+# End of map_pixel_value()
+
+
+
+# Mean and std pixel values (float) of the grayscale image from its histogram (background color excluded)
+def calc_mean_and_std_from_histogram(_hist):
+    pixel_values        = np.arange(256, dtype=np.float64)
+    N                   = np.sum(_hist)
+    mean_pixel_value    = np.sum(_hist * pixel_values) / N
+    std_pixel_value     = np.sqrt(np.sum(_hist * (pixel_values - mean_pixel_value)**2) / N)
+
+    return mean_pixel_value, std_pixel_value
+# End of calc_mean_and_std_from_histogram()
+
+
+
+# Statistical transform of the pixel values as a 256-entry LUT:
+# (pixel value - _mean_pixel_value) * _ideal_std_pixel_value / _std_pixel_value + _ideal_mean_pixel_value
+# (transformPixelValueDistributionStatistically() of adjust_brightness_pre-process.py)
+# NOTE: The same float operations and truncation to uint8 as the script does for each pixel
+def create_statistical_transform_LUT(_mean_pixel_value, _std_pixel_value, _ideal_mean_pixel_value, _ideal_std_pixel_value):
+    transform_LUT = np.arange(256, dtype=np.float64)
+    transform_LUT = cv2.subtract(transform_LUT, float(_mean_pixel_value))
+    transform_LUT = cv2.multiply(transform_LUT, float(_ideal_std_pixel_value / _std_pixel_value))
+    transform_LUT = cv2.add(transform_LUT,      float(_ideal_mean_pixel_value))
+
+    return transform_LUT.astype(np.uint8).reshape(256)
+# End of create_statistical_transform_LUT()
+
+
+
+# Transform the pixel value distribution so that its mean and std pixel values become the ideal ones
+# NOTE: "_mean_pixel_value" and "_std_pixel_value" are taken from the grayscale histogram if not given
+# NOTE: Pixels whose grayscale value is the background color are set to "_BGColor", as the script does.
+#       Nothing is written or shown, so that it runs in a batch worker
+def transform_pixel_value_distribution_statistically(_img_RGB, _ideal_mean_pixel_value, _ideal_std_pixel_value, _mean_pixel_value=None, _std_pixel_value=None, _BGColor=BGColor, _dst=None):
+    BGColor_Gray = convert_BGColor_to_Gray(_BGColor)
+    img_Gray     = convert_RGB_to_Gray(_img_RGB)
+    if _mean_pixel_value is None or _std_pixel_value is None:
+        mean_pixel_value, std_pixel_value = calc_mean_and_std_from_histogram(exclude_bgcolor_from_histogram(calc_histogram(img_Gray), BGColor_Gray))
+        _mean_pixel_value = mean_pixel_value if _mean_pixel_value is None else _mean_pixel_value
+        _std_pixel_value  = std_pixel_value  if _std_pixel_value  is None else _std_pixel_value
+
+    transform_LUT        = create_statistical_transform_LUT(_mean_pixel_value, _std_pixel_value, _ideal_mean_pixel_value, _ideal_std_pixel_value)
+    transformed_img_RGB  = cv2.LUT(_img_RGB, transform_LUT, dst=_dst)
+    transformed_img_RGB[img_Gray == BGColor_Gray] = np.array(_BGColor, dtype=np.uint8)
+
+    return transformed_img_RGB
+# End of transform_pixel_value_distribution_statistically()
+
+
+
+# NOTE: A preprocessing stage is a function "stage(_values, _hist_RGB, _hist_Gray)" which returns the new value (float)
+#       of each of the 256 pixel values, where "_values[v]" is the value of the pixel value "v" after the previous stages,
+#       "_hist_RGB" is the histogram of the RGB channels of the input image (background color included)
+#       and "_hist_Gray" is the grayscale histogram of the input image (background color excluded).
+#       Since every stage is a function of the pixel value, consecutive stages fold into one LUT.
+# NOTE: A stage which reads the statistics of the image it is applied to from "_hist_Gray" (e.g., robust_scale_stage())
+#       is in "histogram_stages". The grayscale histogram of an image after the previous stages cannot be derived
+#       from the one of the input image, so the chain is split before such a stage (unless it is the first one):
+#       the image is preprocessed up to it and the histograms are taken again, i.e., one more pass over the pixels.
+
+# Quartile pixel values from the cumulative histogram (robustScalePixelValueDistribution() of adjust_brightness_pre-process.py)
+# NOTE: The same pixel values as np.uint8() of scipy.stats.scoreatpercentile() and np.median() without sorting the pixels
+def calc_quartiles_from_histogram(_hist):
+    return tuple(np.uint8(calc_percentile_from_histogram(_hist, pct)) for pct in (25, 50, 75))
+# End of calc_quartiles_from_histogram()
+
+
+
+# (value - 2nd quartile) / (3rd quartile - 1st quartile) of the grayscale input image (robustScalePixelValueDistribution())
+def robust_scale_stage(_values, _hist_RGB, _hist_Gray):
+    first_quartile, second_quartile, third_quartile = calc_quartiles_from_histogram(_hist_Gray)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (_values - second_quartile) / (third_quartile - first_quartile)
+# End of robust_scale_stage()
+
+
+
+# Stages which read "_hist_Gray" (see register_histogram_stage())
+histogram_stages = [robust_scale_stage]
+
+
+
+# Register a stage which reads the statistics of the image from "_hist_Gray"
+def register_histogram_stage(_stage):
+    histogram_stages.append(_stage)
+# End of register_histogram_stage()
+
+
+
+# Map [min, max] of the values in the image to [0, "_max_value"] and truncate to uint8 (preProcessPixelValueDistribution())
+def create_min_max_mapping_stage(_max_value):
+    def min_max_mapping_stage(_values, _hist_RGB, _hist_Gray):
+        values_in_image = _values[_hist_RGB > 0]
+        min_value, max_value = float(np.min(values_in_image)), float(np.max(values_in_image))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return ((_values - min_value) / (max_value - min_value) * float(_max_value)).astype(np.uint8).astype(np.float64)
+    # End of min_max_mapping_stage()
+
+    return min_max_mapping_stage
+# End of create_min_max_mapping_stage()
+
+
+
+# "_max_value" * (value / "_max_value")^(1/"_gamma") truncated to uint8 (dealWithOutlierPixelValue())
+def create_gamma_stage(_max_value, _gamma=2):
+    def gamma_stage(_values, _hist_RGB, _hist_Gray):
+        return (_max_value * (_values / _max_value)**(1/_gamma)).astype(np.uint8).astype(np.float64)
+    # End of gamma_stage()
+
+    return gamma_stage
+# End of create_gamma_stage()
+
+
+
+# A uint8 LUT as a stage (e.g., create_mapping_LUT() or create_statistical_transform_LUT())
+# NOTE: The values of the previous stages are truncated to uint8 first, as an image of them would be
+def create_LUT_stage(_LUT):
+    LUT = np.asarray(_LUT, dtype=np.uint8).reshape(256)
+
+    def LUT_stage(_values, _hist_RGB, _hist_Gray):
+        return LUT[_values.astype(np.uint8)].astype(np.float64)
+    # End of LUT_stage()
+
+    return LUT_stage
+# End of create_LUT_stage()
+
+
+
+# Fold the stages into one LUT
+# NOTE: "_hist_RGB" and "_hist_Gray" are the histograms of the image before the first stage,
+#       so only the first stage may be one of "histogram_stages" (see split_preprocessing_stages())
+def compose_preprocessing_LUT(_stages, _hist_RGB, _hist_Gray):
+    values = np.arange(256, dtype=np.float64)
+    for stage in _stages:
+        values = stage(values, _hist_RGB, _hist_Gray)
+    # end for
+
+    return values.astype(np.uint8)
+# End of compose_preprocessing_LUT()
+
+
+
+# Split the chain of stages before every one of "histogram_stages" but the first stage
+# NOTE: Each part folds into one LUT with the histograms of the image preprocessed by the previous parts
+def split_preprocessing_stages(_stages):
+    parts = [[]]
+    for stage in _stages:
+        if stage in histogram_stages and len(parts[-1]) > 0:
+            parts.append([])
+        parts[-1].append(stage)
+    # end for
+
+    return parts
+# End of split_preprocessing_stages()
+
+
+
+# Preprocess the image with a chain of stages, in one pass over the pixels for each part of split_preprocessing_stages()
+# NOTE: The two histograms are taken only for the statistics of the stages.
+#       With "_b_keep_bgcolor", pixels whose grayscale value is the background color (in the input image) are set to "_BGColor"
+def preprocess_pixel_value(_img_RGB, _stages, _BGColor=BGColor, _b_keep_bgcolor=False, _dst=None):
+    BGColor_Gray = convert_BGColor_to_Gray(_BGColor)
+    img_Gray     = convert_RGB_to_Gray(_img_RGB)
+
+    preprocessed_img_RGB, preprocessed_img_Gray = _img_RGB, img_Gray
+    for i, stages in enumerate(split_preprocessing_stages(_stages)):
+        if i > 0:
+            preprocessed_img_Gray = convert_RGB_to_Gray(preprocessed_img_RGB)
+        hist_RGB  = calc_histogram(preprocessed_img_RGB)
+        hist_Gray = exclude_bgcolor_from_histogram(calc_histogram(preprocessed_img_Gray), BGColor_Gray)
+
+        preprocessed_img_RGB = cv2.LUT(preprocessed_img_RGB, compose_preprocessing_LUT(stages, hist_RGB, hist_Gray), dst=_dst)
+    # end for
+
+    if _b_keep_bgcolor:
+        preprocessed_img_RGB[img_Gray == BGColor_Gray] = np.array(_BGColor, dtype=np.uint8)
+
+    return preprocessed_img_RGB
+# End of preprocess_pixel_value()
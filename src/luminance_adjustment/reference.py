@@ -0,0 +1,153 @@
+###############################################
+#   @file   reference.py
+#   @author Tomomasa Uchida
+#   @date   2026/10/18
+###############################################
+
+import json
+
+import numpy as np
+
+from .stats import BGColor, convert_BGColor_to_Gray, convert_RGB_to_Gray, calc_histogram, exclude_bgcolor_from_histogram, calc_percentile_from_histogram, calculate_statistics_from_histogram
+from .util import write_text_atomically
+
+# Default parameter
+reference_section_of_255 = 0.01 # 1(%) (auto_correct_pixel_value_maximum_4video.py)
+
+
+
+# Search the reference pixel value (L=1) with the reversed cumulative histogram
+def search_reference_pixel_value_L1(_bincount_L1, _max_pixel_value_L1, _N_all_non_bgcolor_L1, _pct_of_reference_section):
+    # The number of pixels in the section [v, max] for every pixel value v
+    num_of_pixels_in_section     = np.cumsum( _bincount_L1[:int(_max_pixel_value_L1)+1][::-1] )[::-1]
+    tmp_pct_of_reference_section = num_of_pixels_in_section / _N_all_non_bgcolor_L1
+
+    # The largest pixel value whose section satisfies the pct. of reference section
+    b_index_satisfied            = tmp_pct_of_reference_section >= _pct_of_reference_section
+    reference_pixel_value_L1     = np.flatnonzero(b_index_satisfied)[-1] if np.any(b_index_satisfied) else 0
+
+    return np.uint8(reference_pixel_value_L1), tmp_pct_of_reference_section[reference_pixel_value_L1]
+# End of search_reference_pixel_value_L1()
+
+
+
+# Search the left edge pixel value (L=1) with the reversed cumulative histogram
+def search_left_edge_pixel_value_L1(_bincount_L1, _right_edge_pixel_value, _N_all_non_bgcolor_L1, _pct_of_ref_section):
+    # The number of pixels in the section [v, right edge] for every pixel value v
+    num_of_pixels_in_section  = np.cumsum( _bincount_L1[:int(_right_edge_pixel_value)+1][::-1] )[::-1]
+    tmp_pct_of_ref_section_L1 = num_of_pixels_in_section / _N_all_non_bgcolor_L1
+
+    # The largest pixel value whose section exceeds the pct. of ref. section
+    b_index_exceeded          = tmp_pct_of_ref_section_L1 > _pct_of_ref_section
+    tmp_left_edge_pixel_value = np.flatnonzero(b_index_exceeded)[-1] if np.any(b_index_exceeded) else 0
+
+    # NOTE: The linear search stopped two pixel values below the exceeding one
+    left_edge_pixel_value_L1  = np.uint8(max(tmp_left_edge_pixel_value - 2, 0))
+
+    return left_edge_pixel_value_L1, tmp_pct_of_ref_section_L1[tmp_left_edge_pixel_value]
+# End of search_left_edge_pixel_value_L1()
+
+
+
+# NOTE: Rounded as round() of np.float64 in the scripts, which differs from round() of float at some halves (e.g., 1/160)
+def calc_rounded_ratio(_num_of_pixels, _N_all_non_bgcolor_L1, _ndigits):
+    return float(round(np.float64(_num_of_pixels) / _N_all_non_bgcolor_L1, _ndigits))
+# End of calc_rounded_ratio()
+
+
+
+# Standard pixel value (L=1) when the pixel value "255" is too frequent (auto_correct_pixel_value_maximum_4video.py):
+#   the section [standard, 255) holds "_reference_section" of the pixels
+# NOTE: The script decrements the pixel value once more after the section is satisfied, so the standard pixel value is
+#       one below the largest satisfying one. If no section is satisfied (the script never stops), it is 0.
+def search_standard_pixel_value_L1(_bincount_L1, _N_all_non_bgcolor_L1, _reference_section=reference_section_of_255):
+    # The number of pixels in the section [v, 255) for every pixel value v
+    num_of_pixels_in_section = np.cumsum( _bincount_L1[:255][::-1] )[::-1]
+    b_index_satisfied        = num_of_pixels_in_section / _N_all_non_bgcolor_L1 >= _reference_section
+    tmp_standard_pixel_value = np.flatnonzero(b_index_satisfied)[-1] if np.any(b_index_satisfied) else 0
+
+    return max(int(tmp_standard_pixel_value) - 1, 0)
+# End of search_standard_pixel_value_L1()
+
+
+
+# Reference (L=1) of a whole sequence from the grayscale histogram of the input image with L=1 (background color excluded)
+# NOTE: A dict of plain numbers and lists, so that it is computed once, written as JSON (write_reference_L1())
+#       and passed to the worker processes cheaply:
+#       - "max_pixel_value_L1", "ratio_max_pixel_value_L1" and, if the max and most frequent pixel values are both 255,
+#         "standard_pixel_value_L1" and "median_pixel_value_L1" of the section [standard, 255) and "ratio_median_pixel_value_L1"
+#         (auto_correct_pixel_value_maximum_4video.py). "reference_ratio_L1" is the ratio of the median or else of the max pixel value.
+#       - "ratio_overexpose_L1", the ratio of pixels with 255 (auto_correct_pixel_value_ratio255_4video.py)
+#       - "reference_pixel_value_L1" for "_pct_of_reference_section" (adjust_brightness.py)
+def create_reference_L1_from_histogram(_bincount_L1, _pct_of_reference_section=0.01, _reference_section=reference_section_of_255, _BGColor=BGColor):
+    N_all_non_bgcolor_L1, max_pixel_value_L1, _, _ = calculate_statistics_from_histogram(_bincount_L1)
+    if N_all_non_bgcolor_L1 == 0:
+        raise ValueError("The input image with L=1 has no pixel except the background color")
+
+    reference_L1 = {
+        "BGColor"                       : [int(value) for value in _BGColor],
+        "bincount_L1"                   : [int(value) for value in _bincount_L1],
+        "N_all_non_bgcolor_L1"          : int(N_all_non_bgcolor_L1),
+        "max_pixel_value_L1"            : int(max_pixel_value_L1),
+        "ratio_max_pixel_value_L1"      : calc_rounded_ratio(_bincount_L1[int(max_pixel_value_L1)], N_all_non_bgcolor_L1, 4),
+        "most_frequent_pixel_value_L1"  : int(np.argmax(_bincount_L1)),
+        "standard_pixel_value_L1"       : None,
+        "median_pixel_value_L1"         : None,
+        "ratio_median_pixel_value_L1"   : None,
+        "ratio_overexpose_L1"           : calc_rounded_ratio(_bincount_L1[255], N_all_non_bgcolor_L1, 5),
+        "pct_of_reference_section"      : float(_pct_of_reference_section),
+        "reference_pixel_value_L1"      : int(search_reference_pixel_value_L1(_bincount_L1, max_pixel_value_L1, N_all_non_bgcolor_L1, _pct_of_reference_section)[0]),
+    }
+    reference_L1["reference_ratio_L1"] = reference_L1["ratio_max_pixel_value_L1"]
+
+    # There is a possibility that pixel value "255" is too much in the input image with L=1
+    if reference_L1["max_pixel_value_L1"] == 255 and reference_L1["most_frequent_pixel_value_L1"] == 255:
+        standard_pixel_value_L1 = search_standard_pixel_value_L1(_bincount_L1, N_all_non_bgcolor_L1, _reference_section)
+        bincount_in_section     = np.zeros_like(_bincount_L1)
+        bincount_in_section[standard_pixel_value_L1:255] = _bincount_L1[standard_pixel_value_L1:255]
+        if np.sum(bincount_in_section) > 0:
+            median_pixel_value_L1 = int(calc_percentile_from_histogram(bincount_in_section, 50))
+            reference_L1["standard_pixel_value_L1"]     = standard_pixel_value_L1
+            reference_L1["median_pixel_value_L1"]       = median_pixel_value_L1
+            reference_L1["ratio_median_pixel_value_L1"] = calc_rounded_ratio(_bincount_L1[median_pixel_value_L1], N_all_non_bgcolor_L1, 4)
+            reference_L1["reference_ratio_L1"]          = reference_L1["ratio_median_pixel_value_L1"]
+
+    return reference_L1
+# End of create_reference_L1_from_histogram()
+
+
+
+# Reference (L=1) of create_reference_L1_from_histogram() from the input image with L=1
+def create_reference_L1(_img_RGB_L1, _pct_of_reference_section=0.01, _reference_section=reference_section_of_255, _BGColor=BGColor):
+    bincount_L1 = exclude_bgcolor_from_histogram(calc_histogram(convert_RGB_to_Gray(_img_RGB_L1)), convert_BGColor_to_Gray(_BGColor))
+
+    return create_reference_L1_from_histogram(bincount_L1, _pct_of_reference_section, _reference_section, _BGColor)
+# End of create_reference_L1()
+
+
+
+# Reference pixel value (L=1) for "_pct_of_reference_section" from the input image with L=1 or from its reference (L=1)
+def get_reference_pixel_value_L1(_img_RGB_L1, _pct_of_reference_section=0.01, _BGColor=BGColor):
+    if not isinstance(_img_RGB_L1, dict):
+        return create_reference_L1(_img_RGB_L1, _pct_of_reference_section, _BGColor=_BGColor)["reference_pixel_value_L1"]
+
+    reference_L1 = _img_RGB_L1
+    if reference_L1["pct_of_reference_section"] != float(_pct_of_reference_section):
+        reference_L1 = create_reference_L1_from_histogram(np.array(reference_L1["bincount_L1"], dtype=np.int64), _pct_of_reference_section, _BGColor=_BGColor)
+
+    return reference_L1["reference_pixel_value_L1"]
+# End of get_reference_pixel_value_L1()
+
+
+
+# Write a reference (L=1), or a list of them (one for each frame with L=1), as JSON
+def write_reference_L1(_file_name, _reference_L1):
+    write_text_atomically(_file_name, json.dumps(_reference_L1))
+# End of write_reference_L1()
+
+
+
+def read_reference_L1(_file_name):
+    with open(_file_name) as f:
+        return json.load(f)
+# End of read_reference_L1()
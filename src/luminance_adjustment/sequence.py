@@ -0,0 +1,200 @@
+###############################################
+#   @file   sequence.py
+#   @author Tomomasa Uchida
+#   @date   2026/10/18
+###############################################
+
+import collections
+import numpy as np
+import cv2
+
+from .apply import adjust_pixel_value
+from .metrics import measure_stage, add_count
+from .pipeline import pct_of_reference_section
+from .solve import p_search_engine, determine_amplification_factor_from
+from .stats import BGColor, convert_BGColor_to_Gray, convert_RGB_to_Gray, calc_histogram, exclude_bgcolor_from_histogram, calculate_statistics
+
+# Default parameter
+p_smoothing_methods = (None, "ema", "median")
+p_smoothing_alpha   = 0.5   # Weight of "p" of the current frame in the EMA
+p_smoothing_window  = 5     # Number of frames in the median
+keyframe_interval   = 1     # "p" is solved every "keyframe_interval" frames (1: every frame)
+
+
+
+# Smooth "p" of consecutive frames to suppress flicker
+# NOTE: "ema" is the exponential moving average with the weight "_alpha" of the current frame,
+#       "median" is the median of "p" of the last "_window" frames (the current one included), and None keeps "p" as it is.
+#       Only the previous frames are used, so that the frames are adjusted as they come.
+def create_p_smoother(_method=None, _alpha=p_smoothing_alpha, _window=p_smoothing_window):
+    if _method not in p_smoothing_methods:
+        raise ValueError("Unknown smoothing of \"p\": " + str(_method) + " (expected one of " + ", ".join(str(method) for method in p_smoothing_methods) + ")")
+
+    p_history  = collections.deque(maxlen=_window)
+    smoothed_p = [None]
+
+    def smooth_p(_p):
+        if _method == "ema":
+            smoothed_p[0] = _p if smoothed_p[0] is None else _alpha * _p + (1.0 - _alpha) * smoothed_p[0]
+            return round(smoothed_p[0], 2)
+
+        elif _method == "median":
+            p_history.append(_p)
+            return round(float(np.median(p_history)), 2)
+
+        return _p
+    # End of smooth_p()
+
+    return smooth_p
+# End of create_p_smoother()
+
+
+
+# Solve "p" of frames one after another with one reference pixel value (L=1)
+# NOTE: "p" of each frame is searched outward from "p" of the previous frame ("_b_warm_start"),
+#       which is the same "p" as adjust_brightness() since the pct. of ref. section never decreases as "p" grows.
+#       The first frame is searched with "_engine".
+def create_p_solver(_reference_pixel_value_L1, _pct_of_reference_section=pct_of_reference_section, _engine=p_search_engine, _BGColor=BGColor, _b_warm_start=True):
+    BGColor_Gray   = convert_BGColor_to_Gray(_BGColor)
+    previous_index = [None]
+
+    def solve_p(_img_RGB):
+        with measure_stage("statistics"):
+            N_all_non_bgcolor, _, _ = calculate_statistics(_img_RGB, BGColor_Gray)
+        add_count("pixels", N_all_non_bgcolor, image="input")
+
+        with measure_stage("solve", engine=_engine if previous_index[0] is None else "warm_start"):
+            p_final, index = determine_amplification_factor_from(_img_RGB, _reference_pixel_value_L1, _pct_of_reference_section, N_all_non_bgcolor, previous_index[0], _engine, BGColor_Gray)
+        if _b_warm_start:
+            previous_index[0] = index
+
+        return p_final
+    # End of solve_p()
+
+    return solve_p
+# End of create_p_solver()
+
+
+
+# Adjust frames one after another with "p" of create_p_solver(), optionally smoothed with "_smoothing"
+# NOTE: Returns "adjust_frame(img_RGB)", which returns the adjusted frame, and the list of "p" applied to each frame
+def create_sequence_adjuster(_reference_pixel_value_L1, _pct_of_reference_section=pct_of_reference_section, _engine=p_search_engine, _BGColor=BGColor, _b_warm_start=True, _smoothing=None, _smoothing_alpha=p_smoothing_alpha, _smoothing_window=p_smoothing_window):
+    solve_p     = create_p_solver(_reference_pixel_value_L1, _pct_of_reference_section, _engine, _BGColor, _b_warm_start)
+    smooth_p    = create_p_smoother(_smoothing, _smoothing_alpha, _smoothing_window)
+    p_of_frames = []
+
+    def adjust_frame(_img_RGB):
+        p_of_frames.append(smooth_p(solve_p(_img_RGB)))
+
+        with measure_stage("apply"):
+            return adjust_pixel_value(_img_RGB, p_of_frames[-1])
+    # End of adjust_frame()
+
+    return adjust_frame, p_of_frames
+# End of create_sequence_adjuster()
+
+
+
+# Bhattacharyya distance between two grayscale histograms (0: same distribution, 1: no overlap)
+def calc_histogram_distance(_hist_1, _hist_2):
+    return cv2.compareHist(np.float32(_hist_1), np.float32(_hist_2), cv2.HISTCMP_BHATTACHARYYA)
+# End of calc_histogram_distance()
+
+
+
+# "p" at "_t" (0: the previous keyframe, 1: the next keyframe) between two keyframes
+def interpolate_p(_p_start, _p_end, _t):
+    return round(_p_start + (_p_end - _p_start) * _t, 2)
+# End of interpolate_p()
+
+
+
+# Adjust frames with "p" solved on the keyframes only, and linearly interpolated between them
+# NOTE: A frame is a keyframe if it is the first or the last one, or "_keyframe_interval" frames after the previous keyframe.
+#       With "_keyframe_distance", a frame whose histogram is farther than it from the one of the previous keyframe
+#       is also a keyframe, and so is the frame before it, so that "p" is not interpolated across a sudden change.
+#       "_solve_p(img_RGB)" returns "p" of a keyframe. The other frames cost a LUT (and a histogram with "_keyframe_distance").
+# NOTE: The frames after a keyframe are held until the next one, i.e., at most "_keyframe_interval"-1 frames.
+#       Yields the adjusted frames in order, and appends "p" of each frame to "_p_of_frames" if given.
+def adjust_frames_by_keyframes(_frames, _solve_p, _keyframe_interval=keyframe_interval, _keyframe_distance=None, _BGColor=BGColor, _p_of_frames=None):
+    BGColor_Gray = convert_BGColor_to_Gray(_BGColor)
+    p_of_frames  = [] if _p_of_frames is None else _p_of_frames
+    held_frames  = []
+    p_keyframe, hist_keyframe = None, None
+
+    def adjust_frame(_img_RGB, _p):
+        p_of_frames.append(_p)
+        with measure_stage("apply"):
+            return adjust_pixel_value(_img_RGB, _p)
+    # End of adjust_frame()
+
+    # Solve "p" of the keyframe, and adjust the held frames and the keyframe
+    def adjust_up_to_keyframe(_img_RGB, _p_previous_keyframe):
+        p = _solve_p(_img_RGB)
+        add_count("keyframes")
+
+        num_of_intervals = len(held_frames) + 1
+        for i, img_RGB in enumerate(held_frames):
+            yield adjust_frame(img_RGB, interpolate_p(_p_previous_keyframe, p, (i + 1) / num_of_intervals))
+        # end for
+        del held_frames[:]
+
+        yield adjust_frame(_img_RGB, p)
+
+        return p
+    # End of adjust_up_to_keyframe()
+
+    for img_RGB in _frames:
+        b_keyframe, b_changed = p_keyframe is None or len(held_frames) + 1 >= _keyframe_interval, False
+        if _keyframe_distance is not None:
+            hist      = exclude_bgcolor_from_histogram(calc_histogram(convert_RGB_to_Gray(img_RGB)), BGColor_Gray)
+            b_changed = p_keyframe is not None and calc_histogram_distance(hist, hist_keyframe) > _keyframe_distance
+
+        if not b_keyframe and not b_changed:
+            held_frames.append(img_RGB)
+            continue
+
+        # The frame before a sudden change is a keyframe too
+        if b_changed and len(held_frames) > 0:
+            p_keyframe = yield from adjust_up_to_keyframe(held_frames.pop(), p_keyframe)
+
+        p_keyframe = yield from adjust_up_to_keyframe(img_RGB, p_keyframe)
+        if _keyframe_distance is not None:
+            hist_keyframe = hist
+    # end for
+
+    # The last frame is a keyframe
+    if len(held_frames) > 0:
+        yield from adjust_up_to_keyframe(held_frames.pop(), p_keyframe)
+# End of adjust_frames_by_keyframes()
+
+
+
+# Adjust frames with "p" of create_p_solver() solved on the keyframes only (adjust_frames_by_keyframes())
+# NOTE: Returns "adjust_frames(frames)", which yields the adjusted frames, and the list of "p" applied to each frame
+def create_keyframe_adjuster(_reference_pixel_value_L1, _pct_of_reference_section=pct_of_reference_section, _engine=p_search_engine, _BGColor=BGColor, _b_warm_start=True, _keyframe_interval=keyframe_interval, _keyframe_distance=None):
+    solve_p     = create_p_solver(_reference_pixel_value_L1, _pct_of_reference_section, _engine, _BGColor, _b_warm_start)
+    p_of_frames = []
+
+    def adjust_frames(_frames):
+        return adjust_frames_by_keyframes(_frames, solve_p, _keyframe_interval, _keyframe_distance, _BGColor, p_of_frames)
+    # End of adjust_frames()
+
+    return adjust_frames, p_of_frames
+# End of create_keyframe_adjuster()
+
+
+
+# Adjust a list of contiguous frames (e.g., the chunk of a worker) with create_sequence_adjuster() or create_keyframe_adjuster()
+# NOTE: Returns the adjusted frames and "p" of each frame
+def adjust_frame_chunk(_frames, _reference_pixel_value_L1, _pct_of_reference_section=pct_of_reference_section, _engine=p_search_engine, _BGColor=BGColor, _b_warm_start=True, _smoothing=None, _smoothing_alpha=p_smoothing_alpha, _smoothing_window=p_smoothing_window, _keyframe_interval=keyframe_interval, _keyframe_distance=None):
+    if _keyframe_interval > 1 or _keyframe_distance is not None:
+        adjust_frames, p_of_frames = create_keyframe_adjuster(_reference_pixel_value_L1, _pct_of_reference_section, _engine, _BGColor, _b_warm_start, _keyframe_interval, _keyframe_distance)
+        adjusted_frames = list(adjust_frames(_frames))
+
+    else:
+        adjust_frame, p_of_frames  = create_sequence_adjuster(_reference_pixel_value_L1, _pct_of_reference_section, _engine, _BGColor, _b_warm_start, _smoothing, _smoothing_alpha, _smoothing_window)
+        adjusted_frames = [adjust_frame(img_RGB) for img_RGB in _frames]
+
+    return adjusted_frames, p_of_frames
+# End of adjust_frame_chunk()
@@ -0,0 +1,359 @@
+###############################################
+#   @file   solve.py
+#   @author Tomomasa Uchida
+#   @date   2026/10/18
+###############################################
+
+import functools
+import numpy as np
+import cv2
+
+from .apply import create_amplification_LUT, adjust_pixel_value
+from .metrics import add_count
+from .stats import BGColor_Gray, convert_RGB_to_Gray
+
+# Default parameter
+p_init          = 1.0
+p_interval      = 0.01
+p_max           = 256.0 # All non-zero 8-bit values are saturated with p >= 255.5
+p_search_engine = "crossing" # "linear", "bisection" or "crossing"
+
+
+
+# Create the grid of "p" exactly as the linear search visits it
+def create_p_grid(_p_init, _p_interval, _p_max):
+    p_grid = [_p_init]
+    while p_grid[-1] <= _p_max:
+        p_grid.append(p_grid[-1] + _p_interval)
+
+    return p_grid
+# End of create_p_grid()
+
+
+
+# Create the 256-entry amplification table for each "p" in the grid
+def create_amplification_LUTs(_p_grid):
+    LUTs = np.array([create_amplification_LUT(p).ravel() for p in _p_grid], dtype=np.uint8)
+
+    return LUTs
+# End of create_amplification_LUTs()
+
+
+
+# The grid and its tables only depend on the parameters, so they are shared by all images
+@functools.lru_cache(maxsize=4)
+def create_shared_p_grid_and_LUTs(_p_init, _p_interval, _p_max):
+    p_grid = tuple(create_p_grid(_p_init, _p_interval, _p_max))
+    LUTs   = create_amplification_LUTs(p_grid)
+    LUTs.flags.writeable = False
+
+    return p_grid, LUTs
+# End of create_shared_p_grid_and_LUTs()
+
+
+
+# NOTE: The parameters are passed on as positional floats, so that e.g. get_p_grid_and_LUTs() of init_worker()
+#       and get_p_grid_and_LUTs(1.0, 0.01) share one entry of the cache (lru_cache keys the arguments as given)
+def get_p_grid_and_LUTs(_p_init=p_init, _p_interval=p_interval, _p_max=p_max):
+    return create_shared_p_grid_and_LUTs(float(_p_init), float(_p_interval), float(_p_max))
+# End of get_p_grid_and_LUTs()
+
+
+
+# Search the first index in the grid which satisfies "_is_satisfied"
+# NOTE: "_is_satisfied" must be monotone, i.e., once satisfied, it is satisfied for all larger "p"
+def search_first_satisfying_index(_is_satisfied, _num_of_grid):
+    # Galloping: 0, 1, 3, 7, 15, ... until satisfied
+    lo, hi, step = 0, 0, 1
+    while not _is_satisfied(hi):
+        # Never satisfied in the grid
+        if hi == _num_of_grid - 1:
+            return hi
+
+        lo   = hi + 1
+        hi   = min(hi + step, _num_of_grid - 1)
+        step = step * 2
+    # end while
+
+    # Bisection in [lo, hi], where "hi" is satisfied
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _is_satisfied(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+    # end while
+
+    return hi
+# End of search_first_satisfying_index()
+
+
+
+# Search the first index in the grid which satisfies "_is_satisfied" outward from "_start_index"
+# (e.g., the index of "p" of the previous frame)
+# NOTE: "_is_satisfied" must be monotone. Galloping 1, 2, 4, ... away from "_start_index" and bisection,
+#       so the number of evaluations grows with the log of the distance to the answer, not with the answer itself
+def search_first_satisfying_index_from(_is_satisfied, _num_of_grid, _start_index):
+    start = min(max(int(_start_index), 0), _num_of_grid - 1)
+    step  = 1
+    if _is_satisfied(start):
+        # Downward until not satisfied
+        hi = start
+        while True:
+            if hi == 0:
+                return 0
+
+            tmp_index = max(hi - step, 0)
+            if not _is_satisfied(tmp_index):
+                lo = tmp_index + 1
+                break
+
+            hi   = tmp_index
+            step = step * 2
+        # end while
+
+    else:
+        # Upward until satisfied
+        lo = start + 1
+        while True:
+            # Never satisfied in the grid
+            if lo > _num_of_grid - 1:
+                return _num_of_grid - 1
+
+            hi = min(start + step, _num_of_grid - 1)
+            if _is_satisfied(hi):
+                break
+
+            lo   = hi + 1
+            step = step * 2
+        # end while
+
+    # Bisection in [lo, hi], where "hi" is satisfied and "lo-1" is not
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _is_satisfied(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+    # end while
+
+    return hi
+# End of search_first_satisfying_index_from()
+
+
+
+# Distinct RGB values of the pixels of "_img_RGB" (or of "_b_index" of it) and the number of pixels of each
+# NOTE: The RGB values are packed into one integer, with "_labels" of the pixels above them if given,
+#       so that a pixel value and a label are searched once however many pixels share them
+def count_distinct_RGB_values(_img_RGB, _b_index=None, _labels=None):
+    img_RGB = _img_RGB.reshape(-1, 3) if _b_index is None else _img_RGB[_b_index]
+    packed  = (img_RGB[:,0].astype(np.int64) << 16) | (img_RGB[:,1].astype(np.int64) << 8) | img_RGB[:,2]
+    if _labels is not None:
+        packed |= np.asarray(_labels, dtype=np.int64) << 24
+
+    packed, counts = np.unique(packed, return_counts=True)
+    R, G, B = (packed >> 16) & 255, (packed >> 8) & 255, packed & 255
+
+    return R.astype(np.int32), G.astype(np.int32), B.astype(np.int32), packed >> 24, counts
+# End of count_distinct_RGB_values()
+
+
+
+# For each pixel given by "_R", "_G" and "_B", search the index of the smallest "p" in the grid
+# with which its adjusted grayscale value reaches the reference pixel value
+# NOTE: "_ref_pixel_value" is one value for all pixels or one value for each pixel
+def search_threshold_crossing_index_of_pixels(_R, _G, _B, _ref_pixel_value, _LUTs):
+    # Bisection for all pixels at once, since the grayscale value never decreases as "p" grows
+    # NOTE: len(_LUTs) means that the pixel never reaches the reference pixel value
+    lo        = np.zeros(_R.shape[0], dtype=np.int32)
+    hi        = np.full(_R.shape[0], _LUTs.shape[0], dtype=np.int32)
+    LUTs_flat = _LUTs.ravel()
+    num_of_iterations = 0
+    while np.any(lo < hi):
+        num_of_iterations += 1
+        b_active     = lo < hi
+        mid          = np.minimum((lo + hi) // 2, _LUTs.shape[0] - 1)
+        offset       = mid * 256
+        tmp_img_RGB  = np.stack([LUTs_flat[offset+_R], LUTs_flat[offset+_G], LUTs_flat[offset+_B]], axis=1)
+        tmp_img_Gray = cv2.cvtColor(tmp_img_RGB.reshape(-1, 1, 3), cv2.COLOR_RGB2GRAY).ravel()
+        b_reached    = tmp_img_Gray >= _ref_pixel_value
+
+        hi = np.where(b_active &  b_reached, mid,     hi)
+        lo = np.where(b_active & ~b_reached, mid + 1, lo)
+    # end while
+    add_count("p_search_iterations", num_of_iterations, engine="crossing")
+
+    return lo
+# End of search_threshold_crossing_index_of_pixels()
+
+
+
+# For each distinct RGB value of the image, search the index of the smallest "p" in the grid
+# with which its adjusted grayscale value reaches the reference pixel value
+# NOTE: Returns the indices and the number of pixels of each RGB value.
+#       A rendered image has far fewer distinct RGB values than pixels, so the bisection runs over them only
+def search_threshold_crossing_index(_img_RGB, _ref_pixel_value, _LUTs):
+    R, G, B, _, counts = count_distinct_RGB_values(_img_RGB)
+
+    return search_threshold_crossing_index_of_pixels(R, G, B, _ref_pixel_value, _LUTs), counts
+# End of search_threshold_crossing_index()
+
+
+
+# Calculate the pct. of pixels in the reference section of the image adjusted with "p"
+def calc_pct_of_ref_section(_tmp_img_RGB, _img_RGB, _p, _ref_pixel_value_L1, _N_all_non_bgcolor, _BGColor_Gray=BGColor_Gray):
+    tmp_adjusted_img_RGB    = adjust_pixel_value(_img_RGB, _p, _tmp_img_RGB)
+    tmp_adjusted_img_Gray   = convert_RGB_to_Gray(tmp_adjusted_img_RGB)
+
+    # Exclude background color
+    tmp_adjusted_img_Gray_non_bgcolor = tmp_adjusted_img_Gray[tmp_adjusted_img_Gray != _BGColor_Gray]
+
+    tmp_num_of_pixels       = (_ref_pixel_value_L1 <= tmp_adjusted_img_Gray_non_bgcolor)
+
+    return np.sum( tmp_num_of_pixels ) / _N_all_non_bgcolor
+# End of calc_pct_of_ref_section()
+
+
+
+# Search the first index in the grid of "p" whose pct. of ref. section satisfies "_is_satisfied"
+def search_amplification_factor_index(_img_RGB, _ref_pixel_value_L1, _N_all_non_bgcolor, _is_satisfied, _p_grid, _LUTs, _engine=p_search_engine, _BGColor_Gray=BGColor_Gray):
+    # NOTE: The pct. never decreases as "p" grows only if the reference section excludes the background color
+    if _engine != "linear" and _ref_pixel_value_L1 > _BGColor_Gray:
+        if _engine == "crossing":
+            # The number of pixels in the reference section for each "p" in the grid
+            # NOTE: The pixels whose RGB values are all zero never reach it (the index len(_p_grid))
+            crossing_index, counts  = search_threshold_crossing_index(_img_RGB, _ref_pixel_value_L1, _LUTs)
+            num_of_pixels           = np.cumsum( np.bincount(crossing_index, weights=counts, minlength=len(_p_grid)+1).astype(np.int64) )[:len(_p_grid)]
+            tmp_pct_of_ref_section  = num_of_pixels / _N_all_non_bgcolor
+
+            b_index_satisfied       = _is_satisfied(tmp_pct_of_ref_section)
+            index                   = np.argmax(b_index_satisfied) if np.any(b_index_satisfied) else len(_p_grid) - 1
+
+            return int(index), tmp_pct_of_ref_section[index]
+
+        tmp_img_RGB       = np.empty_like(_img_RGB)
+        num_of_iterations = [0]
+        def is_satisfied_at(_index):
+            num_of_iterations[0] += 1
+            return _is_satisfied(calc_pct_of_ref_section(tmp_img_RGB, _img_RGB, _p_grid[_index], _ref_pixel_value_L1, _N_all_non_bgcolor, _BGColor_Gray))
+        # End of is_satisfied_at()
+
+        index = search_first_satisfying_index(is_satisfied_at, len(_p_grid))
+        add_count("p_search_iterations", num_of_iterations[0], engine=_engine)
+
+        return index, calc_pct_of_ref_section(tmp_img_RGB, _img_RGB, _p_grid[index], _ref_pixel_value_L1, _N_all_non_bgcolor, _BGColor_Gray)
+
+    # Linear search
+    tmp_img_RGB = np.empty_like(_img_RGB)
+    for index in range(len(_p_grid)):
+        tmp_pct_of_ref_section = calc_pct_of_ref_section(tmp_img_RGB, _img_RGB, _p_grid[index], _ref_pixel_value_L1, _N_all_non_bgcolor, _BGColor_Gray)
+        if _is_satisfied(tmp_pct_of_ref_section):
+            break
+    # end for
+    add_count("p_search_iterations", index + 1, engine="linear")
+
+    return index, tmp_pct_of_ref_section
+# End of search_amplification_factor_index()
+
+
+
+# Same "p" as adjust_brightness.py
+def determine_amplification_factor(_img_RGB, _ref_pixel_value_L1, _pct_of_reference_section, _N_all_non_bgcolor, _engine=p_search_engine, _BGColor_Gray=BGColor_Gray, _p_init=p_init, _p_interval=p_interval, _p_max=p_max):
+    p_grid, LUTs = get_p_grid_and_LUTs(_p_init, _p_interval, _p_max)
+    index, _     = search_amplification_factor_index(
+        _img_RGB, _ref_pixel_value_L1, _N_all_non_bgcolor,
+        lambda _pct: _pct >= _pct_of_reference_section,
+        p_grid, LUTs, _engine, _BGColor_Gray)
+
+    # NOTE: The linear search returns the "p" next to the satisfying one
+    p_final = round(p_grid[index] + _p_interval, 2)
+
+    return p_final
+# End of determine_amplification_factor()
+
+
+
+# Same "p" as determine_amplification_factor(), searched outward from "_start_index" in the grid of "p"
+# (e.g., the index of "p" of the previous frame). Returns "p" and its index in the grid.
+# NOTE: Without "_start_index", "p" is searched with "_engine" as determine_amplification_factor() does
+def determine_amplification_factor_from(_img_RGB, _ref_pixel_value_L1, _pct_of_reference_section, _N_all_non_bgcolor, _start_index=None, _engine=p_search_engine, _BGColor_Gray=BGColor_Gray, _p_init=p_init, _p_interval=p_interval, _p_max=p_max):
+    p_grid, LUTs = get_p_grid_and_LUTs(_p_init, _p_interval, _p_max)
+    is_satisfied = lambda _pct: _pct >= _pct_of_reference_section
+
+    # NOTE: The pct. never decreases as "p" grows only if the reference section excludes the background color
+    if _start_index is None or _ref_pixel_value_L1 <= _BGColor_Gray:
+        index, _ = search_amplification_factor_index(
+            _img_RGB, _ref_pixel_value_L1, _N_all_non_bgcolor, is_satisfied,
+            p_grid, LUTs, _engine if _start_index is None else "linear", _BGColor_Gray)
+
+    else:
+        tmp_img_RGB       = np.empty_like(_img_RGB)
+        num_of_iterations = [0]
+        def is_satisfied_at(_index):
+            num_of_iterations[0] += 1
+            return is_satisfied(calc_pct_of_ref_section(tmp_img_RGB, _img_RGB, p_grid[_index], _ref_pixel_value_L1, _N_all_non_bgcolor, _BGColor_Gray))
+        # End of is_satisfied_at()
+
+        index = search_first_satisfying_index_from(is_satisfied_at, len(p_grid), _start_index)
+        add_count("p_search_iterations", num_of_iterations[0], engine="warm_start")
+
+    # NOTE: The linear search returns the "p" next to the satisfying one
+    p_final = round(p_grid[index] + _p_interval, 2)
+
+    return p_final, index
+# End of determine_amplification_factor_from()
+
+
+
+# Same "p" as adjust_brightness_decompose.py for the high or low pixel value image
+def determine_amplification_factor_for_decomposed_image(_img_RGB, _left_edge_pixel_value_L1, _pct_of_ref_section, _N_all_non_bgcolor, _engine=p_search_engine, _BGColor_Gray=BGColor_Gray, _p_init=p_init, _p_interval=p_interval, _p_max=p_max):
+    p_grid, LUTs                = get_p_grid_and_LUTs(_p_init, _p_interval, _p_max)
+    index, tmp_pct_of_ref_section = search_amplification_factor_index(
+        _img_RGB, _left_edge_pixel_value_L1, _N_all_non_bgcolor,
+        lambda _pct: _pct > _pct_of_ref_section,
+        p_grid, LUTs, _engine, _BGColor_Gray)
+
+    # NOTE: Follow the same floating-point steps as the linear search
+    tmp_p                       = p_grid[index] + _p_interval
+    p_final                     = round((tmp_p - _p_interval), 2)
+    pct_of_ref_section          = round(tmp_pct_of_ref_section*100, 1)
+
+    return p_final, pct_of_ref_section
+# End of determine_amplification_factor_for_decomposed_image()
+
+
+
+# Same "p" as determine_amplification_factor_for_decomposed_image() of the pixels of each label in "_labels",
+# with the "crossing" engine: "_left_edge_pixel_values_L1[label]", "_pcts_of_ref_section[label]" and "_N_of_labels[label]"
+# NOTE: Every distinct (label, RGB value) is searched once with the left edge pixel value of its label,
+#       so the cost grows with the number of distinct RGB values, not with the number of labels
+def determine_amplification_factors_of_labels_by_crossing(_img_RGB, _label_map, _labels, _left_edge_pixel_values_L1, _pcts_of_ref_section, _N_of_labels, _p_init=p_init, _p_interval=p_interval, _p_max=p_max):
+    p_grid, LUTs        = get_p_grid_and_LUTs(_p_init, _p_interval, _p_max)
+    num_of_labels       = len(_N_of_labels)
+    ref_of_labels       = np.zeros(num_of_labels, dtype=np.int32)
+    ref_of_labels[list(_labels)] = [int(_left_edge_pixel_values_L1[label]) for label in _labels]
+
+    # Pixels whose RGB values are all zero never change
+    b_index_candidate   = np.isin(_label_map, list(_labels)) & np.any(_img_RGB != 0, axis=2)
+    R, G, B, labels, counts = count_distinct_RGB_values(_img_RGB, b_index_candidate, _label_map[b_index_candidate])
+    labels              = labels.astype(np.intp)
+    crossing_index      = search_threshold_crossing_index_of_pixels(R, G, B, ref_of_labels[labels], LUTs)
+
+    # The number of pixels in the reference section of each label for each "p" in the grid
+    num_of_bins         = len(p_grid) + 1
+    hist                = np.bincount(labels * num_of_bins + crossing_index, weights=counts, minlength=num_of_labels * num_of_bins).astype(np.int64).reshape(num_of_labels, num_of_bins)
+
+    p_of_labels         = [None] * num_of_labels
+    for label in _labels:
+        num_of_pixels           = np.cumsum( hist[label] )[:len(p_grid)]
+        tmp_pct_of_ref_section  = num_of_pixels / _N_of_labels[label]
+        b_index_exceeded        = tmp_pct_of_ref_section > _pcts_of_ref_section[label]
+        index                   = np.argmax(b_index_exceeded) if np.any(b_index_exceeded) else len(p_grid) - 1
+
+        # NOTE: Follow the same floating-point steps as the linear search
+        tmp_p                   = p_grid[index] + _p_interval
+        p_of_labels[label]      = round((tmp_p - _p_interval), 2)
+    # end for
+
+    return p_of_labels
+# End of determine_amplification_factors_of_labels_by_crossing()
@@ -0,0 +1,162 @@
+###############################################
+#   @file   stats.py
+#   @author Tomomasa Uchida
+#   @date   2026/10/18
+###############################################
+
+import math
+
+import numpy as np
+import cv2
+
+# Number of pixels processed at once, so that the temporary arrays
+# (e.g., the indexes of np.bincount() and of boolean indexing) stay small for large images
+chunk_size      = 1 << 20
+
+# FLT_EPSILON of OpenCV's Otsu's method
+float_epsilon   = float(np.finfo(np.float32).eps)
+
+
+
+# Convert background color to Grayscale
+def convert_BGColor_to_Gray(_BGColor):
+    return np.uint8(0.299*_BGColor[0]+0.587*_BGColor[1]+0.114*_BGColor[2])
+# End of convert_BGColor_to_Gray()
+
+
+
+# Background color
+BGColor         = (0, 0, 0)
+BGColor_Gray    = convert_BGColor_to_Gray(BGColor)
+
+
+
+# Convert RGB image to Grayscale image
+def convert_RGB_to_Gray(_img_RGB):
+    return cv2.cvtColor(_img_RGB, cv2.COLOR_RGB2GRAY)
+# End of convert_RGB_to_Gray()
+
+
+
+# Get indexes of background color pixel
+def create_bgcolor_index(_img_RGB, _BGColor=BGColor):
+    return (_img_RGB[:,:,0]==_BGColor[0]) & (_img_RGB[:,:,1]==_BGColor[1]) & (_img_RGB[:,:,2]==_BGColor[2])
+# End of create_bgcolor_index()
+
+
+
+# 256-bin histogram of the grayscale image (background color included)
+# NOTE: One pass over the image. The statistics and the threshold pixel value are derived from it in O(256).
+def calc_histogram(_img_Gray):
+    img_Gray = _img_Gray.ravel()
+    hist     = np.zeros(256, dtype=np.int64)
+    for start in range(0, img_Gray.shape[0], chunk_size):
+        hist += np.bincount(img_Gray[start:start+chunk_size], minlength=256)
+
+    return hist
+# End of calc_histogram()
+
+
+
+# Exclude background color from the histogram
+def exclude_bgcolor_from_histogram(_hist, _BGColor_Gray=BGColor_Gray):
+    hist_non_bgcolor = _hist.copy()
+    hist_non_bgcolor[int(_BGColor_Gray)] = 0
+
+    return hist_non_bgcolor
+# End of exclude_bgcolor_from_histogram()
+
+
+
+# Number of pixels, max, mean and std pixel value of the pixels in the histogram
+# NOTE: The sums are exact integers, so the mean is the same as np.uint8(np.mean()) of the pixels,
+#       and the std is truncated exactly with the integer square root
+def calculate_statistics_from_histogram(_hist):
+    N_all               = int(np.sum(_hist))
+    if N_all == 0:
+        return 0, np.uint8(0), np.uint8(0), np.uint8(0)
+
+    sum_of_pixel_values = int(_hist @ np.arange(256, dtype=np.int64))
+    sum_of_squares      = int(_hist @ np.arange(256, dtype=np.int64)**2)
+    max_pixel_value     = np.uint8(np.flatnonzero(_hist)[-1])
+    mean_pixel_value    = np.uint8(sum_of_pixel_values / N_all)
+    std_pixel_value     = np.uint8(math.isqrt(N_all*sum_of_squares - sum_of_pixel_values**2) // N_all)
+
+    return N_all, max_pixel_value, mean_pixel_value, std_pixel_value
+# End of calculate_statistics_from_histogram()
+
+
+
+# Same threshold pixel value as cv2.threshold(img_Gray, 0, 255, cv2.THRESH_OTSU) from the histogram of "img_Gray"
+# NOTE: Follow the same floating-point steps as OpenCV
+def calc_otsu_threshold_from_histogram(_hist):
+    scale = 1.0 / int(np.sum(_hist))
+    mu    = 0.0
+    for i in range(256):
+        mu += i * float(_hist[i])
+    mu *= scale
+
+    mu1, q1, max_sigma, max_val = 0.0, 0.0, 0.0, 0.0
+    for i in range(256):
+        p_i  = float(_hist[i]) * scale
+        mu1 *= q1
+        q1  += p_i
+        q2   = 1.0 - q1
+        if min(q1, q2) < float_epsilon or max(q1, q2) > 1.0 - float_epsilon:
+            continue
+
+        mu1   = (mu1 + i*p_i) / q1
+        mu2   = (mu - q1*mu1) / q2
+        sigma = q1*q2*(mu1 - mu2)*(mu1 - mu2)
+        if sigma > max_sigma:
+            max_sigma, max_val = sigma, float(i)
+    # end for
+
+    return max_val
+# End of calc_otsu_threshold_from_histogram()
+
+
+
+# Same pixel value as scipy.stats.scoreatpercentile() of the pixels in the histogram (acpv_decompose_quartile.py)
+def calc_percentile_from_histogram(_hist, _pct):
+    cumsum_of_hist  = np.cumsum(_hist)
+    index           = _pct / 100. * (int(cumsum_of_hist[-1]) - 1)
+
+    # The "i"-th smallest pixel value is the first one whose cumulative number of pixels exceeds "i"
+    lower           = int(index)
+    lower_value     = int(np.searchsorted(cumsum_of_hist, lower, side="right"))
+    if lower == index:
+        return float(lower_value)
+
+    upper_value     = int(np.searchsorted(cumsum_of_hist, lower + 1, side="right"))
+    weights         = ((lower + 1 - index), (index - lower))
+
+    return (lower_value*weights[0] + upper_value*weights[1]) / (weights[0] + weights[1])
+# End of calc_percentile_from_histogram()
+
+
+
+def calculate_statistics(_img_RGB, _BGColor_Gray=BGColor_Gray):
+    # Exclude background color
+    hist_non_bgcolor        = exclude_bgcolor_from_histogram(calc_histogram(convert_RGB_to_Gray(_img_RGB)), _BGColor_Gray)
+
+    # Calc the number of pixels excluding background color, mean and std pixel value
+    N_all_non_bgcolor, _, mean_pixel_value, std_pixel_value = calculate_statistics_from_histogram(hist_non_bgcolor)
+
+    return N_all_non_bgcolor, mean_pixel_value, std_pixel_value
+# End of calculate_statistics()
+
+
+
+def calculate_statistics_L1(_img_RGB_L1, _BGColor_Gray=BGColor_Gray):
+    # Exclude background color
+    # NOTE: The histogram (L=1) is reused for the reference pixel value search
+    bincount_L1                 = exclude_bgcolor_from_histogram(calc_histogram(convert_RGB_to_Gray(_img_RGB_L1)), _BGColor_Gray)
+
+    # Calc the number of pixels excluding background color and max pixel value of the input image (L=1)
+    N_all_non_bgcolor_L1, max_pixel_value_L1, _, _ = calculate_statistics_from_histogram(bincount_L1)
+    if N_all_non_bgcolor_L1 == 0:
+        raise ValueError("The input image with L=1 has no pixel except the background color")
+
+    return N_all_non_bgcolor_L1, max_pixel_value_L1, bincount_L1
+# End of calculate_statistics_L1()
@@ -0,0 +1,372 @@
+###############################################
+#   @file   stream.py
+#   @author Tomomasa Uchida
+#   @date   2026/10/18
+###############################################
+
+import functools
+import glob
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import cv2
+
+from .batch import init_worker
+from .image_io import read_image, write_image
+from .metrics import measure_stage
+from .pipeline import pct_of_reference_section
+from .reference import reference_section_of_255, create_reference_L1, get_reference_pixel_value_L1
+from .sequence import p_smoothing_alpha, p_smoothing_window, keyframe_interval, create_sequence_adjuster, create_keyframe_adjuster, adjust_frame_chunk
+from .solve import p_search_engine
+from .stats import BGColor
+
+# Default parameter
+frame_queue_size    = 4     # Max number of frames waiting between two stages
+frames_per_second   = 30.0  # Of the output video when the input is not a video
+queue_timeout       = 0.1   # [sec]
+frame_chunk_size    = 8     # Number of contiguous frames adjusted by a worker at once
+
+# FourCC of the output video for each extension
+video_fourccs = {
+    ".avi": "MJPG",
+    ".mp4": "mp4v",
+    ".mov": "mp4v",
+    ".mkv": "MJPG",
+}
+
+# Put at the end of the frames in a queue
+end_of_frames = None
+
+
+
+def is_video_file(_name):
+    return os.path.splitext(_name)[1].lower() in video_fourccs
+# End of is_video_file()
+
+
+
+def is_numbered_pattern(_name):
+    return "%" in _name
+# End of is_numbered_pattern()
+
+
+
+# Read RGB frames one by one from a video file or an image sequence
+# NOTE: "_src" is a video file (e.g., "turntable.mp4"), a numbered pattern (e.g., "images/serial_number_images/image%03d.bmp")
+#       whose frames are read from "_start_number" until the first missing number, or a glob (e.g., "images/*.png") in sorted order.
+#       Only the current frame is held, so the number of frames does not matter.
+#       FileNotFoundError is raised when the video or the first numbered image cannot be read, or when no image matches the glob.
+# NOTE: "_first_frame" and "_num_of_frames" read a part of the frames (e.g., a chunk of a worker)
+def read_frames(_src, _start_number=0, _first_frame=0, _num_of_frames=None):
+    last_frame = None if _num_of_frames is None else _first_frame + _num_of_frames
+
+    if is_video_file(_src):
+        capture = cv2.VideoCapture(_src)
+        if not capture.isOpened():
+            raise FileNotFoundError("Cannot read video: " + _src)
+
+        try:
+            if _first_frame > 0:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, _first_frame)
+
+            frame = _first_frame
+            while last_frame is None or frame < last_frame:
+                with measure_stage("decode"):
+                    b_read, img_BGR = capture.read()
+                    if not b_read:
+                        break
+
+                    img_RGB = cv2.cvtColor(img_BGR, cv2.COLOR_BGR2RGB)
+
+                yield img_RGB
+                frame += 1
+            # end while
+        finally:
+            capture.release()
+
+    elif is_numbered_pattern(_src):
+        number = _start_number + _first_frame
+        if _first_frame == 0 and not os.path.isfile(_src % number):
+            raise FileNotFoundError("Cannot read the first image of the numbered pattern: " + _src % number)
+
+        while (last_frame is None or number < _start_number + last_frame) and os.path.isfile(_src % number):
+            yield read_image(_src % number)
+            number += 1
+        # end while
+
+    elif glob.has_magic(_src):
+        img_names = sorted(glob.glob(_src))
+        if len(img_names) == 0:
+            raise FileNotFoundError("No image matches the glob: " + _src)
+
+        for img_name in img_names[_first_frame:last_frame]:
+            yield read_image(img_name)
+        # end for
+
+    else:
+        raise ValueError("Expected a video file, a numbered pattern (\"%03d\") or a glob: " + _src)
+# End of read_frames()
+
+
+
+# Frames per second of the input video (or the default one for an image sequence)
+def get_frames_per_second(_src):
+    if not is_video_file(_src):
+        return frames_per_second
+
+    capture = cv2.VideoCapture(_src)
+    fps     = capture.get(cv2.CAP_PROP_FPS) if capture.isOpened() else 0.0
+    capture.release()
+
+    return fps if fps > 0.0 else frames_per_second
+# End of get_frames_per_second()
+
+
+
+# Write RGB frames to a video file or a numbered pattern (e.g., "images/serial_number_images/adjusted_image%03d.bmp")
+# NOTE: The video is opened with the size of the first frame
+def write_frames(_dst, _frames, _fps=frames_per_second, _start_number=0):
+    if not is_video_file(_dst) and not is_numbered_pattern(_dst):
+        raise ValueError("Expected a video file or a numbered pattern (\"%03d\"): " + _dst)
+
+    writer, num_of_frames = None, 0
+    try:
+        for img_RGB in _frames:
+            if not is_video_file(_dst):
+                write_image(_dst % (_start_number + num_of_frames), img_RGB)
+
+            else:
+                if writer is None:
+                    writer = cv2.VideoWriter(_dst, cv2.VideoWriter_fourcc(*video_fourccs[os.path.splitext(_dst)[1].lower()]), _fps, (img_RGB.shape[1], img_RGB.shape[0]))
+                    if not writer.isOpened():
+                        raise OSError("Cannot write video: " + _dst)
+
+                with measure_stage("encode"):
+                    writer.write(cv2.cvtColor(img_RGB, cv2.COLOR_RGB2BGR))
+
+            num_of_frames += 1
+        # end for
+    finally:
+        if writer is not None:
+            writer.release()
+
+    return num_of_frames
+# End of write_frames()
+
+
+
+# Put an item in a bounded queue unless the stream is stopped
+def put_frame(_queue, _item, _stop_event):
+    while not _stop_event.is_set():
+        try:
+            _queue.put(_item, timeout=queue_timeout)
+            return True
+        except queue.Full:
+            pass
+    # end while
+
+    return False
+# End of put_frame()
+
+
+
+# Get the frames from a bounded queue until the end of the frames (or until the stream is stopped)
+def get_frames(_queue, _stop_event):
+    while not _stop_event.is_set():
+        try:
+            item = _queue.get(timeout=queue_timeout)
+        except queue.Empty:
+            continue
+
+        if item is end_of_frames:
+            return
+
+        yield item
+    # end while
+# End of get_frames()
+
+
+
+# Decode, adjust and encode the frames on three threads connected by bounded queues,
+#   so that reading and writing the files overlap the adjustment
+# NOTE: "_adjust_frames(frames)" takes the iterable of the decoded frames and yields the adjusted frames in order.
+#       It runs on one thread, so it may keep state from the previous frames or hold some frames back (e.g., keyframes).
+# NOTE: At most 2*"_queue_size"+3 frames (plus those held by "_adjust_frames") are alive at once, whatever the number of frames.
+#       An error on any thread stops the others and is raised here.
+def stream_frame_sequence(_src, _dst, _adjust_frames, _queue_size=frame_queue_size, _fps=None, _start_number=0):
+    decoded_frames  = queue.Queue(maxsize=_queue_size)
+    adjusted_frames = queue.Queue(maxsize=_queue_size)
+    stop_event      = threading.Event()
+    errors          = []
+
+    def run_stage(_stage, _output_queue):
+        try:
+            _stage()
+        except BaseException as e:
+            errors.append(e)
+            stop_event.set()
+        finally:
+            put_frame(_output_queue, end_of_frames, stop_event)
+    # End of run_stage()
+
+    def decode():
+        frames = read_frames(_src, _start_number)
+        try:
+            for img_RGB in frames:
+                if not put_frame(decoded_frames, img_RGB, stop_event):
+                    break
+            # end for
+        finally:
+            frames.close()
+    # End of decode()
+
+    def adjust():
+        for adjusted_img_RGB in _adjust_frames(get_frames(decoded_frames, stop_event)):
+            if not put_frame(adjusted_frames, adjusted_img_RGB, stop_event):
+                break
+        # end for
+    # End of adjust()
+
+    fps     = get_frames_per_second(_src) if _fps is None else _fps
+    threads = [threading.Thread(target=run_stage, args=(decode, decoded_frames), daemon=True),
+               threading.Thread(target=run_stage, args=(adjust, adjusted_frames), daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    # Encode on this thread
+    try:
+        num_of_frames = write_frames(_dst, get_frames(adjusted_frames, stop_event), fps, _start_number)
+    except BaseException as e:
+        errors.append(e)
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+
+    if len(errors) > 0:
+        raise errors[0]
+
+    return num_of_frames
+# End of stream_frame_sequence()
+
+
+
+# stream_frame_sequence() with "_adjust_frame(img_RGB)", which returns the adjusted frame.
+#   It is called in the order of the frames, so it may keep state from the previous frames.
+def stream_frames(_src, _dst, _adjust_frame, _queue_size=frame_queue_size, _fps=None, _start_number=0):
+    return stream_frame_sequence(_src, _dst, lambda _frames: map(_adjust_frame, _frames), _queue_size, _fps, _start_number)
+# End of stream_frames()
+
+
+
+# Reference (L=1) of each frame of a video or an image sequence with L=1 (e.g., when the lighting changes through the sequence)
+# NOTE: One frame is held at once. The list can be written with write_reference_L1() and read back in each run
+def create_references_L1_of_frames(_src_L1, _pct_of_reference_section=pct_of_reference_section, _reference_section=reference_section_of_255, _BGColor=BGColor, _start_number=0):
+    return [create_reference_L1(img_RGB_L1, _pct_of_reference_section, _reference_section, _BGColor) for img_RGB_L1 in read_frames(_src_L1, _start_number)]
+# End of create_references_L1_of_frames()
+
+
+
+# Read a chunk of contiguous frames and adjust them with "_adjust_chunk(frames)" in a worker process
+def read_and_adjust_frame_chunk(_chunk_index, _src, _chunk_size, _start_number, _adjust_chunk):
+    frames = list(read_frames(_src, _start_number, _chunk_index * _chunk_size, _chunk_size))
+    if len(frames) == 0:
+        return [], []
+
+    return _adjust_chunk(frames)
+# End of read_and_adjust_frame_chunk()
+
+
+
+# Fan chunks of "_chunk_size" contiguous frames out to a process pool, where each worker reads and adjusts its chunk,
+#   and write the adjusted frames in order
+# NOTE: "_adjust_chunk(frames)" returns the adjusted frames and "p" of each frame. It must be picklable
+#       (a module-level function or a functools.partial of one), and runs on each chunk separately,
+#       so any state kept from the previous frames (e.g., warm start, smoothing or keyframes) restarts at each chunk.
+# NOTE: The chunks finished out of order wait in a reorder buffer until all the previous ones are written.
+#       At most 2*"_max_workers" chunks are in flight or in the buffer, so the number of frames does not matter.
+#       Returns "p" of each frame in order.
+def stream_frames_parallel(_src, _dst, _adjust_chunk, _max_workers=None, _chunk_size=frame_chunk_size, _fps=None, _start_number=0, _engine=p_search_engine):
+    max_workers   = os.cpu_count() if _max_workers is None else _max_workers
+    max_in_flight = 2 * max_workers
+    process       = functools.partial(read_and_adjust_frame_chunk, _src=_src, _chunk_size=_chunk_size, _start_number=_start_number, _adjust_chunk=_adjust_chunk)
+    p_of_frames   = []
+
+    def adjust_frames_in_order(_executor):
+        futures, reorder_buffer = {}, {}
+        next_chunk_index, next_chunk_index_to_write, last_chunk_index = 0, 0, None
+        while True:
+            # Keep the workers busy until a chunk reaches the end of the frames
+            while last_chunk_index is None and len(futures) + len(reorder_buffer) < max_in_flight:
+                futures[next_chunk_index] = _executor.submit(process, next_chunk_index)
+                next_chunk_index += 1
+            # end while
+
+            if next_chunk_index_to_write in reorder_buffer:
+                adjusted_frames, p_of_chunk = reorder_buffer.pop(next_chunk_index_to_write)
+                p_of_frames.extend(p_of_chunk)
+                yield from adjusted_frames
+
+                if len(adjusted_frames) < _chunk_size:
+                    return
+
+                next_chunk_index_to_write += 1
+                continue
+
+            done, _ = wait(futures.values(), return_when=FIRST_COMPLETED)
+            for chunk_index in [chunk_index for chunk_index, future in futures.items() if future in done]:
+                reorder_buffer[chunk_index] = futures.pop(chunk_index).result()
+                if len(reorder_buffer[chunk_index][0]) < _chunk_size:
+                    last_chunk_index = chunk_index if last_chunk_index is None else min(chunk_index, last_chunk_index)
+            # end for
+        # end while
+    # End of adjust_frames_in_order()
+
+    fps      = get_frames_per_second(_src) if _fps is None else _fps
+    executor = ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker, initargs=(_engine,))
+    try:
+        write_frames(_dst, adjust_frames_in_order(executor), fps, _start_number)
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+    return p_of_frames
+# End of stream_frames_parallel()
+
+
+
+# Adjust brightness of all frames of a video or an image sequence with one input image with L=1
+# NOTE: "_img_RGB_L1" is the input image with L=1 or its reference (create_reference_L1() or read_reference_L1()).
+#       The reference pixel value (L=1) is searched once, and "p" of each frame is the same as adjust_brightness()
+#       (searched outward from "p" of the previous frame with "_b_warm_start"), optionally smoothed with "_smoothing".
+# NOTE: With "_keyframe_interval" > 1 or "_keyframe_distance", "p" is solved on the keyframes only
+#       and interpolated between them (adjust_frames_by_keyframes()). "_smoothing" is not used then.
+#       Returns "p" applied to each frame in order.
+def adjust_video(_src, _dst, _img_RGB_L1, _pct_of_reference_section=pct_of_reference_section, _engine=p_search_engine, _BGColor=BGColor, _queue_size=frame_queue_size, _fps=None, _b_warm_start=True, _smoothing=None, _smoothing_alpha=p_smoothing_alpha, _smoothing_window=p_smoothing_window, _keyframe_interval=keyframe_interval, _keyframe_distance=None):
+    reference_pixel_value_L1 = get_reference_pixel_value_L1(_img_RGB_L1, _pct_of_reference_section, _BGColor)
+
+    if _keyframe_interval > 1 or _keyframe_distance is not None:
+        adjust_frames, p_of_frames = create_keyframe_adjuster(reference_pixel_value_L1, _pct_of_reference_section, _engine, _BGColor, _b_warm_start, _keyframe_interval, _keyframe_distance)
+        stream_frame_sequence(_src, _dst, adjust_frames, _queue_size, _fps)
+
+    else:
+        adjust_frame, p_of_frames = create_sequence_adjuster(reference_pixel_value_L1, _pct_of_reference_section, _engine, _BGColor, _b_warm_start, _smoothing, _smoothing_alpha, _smoothing_window)
+        stream_frames(_src, _dst, adjust_frame, _queue_size, _fps)
+
+    return p_of_frames
+# End of adjust_video()
+
+
+
+# adjust_video() on a process pool, where each worker reads and adjusts chunks of "_chunk_size" contiguous frames
+# NOTE: The warm start, "_smoothing" and the keyframes restart at each chunk (the first frame of a chunk is searched with "_engine",
+#       and the first and last ones are keyframes), so a larger chunk keeps "p" more coherent and a smaller one spreads better.
+def adjust_video_parallel(_src, _dst, _img_RGB_L1, _pct_of_reference_section=pct_of_reference_section, _engine=p_search_engine, _BGColor=BGColor, _max_workers=None, _chunk_size=frame_chunk_size, _fps=None, _b_warm_start=True, _smoothing=None, _smoothing_alpha=p_smoothing_alpha, _smoothing_window=p_smoothing_window, _keyframe_interval=keyframe_interval, _keyframe_distance=None):
+    reference_pixel_value_L1 = get_reference_pixel_value_L1(_img_RGB_L1, _pct_of_reference_section, _BGColor)
+
+    adjust_chunk = functools.partial(adjust_frame_chunk, _reference_pixel_value_L1=reference_pixel_value_L1, _pct_of_reference_section=_pct_of_reference_section, _engine=_engine, _BGColor=_BGColor, _b_warm_start=_b_warm_start,
+                                     _smoothing=_smoothing, _smoothing_alpha=_smoothing_alpha, _smoothing_window=_smoothing_window, _keyframe_interval=_keyframe_interval, _keyframe_distance=_keyframe_distance)
+
+    return stream_frames_parallel(_src, _dst, adjust_chunk, _max_workers, _chunk_size, _fps, _engine=_engine)
+# End of adjust_video_parallel()
@@ -0,0 +1,155 @@
+###############################################
+#   @file   threshold.py
+#   @author Tomomasa Uchida
+#   @date   2026/10/18
+###############################################
+
+import numpy as np
+
+from .stats import BGColor_Gray, exclude_bgcolor_from_histogram, calculate_statistics_from_histogram, calc_otsu_threshold_from_histogram, calc_percentile_from_histogram
+
+# Number of bins of the histogram searched for the largest jump
+# NOTE: adjust_brightness_decompose_mapping.py and adjust_brightness_decompose_pre-process.py use 255
+jump_bin_number             = 255
+jump_pct_of_skipped_bins    = 0.1   # The darkest 10(%) of the bins are skipped
+jump_smoothing_window       = 1     # No smoothing
+
+
+
+# NOTE: Each strategy gets the 256-bin histogram of the grayscale image (background color included),
+#       so that the threshold pixel value is found in O(256) without another pass over the image
+
+# mean + std (adjust_brightness_decompose.py)
+def calc_threshold_by_mean_std(_hist, _BGColor_Gray=BGColor_Gray):
+    _, _, mean_pixel_value, std_pixel_value = calculate_statistics_from_histogram(exclude_bgcolor_from_histogram(_hist, _BGColor_Gray))
+
+    return np.uint8(mean_pixel_value + std_pixel_value)
+# End of calc_threshold_by_mean_std()
+
+
+
+# mean + 2*std (acpv_decompose_SD.py and acpv_decompose_quartile.py)
+# NOTE: Clipped to 255, which puts every pixel into the low pixel value image as the scripts do
+def calc_threshold_by_mean_2std(_hist, _BGColor_Gray=BGColor_Gray):
+    _, _, mean_pixel_value, std_pixel_value = calculate_statistics_from_histogram(exclude_bgcolor_from_histogram(_hist, _BGColor_Gray))
+
+    return np.uint8(min(int(mean_pixel_value) + 2*int(std_pixel_value), 255))
+# End of calc_threshold_by_mean_2std()
+
+
+
+# Otsu's method (adjust_brightness_decompose_otsu.py)
+# NOTE: The background color is included, as cv2.threshold() of the whole image does
+def calc_threshold_by_otsu(_hist, _BGColor_Gray=BGColor_Gray):
+    return calc_otsu_threshold_from_histogram(_hist)
+# End of calc_threshold_by_otsu()
+
+
+
+# Third quartile (acpv_decompose_quartile.py)
+def calc_threshold_by_third_quartile(_hist, _BGColor_Gray=BGColor_Gray):
+    return np.uint8(calc_percentile_from_histogram(exclude_bgcolor_from_histogram(_hist, _BGColor_Gray), 75))
+# End of calc_threshold_by_third_quartile()
+
+
+
+# Index of the bin just after the largest jump between two neighboring bins, skipping the darkest "_pct_of_skipped_bins" of the bins
+# NOTE: The first one of the largest jumps, as the loop of searchThresholdPixelValue() finds,
+#       and -1 if no bin is searched or the histogram is empty (no jump)
+# NOTE: The histogram is smoothed with the moving average of "_smoothing_window" bins before differencing
+def search_largest_jump_index(_hist, _pct_of_skipped_bins=jump_pct_of_skipped_bins, _smoothing_window=jump_smoothing_window):
+    hist = np.asarray(_hist)
+    if not np.any(hist):
+        return -1
+
+    if _smoothing_window > 1:
+        hist = np.convolve(hist, np.ones(_smoothing_window) / _smoothing_window, mode="same")
+
+    first_index = int(hist.size * _pct_of_skipped_bins)
+    diff        = np.abs(np.diff(hist))[first_index:]
+    if diff.size == 0:
+        return -1
+
+    return first_index + int(np.argmax(diff)) + 1
+# End of search_largest_jump_index()
+
+
+
+# The largest jump between two neighboring bins (searchThresholdPixelValue() of adjust_brightness_decompose_mapping.py)
+# NOTE: Same bins and counts as np.histogram() of the pixels, since each pixel value falls into the same bin
+def calc_threshold_by_histogram_jump(_hist, _BGColor_Gray=BGColor_Gray, _bin_number=jump_bin_number, _pct_of_skipped_bins=jump_pct_of_skipped_bins, _smoothing_window=jump_smoothing_window):
+    hist_non_bgcolor = exclude_bgcolor_from_histogram(_hist, _BGColor_Gray)
+    pixel_values     = np.flatnonzero(hist_non_bgcolor).astype(np.uint8)
+    if pixel_values.size == 0:
+        raise ValueError("The input image has no pixel except the background color")
+    hist, bins       = np.histogram(np.arange(256, dtype=np.uint8), bins=_bin_number, range=(pixel_values[0], pixel_values[-1]), weights=hist_non_bgcolor)
+    index4bins       = search_largest_jump_index(hist.astype(np.int64), _pct_of_skipped_bins, _smoothing_window)
+
+    return np.uint8(int(bins[index4bins]) + int(255/_bin_number))
+# End of calc_threshold_by_histogram_jump()
+
+
+
+# Thresholds of multi-level Otsu's method, which splits the pixels into "_num_of_classes" classes
+# NOTE: The "i"-th threshold pixel value is the brightest pixel value of the "i"-th class (from the darkest one),
+#       so the same "> threshold" decomposition as the other strategies for two classes
+# NOTE: Dynamic programming over the 256 bins maximizes the between-class variance, instead of trying all combinations
+def calc_multi_otsu_thresholds_from_histogram(_hist, _num_of_classes=3, _BGColor_Gray=BGColor_Gray):
+    hist_non_bgcolor = exclude_bgcolor_from_histogram(_hist, _BGColor_Gray).astype(np.float64)
+    P = np.concatenate(([0.0], np.cumsum(hist_non_bgcolor)))
+    Q = np.concatenate(([0.0], np.cumsum(hist_non_bgcolor * np.arange(256))))
+
+    # cost[i, j]: (sum of pixel values)^2 / (number of pixels) of the class from "i" to "j"
+    # NOTE: An empty class (e.g., in a gap of the histogram) adds nothing to the between-class variance,
+    #       so its cost is 0 instead of 0/0 (nan), which np.argmax() would pick
+    i, j = np.meshgrid(np.arange(256), np.arange(256), indexing="ij")
+    N_of_class = P[j+1] - P[i]
+    cost = np.divide((Q[j+1] - Q[i])**2, N_of_class, out=np.zeros((256, 256)), where=(i <= j) & (N_of_class > 0))
+    cost[i > j] = -np.inf
+
+    # best[j]: the largest cost of the classes so far, the last of which ends at "j"
+    best, first_bins = cost[0].copy(), []
+    for num_of_classes in range(2, _num_of_classes + 1):
+        prev_best  = np.concatenate(([-np.inf], best[:-1]))
+        tmp_cost   = prev_best[:, np.newaxis] + cost
+        tmp_cost[:num_of_classes-1] = -np.inf
+        first_bins.append(np.argmax(tmp_cost, axis=0))
+        best       = tmp_cost[first_bins[-1], np.arange(256)]
+    # end for
+
+    # Trace back the first bin of each class from the brightest one
+    thresholds, last_bin = [], 255
+    for first_bin in reversed(first_bins):
+        last_bin = int(first_bin[last_bin]) - 1
+        thresholds.append(np.uint8(last_bin))
+    # end for
+
+    return thresholds[::-1]
+# End of calc_multi_otsu_thresholds_from_histogram()
+
+
+
+# Threshold strategies: name -> (function(_hist, _BGColor_Gray), whether the high pixel value image includes the threshold pixel value)
+threshold_strategies = {
+    "mean_std"          : (calc_threshold_by_mean_std,          False),
+    "mean_2std"         : (calc_threshold_by_mean_2std,         False),
+    "otsu"              : (calc_threshold_by_otsu,              True),
+    "third_quartile"    : (calc_threshold_by_third_quartile,    False),
+    "histogram_jump"    : (calc_threshold_by_histogram_jump,    False),
+}
+
+
+
+# Add a strategy which is then selectable by "_threshold_method"
+def register_threshold_strategy(_name, _calc_threshold, _b_high_includes_threshold=False):
+    threshold_strategies[_name] = (_calc_threshold, _b_high_includes_threshold)
+# End of register_threshold_strategy()
+
+
+
+def get_threshold_strategy(_name):
+    if _name not in threshold_strategies:
+        raise ValueError("Unknown threshold method: " + _name + " (" + ", ".join(threshold_strategies) + ")")
+
+    return threshold_strategies[_name]
+# End of get_threshold_strategy()
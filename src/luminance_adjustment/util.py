@@ -0,0 +1,22 @@
+###############################################
+#   @file   util.py
+#   @author Tomomasa Uchida
+#   @date   2026/10/18
+###############################################
+
+import os
+import tempfile
+
+
+
+# Write a file atomically, so that a reader (e.g., a metrics collector or another process sharing the cache)
+#   never reads a half-written file
+# NOTE: The text is written to a temporary file in the same directory and then renamed
+def write_text_atomically(_file_name, _text):
+    dir_name = os.path.dirname(os.path.abspath(_file_name))
+    os.makedirs(dir_name, exist_ok=True)
+    fd, tmp_file_name = tempfile.mkstemp(dir=dir_name, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        f.write(_text)
+    os.replace(tmp_file_name, _file_name)
+# End of write_text_atomically()
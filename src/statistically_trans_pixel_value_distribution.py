@@ -138,55 +138,71 @@ def separateBackgroundColor():
 
 
 
-def transformPixelValueDistributionStatistically():
+# Statistical transform of each channel of the pixel values as a (256, 1, 3) LUT
+# NOTE: Every step is a function of the pixel value of each channel, so it is done once for 256 pixel values,
+#       and the min, mean and std pixel values of the transformed image are taken from the histogram of each channel.
+#       "_hist_of_channels[c]" is the histogram of the channel "c" of "img_in_RGB_non_bgcolor" (background color included)
+def createStatisticalTransformLUT(_hist_of_channels, _num_of_bgcolor):
     # img = (img - np.mean(img))/np.std(img)*16+64
-    tmp_img_uint8 = img_in_RGB_non_bgcolor.copy()
-    tmp_img_float = tmp_img_uint8.astype(float)
-    
+    transform_LUT = np.arange(256, dtype=float)
+
     # Make the mean pixel value "0"
-    tmp_img_float[:,:,0] = cv2.subtract(tmp_img_float[:,:,0],   float(mean_pixel_value)) # R
-    tmp_img_float[:,:,1] = cv2.subtract(tmp_img_float[:,:,1],   float(mean_pixel_value)) # G
-    tmp_img_float[:,:,2] = cv2.subtract(tmp_img_float[:,:,2],   float(mean_pixel_value)) # B
+    transform_LUT = cv2.subtract(transform_LUT, float(mean_pixel_value)).ravel()
 
     # Make the std pixel value "ideal_std_pixel_value"
     multiply_value = ideal_std_pixel_value / std_pixel_value
-    tmp_img_float[:,:,0] = cv2.multiply(tmp_img_float[:,:,0],   float(multiply_value))
-    tmp_img_float[:,:,1] = cv2.multiply(tmp_img_float[:,:,1],   float(multiply_value))
-    tmp_img_float[:,:,2] = cv2.multiply(tmp_img_float[:,:,2],   float(multiply_value))
+    transform_LUT = cv2.multiply(transform_LUT, float(multiply_value)).ravel()
 
     # Make the mean pixel value "ideal_mean_pixel_value"
-    tmp_img_float[:,:,0] = cv2.add(tmp_img_float[:,:,0],        float(ideal_mean_pixel_value))
-    tmp_img_float[:,:,1] = cv2.add(tmp_img_float[:,:,1],        float(ideal_mean_pixel_value))
-    tmp_img_float[:,:,2] = cv2.add(tmp_img_float[:,:,2],        float(ideal_mean_pixel_value))
+    transform_LUT = cv2.add(transform_LUT,      float(ideal_mean_pixel_value)).ravel()
 
     # 原点に揃え
-    tmp_img_float = tmp_img_float - np.min(tmp_img_float)
+    b_pixel_value_in_image = np.any([hist > 0 for hist in _hist_of_channels], axis=0)
+    transform_LUT = transform_LUT - np.min(transform_LUT[b_pixel_value_in_image])
 
     # 強引な調整
-    tmp_R_non_bgcolor = tmp_img_float[:,:,0][b_index_non_bgcolor]
-    tmp_G_non_bgcolor = tmp_img_float[:,:,1][b_index_non_bgcolor]
-    tmp_B_non_bgcolor = tmp_img_float[:,:,2][b_index_non_bgcolor]
-    tmp_R_mean, tmp_G_mean, tmp_B_mean = np.mean(tmp_R_non_bgcolor), np.mean(tmp_G_non_bgcolor), np.mean(tmp_B_non_bgcolor)
-    tmp_R_std, tmp_G_std, tmp_B_std = np.std(tmp_R_non_bgcolor), np.std(tmp_G_non_bgcolor), np.std(tmp_B_non_bgcolor)
-    b_R_outlier = tmp_img_float[:,:,0] >= tmp_R_mean + 1*tmp_R_std
-    b_G_outlier = tmp_img_float[:,:,1] >= tmp_G_mean + 1*tmp_G_std
-    b_B_outlier = tmp_img_float[:,:,2] >= tmp_B_mean + 1*tmp_B_std
-    tmp_img_float[:,:,0] = np.where(b_R_outlier, tmp_img_float[:,:,0]-tmp_R_mean*0.5, tmp_img_float[:,:,0])
-    tmp_img_float[:,:,1] = np.where(b_G_outlier, tmp_img_float[:,:,1]-tmp_G_mean*0.5, tmp_img_float[:,:,1])
-    tmp_img_float[:,:,2] = np.where(b_B_outlier, tmp_img_float[:,:,2]-tmp_B_mean*0.5, tmp_img_float[:,:,2])
-
-    # Convert float to np.uint8
-    tmp_img_uint8 = tmp_img_float.astype(np.uint8)
-
-    # Exclude background color from calculation
-    pre_processed_img_in_RGB = tmp_img_uint8
-    pre_processed_img_in_RGB[:,:,0] = np.where(b_index_non_bgcolor, tmp_img_uint8[:,:,0], 0) # R
-    pre_processed_img_in_RGB[:,:,1] = np.where(b_index_non_bgcolor, tmp_img_uint8[:,:,1], 0) # G
-    pre_processed_img_in_RGB[:,:,2] = np.where(b_index_non_bgcolor, tmp_img_uint8[:,:,2], 0) # B
+    # NOTE: The background color pixels of "img_in_RGB_non_bgcolor" are 0 in all channels
+    transform_LUTs, mean_of_channels, std_of_channels = np.empty((256, 1, 3), dtype=np.uint8), [], []
+    sum_of_transformed_pixel_values = 0.0
+    for c in range(3):
+        hist_non_bgcolor     = _hist_of_channels[c].copy()
+        hist_non_bgcolor[0] -= _num_of_bgcolor
+        tmp_mean = np.sum(hist_non_bgcolor * transform_LUT) / np.sum(hist_non_bgcolor)
+        tmp_std  = np.sqrt(np.sum(hist_non_bgcolor * (transform_LUT - tmp_mean)**2) / np.sum(hist_non_bgcolor))
+        b_outlier = transform_LUT >= tmp_mean + 1*tmp_std
+        tmp_transform_LUT = np.where(b_outlier, transform_LUT-tmp_mean*0.5, transform_LUT)
+        sum_of_transformed_pixel_values += np.sum(_hist_of_channels[c] * tmp_transform_LUT)
+        mean_of_channels.append(tmp_mean)
+        std_of_channels.append(tmp_std)
+
+        # Convert float to np.uint8
+        transform_LUTs[:, 0, c] = tmp_transform_LUT.astype(np.uint8)
+    # end for
+    mean_of_transformed_pixel_values = sum_of_transformed_pixel_values / (3 * np.sum(_hist_of_channels[0]))
+
+    return transform_LUTs, mean_of_channels, std_of_channels, mean_of_transformed_pixel_values
+
+
+
+# NOTE: Nothing is written or shown here (see showStatisticallyTransformedImage())
+def transformPixelValueDistributionStatistically():
+    hist_of_channels = [np.bincount(img_in_RGB_non_bgcolor[:,:,c].ravel(), minlength=256) for c in range(3)]
+    transform_LUTs, mean_of_channels, std_of_channels, mean_of_transformed_pixel_values = createStatisticalTransformLUT(hist_of_channels, np.count_nonzero(b_index_bgcolor))
+
+    # Transform the RGB channels at once, and exclude background color from calculation
+    pre_processed_img_in_RGB = cv2.LUT(img_in_RGB_non_bgcolor, transform_LUTs)
+    pre_processed_img_in_RGB[~b_index_non_bgcolor] = 0
     print("\nStatistically, transformed pixel value distribution.")
 
+    return pre_processed_img_in_RGB, mean_of_channels, std_of_channels, mean_of_transformed_pixel_values
+
+
+
+def showStatisticallyTransformedImage(_pre_processed_img_in_RGB, _mean_of_channels, _std_of_channels, _mean_of_transformed_pixel_values):
+    tmp_R_mean, tmp_R_std = _mean_of_channels[0], _std_of_channels[0]
+
     # Save image
-    pre_processed_img_in_BGR = cv2.cvtColor(pre_processed_img_in_RGB, cv2.COLOR_RGB2BGR)
+    pre_processed_img_in_BGR = cv2.cvtColor(_pre_processed_img_in_RGB, cv2.COLOR_RGB2BGR)
     cv2.imwrite("images/transformed.bmp", pre_processed_img_in_BGR)
 
     # Create figure
@@ -200,7 +216,7 @@ def transformPixelValueDistributionStatistically():
 
     ax2 = fig.add_subplot(gs[0,1])
     ax2.set_title('After')
-    ax2.imshow(pre_processed_img_in_RGB)
+    ax2.imshow(_pre_processed_img_in_RGB)
     ax2.set_xticks([]), ax2.set_yticks([])
 
     ax3 = fig.add_subplot(gs[1,0])
@@ -208,8 +224,8 @@ def transformPixelValueDistributionStatistically():
     ax3.axvline(ideal_mean_pixel_value, color='red')
 
     ax4 = fig.add_subplot(gs[1,1])
-    ax4 = rgbHist(pre_processed_img_in_RGB, ax4, "After")
-    ax4.axvline(np.mean(tmp_img_float), color='red')
+    ax4 = rgbHist(_pre_processed_img_in_RGB, ax4, "After")
+    ax4.axvline(_mean_of_transformed_pixel_values, color='red')
     ax4.axvline(tmp_R_mean + 1*tmp_R_std, color='green')
     ax4.axvline(tmp_R_mean + 2*tmp_R_std, color='blue')
     ax4.axvline(tmp_R_mean + 3*tmp_R_std, color='yellow')
@@ -217,7 +233,19 @@ def transformPixelValueDistributionStatistically():
 
     plt.show()
 
-    return pre_processed_img_in_RGB
+
+
+# Mapping of the pixel values from [_src_min, _src_max] to [_dst_min, _dst_max] as a 256-entry LUT
+# NOTE: The mapping is the same for every pixel value of every channel, so the float operations
+#       (and the truncation to uint8) are done once for 256 pixel values, not for each pixel
+def createMappingLUT(_src_min, _src_max, _dst_min, _dst_max):
+    pixel_values = np.arange(256, dtype=np.uint8)
+    mapping_LUT  = cv2.subtract(pixel_values, float(_src_min)).astype(float)
+    mapping_LUT  = cv2.divide(mapping_LUT,    float(_src_max-_src_min))
+    mapping_LUT  = cv2.multiply(mapping_LUT,  float(_dst_max-_dst_min))
+    mapping_LUT  = cv2.add(mapping_LUT,       float(_dst_min))
+
+    return mapping_LUT.astype(np.uint8)
 
 
 
@@ -226,25 +254,8 @@ def mappingPixelValue():
     min_pixel_value = img_in_Gray_non_bgcolor.min()
     max_pixel_value = img_in_Gray_non_bgcolor.max()
 
-    # Mapping
-    tmp_img_uint8 = img_in_RGB.copy()
-    tmp_img_float = tmp_img_uint8.astype(float)
-    
-    tmp_img_float[:,:,0] = cv2.subtract(tmp_img_uint8[:,:,0],   float(min_pixel_value)) # R
-    tmp_img_float[:,:,1] = cv2.subtract(tmp_img_uint8[:,:,1],   float(min_pixel_value)) # G
-    tmp_img_float[:,:,2] = cv2.subtract(tmp_img_uint8[:,:,2],   float(min_pixel_value)) # B
-
-    tmp_img_float[:,:,0] = cv2.divide(tmp_img_float[:,:,0],     float(max_pixel_value-min_pixel_value))
-    tmp_img_float[:,:,1] = cv2.divide(tmp_img_float[:,:,1],     float(max_pixel_value-min_pixel_value))
-    tmp_img_float[:,:,2] = cv2.divide(tmp_img_float[:,:,2],     float(max_pixel_value-min_pixel_value))
-
-    tmp_img_float[:,:,0] = cv2.multiply(tmp_img_float[:,:,0],   float(threshold_pixel_value-min_pixel_value))
-    tmp_img_float[:,:,1] = cv2.multiply(tmp_img_float[:,:,1],   float(threshold_pixel_value-min_pixel_value))
-    tmp_img_float[:,:,2] = cv2.multiply(tmp_img_float[:,:,2],   float(threshold_pixel_value-min_pixel_value))
-
-    tmp_img_uint8 = tmp_img_float.astype(np.uint8)
-
-    mapped_img_in_RGB = tmp_img_uint8
+    # Mapping [min, max] to [0, threshold - min] with one LUT for the RGB channels at once
+    mapped_img_in_RGB = cv2.LUT(img_in_RGB, createMappingLUT(min_pixel_value, max_pixel_value, 0, threshold_pixel_value-min_pixel_value))
     print("Mapping done.")
 
     return mapped_img_in_RGB
@@ -297,7 +308,8 @@ if __name__ == "__main__":
     ideal_std_pixel_value   = std_pixel_value/4
     ideal_mean_pixel_value  = mean_pixel_value
     img_in_RGB_bgcolor, img_in_RGB_non_bgcolor = separateBackgroundColor()
-    pre_processed_img_in_RGB = transformPixelValueDistributionStatistically()
+    pre_processed_img_in_RGB, mean_of_channels, std_of_channels, mean_of_transformed_pixel_values = transformPixelValueDistributionStatistically()
+    showStatisticallyTransformedImage(pre_processed_img_in_RGB, mean_of_channels, std_of_channels, mean_of_transformed_pixel_values)
     # adjusted_img_out_RGB    = BrightnessAdjustment(mapped_img_in_RGB)
     # adjusted_img_out_Gray   = cv2.cvtColor(adjusted_img_out_RGB, cv2.COLOR_RGB2GRAY)
     # # Save image
@@ -0,0 +1,71 @@
+import numpy as np
+import sys
+sys.path.append("..")
+
+import luminance_adjustment as la
+
+# NOTE: adjust_frames_by_keyframes() must solve "p" on the first and last frames, every "_keyframe_interval" frames,
+#       and on the frame before a sudden change of the histogram (and on the changed one),
+#       and the held frames between two keyframes must have "p" interpolated with the weights (i+1)/(n+1).
+rng = np.random.default_rng(0)
+img_RGB_dark   = rng.integers(20, 100, size=(16, 16, 3), dtype=np.uint8)
+img_RGB_bright = rng.integers(150, 250, size=(16, 16, 3), dtype=np.uint8)
+
+
+
+# Adjust "_frames" by keyframes with a "p" which is known for each frame, and return the indices of the keyframes and "p" of each frame
+def adjust_by_keyframes(_frames, _keyframe_interval, _keyframe_distance=None):
+    keyframes, p_of_frames = [], []
+
+    # The frames are identified by the object, since the same image may appear many times
+    def solve_p(_img_RGB):
+        index = [i for i, img_RGB in enumerate(_frames) if img_RGB is _img_RGB][0]
+        keyframes.append(index)
+        return 1.0 + index**2 / 100
+    # End of solve_p()
+
+    adjusted_frames = list(la.adjust_frames_by_keyframes(iter(_frames), solve_p, _keyframe_interval, _keyframe_distance, _p_of_frames=p_of_frames))
+
+    # Each frame is adjusted with "p" of it, in order
+    assert len(adjusted_frames) == len(_frames) == len(p_of_frames)
+    for img_RGB, adjusted_img_RGB, p in zip(_frames, adjusted_frames, p_of_frames):
+        assert np.array_equal(adjusted_img_RGB, la.adjust_pixel_value(img_RGB, p))
+    # end for
+
+    return keyframes, p_of_frames
+
+
+
+# "p" of each frame expected from the keyframes: the n frames held between two keyframes have the weights (i+1)/(n+1)
+def calc_expected_p_of_frames(_keyframes):
+    p_of_frames = [1.0]
+    for start, end in zip(_keyframes[:-1], _keyframes[1:]):
+        p_start, p_end, n = 1.0 + start**2 / 100, 1.0 + end**2 / 100, end - start - 1
+        p_of_frames += [round(p_start + (p_end - p_start) * (i + 1) / (n + 1), 2) for i in range(n)] + [p_end]
+    # end for
+
+    return p_of_frames
+
+
+
+cases = [
+    # frames, _keyframe_interval, _keyframe_distance, expected keyframes
+    ("one frame",                       [img_RGB_dark],                                     4,   None, [0]),
+    ("every frame",                     [img_RGB_dark.copy() for i in range(5)],            1,   None, [0, 1, 2, 3, 4]),
+    ("interval 4 (the last one forced)",[img_RGB_dark.copy() for i in range(10)],           4,   None, [0, 4, 8, 9]),
+    ("interval 4 (exact multiple)",     [img_RGB_dark.copy() for i in range(9)],            4,   None, [0, 4, 8]),
+    ("jump (the frame before promoted)",[img_RGB_dark.copy() for i in range(6)] + [img_RGB_bright.copy() for i in range(4)], 100, 0.5, [0, 5, 6, 9]),
+    ("jump after a keyframe",           [img_RGB_dark, img_RGB_bright.copy(), img_RGB_bright.copy(), img_RGB_bright.copy()],  100, 0.5, [0, 1, 3]),
+    ("jump and interval",               [img_RGB_dark.copy() for i in range(7)] + [img_RGB_bright.copy() for i in range(5)],  3,   0.5, [0, 3, 6, 7, 10, 11]),
+    ("no jump under the distance",      [img_RGB_dark.copy() for i in range(8)],            100, 0.5, [0, 7]),
+]
+
+for name, frames, interval, distance, expected_keyframes in cases:
+    keyframes, p_of_frames = adjust_by_keyframes(frames, interval, distance)
+    print(name, ":", keyframes, p_of_frames)
+
+    assert keyframes == expected_keyframes
+    assert p_of_frames == calc_expected_p_of_frames(expected_keyframes)
+# end for
+
+print("\nOK")
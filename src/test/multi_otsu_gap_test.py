@@ -0,0 +1,61 @@
+import numpy as np
+import itertools
+import sys
+sys.path.append("..")
+
+from luminance_adjustment import calc_multi_otsu_thresholds_from_histogram
+
+# NOTE: Histograms with gaps (empty bins between the pixel values) give empty classes in the DP.
+#       The thresholds of calc_multi_otsu_thresholds_from_histogram() must give the largest between-class variance,
+#       the same as trying all combinations, and 0/0 (nan) must never be computed.
+np.seterr(all="raise")
+rng = np.random.default_rng(0)
+
+
+
+# Sum of (sum of pixel values)^2 / (number of pixels) of the classes split by "_thresholds"
+def calc_between_class_cost(_hist, _thresholds):
+    cost, first_bin = 0.0, 1 # The background color (0) is excluded
+    for last_bin in [int(threshold) for threshold in _thresholds] + [255]:
+        N_of_class = _hist[first_bin:last_bin+1].sum()
+        if N_of_class > 0:
+            cost += float((_hist[first_bin:last_bin+1] * np.arange(first_bin, last_bin+1)).sum())**2 / N_of_class
+        first_bin = last_bin + 1
+    # end for
+
+    return cost
+
+
+
+def search_thresholds_by_brute_force(_hist, _num_of_classes):
+    return max(itertools.combinations(range(256), _num_of_classes-1), key=lambda thresholds: calc_between_class_cost(_hist, thresholds))
+
+
+
+for test_index in range(10):
+    # A few separated peaks, and 0 in between
+    hist = np.zeros(256, dtype=np.int64)
+    hist[0] = 1000
+    for pixel_value in rng.choice(np.arange(1, 256), size=rng.integers(2, 6), replace=False):
+        hist[pixel_value] = rng.integers(1, 500)
+    # end for
+
+    # Coarse grid of the brute force, so that the test does not take long
+    hist_coarse = np.zeros(256, dtype=np.int64)
+    hist_coarse[::16] = hist.reshape(16, 16).sum(axis=1)
+    hist_coarse[0] = 1000
+
+    for num_of_classes in [2, 3]:
+        thresholds = calc_multi_otsu_thresholds_from_histogram(hist_coarse, num_of_classes)
+        expected   = search_thresholds_by_brute_force(hist_coarse, num_of_classes)
+
+        print("Test", test_index, ":", num_of_classes, "classes", [int(threshold) for threshold in thresholds], "(brute force:", list(expected), ")")
+        assert np.isclose(calc_between_class_cost(hist_coarse, thresholds), calc_between_class_cost(hist_coarse, expected))
+    # end for
+
+    # More classes than pixel values: some classes must be empty
+    thresholds = calc_multi_otsu_thresholds_from_histogram(hist, 8)
+    assert len(thresholds) == 7 and all(0 <= int(threshold) <= 255 for threshold in thresholds)
+# end for
+
+print("\nOK")
@@ -0,0 +1,35 @@
+import numpy as np
+import sys
+sys.path.append("..")
+
+import luminance_adjustment as la
+from luminance_adjustment.benchmark import fixture_pairs, create_synthetic_images
+
+# NOTE: The "bisection" and "crossing" engines must give exactly the same "p" (and adjusted image)
+#       as the "linear" search of the original scripts, on the bundled images and a synthetic render.
+engines = ["linear", "bisection", "crossing"]
+
+pairs = {fixture: (la.read_image("../" + img_name), la.read_image("../" + img_name_L1)) for fixture, (img_name, img_name_L1) in fixture_pairs.items()}
+pairs["synthetic"] = create_synthetic_images(512, 0.5)
+
+procedures = {
+    "adjust_brightness"         : lambda _img_RGB, _img_RGB_L1, _engine: la.adjust_brightness(_img_RGB, _img_RGB_L1, _engine=_engine),
+    "decompose (mean_std)"      : lambda _img_RGB, _img_RGB_L1, _engine: la.adjust_brightness_decompose(_img_RGB, _img_RGB_L1, _engine=_engine),
+    "decompose (otsu)"          : lambda _img_RGB, _img_RGB_L1, _engine: la.adjust_brightness_decompose(_img_RGB, _img_RGB_L1, _threshold_method="otsu", _engine=_engine),
+    "decompose into 3 classes"  : lambda _img_RGB, _img_RGB_L1, _engine: la.adjust_brightness_decompose_into_classes(_img_RGB, _img_RGB_L1, 3, _engine=_engine),
+}
+
+for name, (img_RGB, img_RGB_L1) in pairs.items():
+    for procedure, adjust in procedures.items():
+        results = {engine: adjust(img_RGB, img_RGB_L1, engine) for engine in engines}
+        adjusted_img_RGB, outputs = results["linear"][0], results["linear"][1:]
+        print(name, ":", procedure, outputs)
+
+        for engine in engines[1:]:
+            assert np.array_equal(results[engine][0], adjusted_img_RGB), engine
+            assert str(results[engine][1:]) == str(outputs), engine
+        # end for
+    # end for
+# end for
+
+print("\nOK")
@@ -0,0 +1,49 @@
+import numpy as np
+import cv2
+import sys
+sys.path.append("..")
+
+import luminance_adjustment as la
+
+# NOTE: A chain of preprocessing stages must give the same image as the stages applied one after the other,
+#       also when a stage which reads the statistics of the image (la.histogram_stages) is not the first one.
+img_RGB = la.read_image("../Brightness_Adjustment/resources/sample/hachimanyama/input.bmp")
+
+twice_LUT_stage = la.create_LUT_stage(cv2.multiply(np.arange(256, dtype=np.uint8), 2.0))
+mapping_stage   = la.create_LUT_stage(la.create_mapping_LUT(10, 200, 0, 255))
+
+chains = {
+    "LUT, robust scale"                 : [twice_LUT_stage, la.robust_scale_stage],
+    "robust scale, LUT, robust scale"   : [la.robust_scale_stage, twice_LUT_stage, la.robust_scale_stage],
+    "mapping, robust scale, LUT"        : [mapping_stage, la.robust_scale_stage, twice_LUT_stage],
+    "LUT, min-max, gamma"               : [twice_LUT_stage, la.create_min_max_mapping_stage(200), la.create_gamma_stage(200)],
+}
+
+
+
+# Apply the stages one after the other, each on the image preprocessed by the previous ones
+def preprocess_one_by_one(_img_RGB, _stages):
+    preprocessed_img_RGB = _img_RGB
+    for stage in _stages:
+        preprocessed_img_RGB = la.preprocess_pixel_value(preprocessed_img_RGB, [stage])
+    # end for
+
+    return preprocessed_img_RGB
+
+
+
+for name, stages in chains.items():
+    chained_img_RGB    = la.preprocess_pixel_value(img_RGB, stages)
+    one_by_one_img_RGB = preprocess_one_by_one(img_RGB, stages)
+
+    max_diff = int(np.max(cv2.absdiff(chained_img_RGB, one_by_one_img_RGB)))
+    print(name, ":", len(la.split_preprocessing_stages(stages)), "part(s), max diff", max_diff)
+    assert max_diff == 0
+# end for
+
+# The chain of adjust_brightness_pre-process.py keeps the float values of the robust scaling, so it is one part
+threshold_pixel_value = 200
+stages = [la.robust_scale_stage, la.create_min_max_mapping_stage(threshold_pixel_value), la.create_gamma_stage(threshold_pixel_value)]
+assert len(la.split_preprocessing_stages(stages)) == 1
+
+print("\nOK")
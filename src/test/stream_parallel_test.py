@@ -0,0 +1,77 @@
+import numpy as np
+import os
+import shutil
+import tempfile
+import sys
+sys.path.append("..")
+
+import luminance_adjustment as la
+
+# NOTE: adjust_video_parallel() must give the same "p" and the same frames as adjust_video() in one run,
+#       whether the number of frames is a multiple of the chunk size or not (the end of the frames is found by a short chunk).
+#       An error of a worker must be raised, and so must a missing input.
+chunk_size = 4
+rng        = np.random.default_rng(0)
+img_RGB    = rng.integers(0, 200, size=(32, 32, 3), dtype=np.uint8)
+img_RGB_L1 = rng.integers(0, 256, size=(32, 32, 3), dtype=np.uint8)
+
+work_dir = tempfile.mkdtemp()
+
+
+
+# Write "_num_of_frames" frames whose brightness changes through the sequence
+def write_frames(_num_of_frames):
+    src = os.path.join(work_dir, "src_%d" % _num_of_frames)
+    os.makedirs(src)
+    la.write_frames(os.path.join(src, "image%03d.bmp"), [la.adjust_pixel_value(img_RGB, 0.5 + 0.05 * frame) for frame in range(_num_of_frames)])
+
+    return os.path.join(src, "image%03d.bmp")
+
+
+
+def read_frames(_src):
+    return list(la.read_frames(_src))
+
+
+
+# Raise on every chunk
+def raise_error(_frames):
+    raise ValueError("Error of the worker")
+
+
+
+try:
+    for num_of_frames in [chunk_size - 1, chunk_size, 2*chunk_size - 1, 2*chunk_size, 2*chunk_size + 1, 3*chunk_size + 1]:
+        src = write_frames(num_of_frames)
+        dst_serial, dst_parallel = src.replace("image", "serial"), src.replace("image", "parallel")
+
+        p_of_frames_serial   = la.adjust_video(src, dst_serial, img_RGB_L1)
+        p_of_frames_parallel = la.adjust_video_parallel(src, dst_parallel, img_RGB_L1, _max_workers=2, _chunk_size=chunk_size)
+        print(num_of_frames, "frames :", p_of_frames_parallel)
+
+        frames_serial, frames_parallel = read_frames(dst_serial), read_frames(dst_parallel)
+        assert p_of_frames_parallel == p_of_frames_serial
+        assert len(frames_parallel) == len(frames_serial) == num_of_frames
+        assert all(np.array_equal(frame_parallel, frame_serial) for frame_parallel, frame_serial in zip(frames_parallel, frames_serial))
+        assert not os.path.isfile(dst_parallel % num_of_frames)
+    # end for
+
+    # An error of a worker is raised by .result()
+    try:
+        la.stream_frames_parallel(src, os.path.join(work_dir, "error%03d.bmp"), raise_error, _max_workers=2, _chunk_size=chunk_size)
+        assert False
+    except ValueError as e:
+        print("Raised :", e)
+
+    # No frame at all
+    for missing_src in [os.path.join(work_dir, "missing%03d.bmp"), os.path.join(work_dir, "missing_*.bmp")]:
+        try:
+            la.adjust_video_parallel(missing_src, os.path.join(work_dir, "missing_out%03d.bmp"), img_RGB_L1, _max_workers=2, _chunk_size=chunk_size)
+            assert False
+        except FileNotFoundError as e:
+            print("Raised :", e)
+    # end for
+finally:
+    shutil.rmtree(work_dir)
+
+print("\nOK")